@@ -0,0 +1,11 @@
+"""
+离线端到端吞吐量基准测试
+使用合成页面与进程内的模拟 Provider，无需调用真实 API 即可测量
+加载 → 预处理 → 请求 → 排版 → 渲染 → 保存 全流程的吞吐量、各阶段耗时与峰值内存。
+
+用法（在 src 目录下运行）:
+    python -m benchmarks --pages 24 --latency-ms 800 --jitter-ms 300
+    python -m benchmarks --save-baseline
+
+基线保存在 benchmarks/baselines/baseline.json，未指定 --baseline 时与其比较。
+"""
@@ -0,0 +1,121 @@
+"""
+进程内模拟 Provider
+接口与 GeminiMultimodalProvider / OpenAIProvider 的 request_blocks 一致。
+按感知哈希识别已注册的合成页面并返回其文本块；未注册的图片（如分块）按哈希生成确定性的随机块。
+延迟与抖动由图片哈希决定，因此串行与并发模式下每页的延迟相同。
+"""
+
+import asyncio
+import json
+import random
+import threading
+from core.near_duplicate import compute_dhash, hamming_distance
+from utils.async_tasks import wait_cancellable
+from utils.tracing import trace_span
+
+
+class FakeProvider:
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        jitter_ms: float = 300.0,
+        seed: int = 1234,
+        max_match_distance: int = 8,
+    ):
+        self.latency_ms = max(0.0, latency_ms)
+        self.jitter_ms = max(0.0, jitter_ms)
+        self.seed = seed
+        self.max_match_distance = max_match_distance
+        self.call_count = 0
+        self._lock = threading.Lock()
+        self._registered_pages: list[tuple[int, list[dict]]] = []
+
+    def register_page(self, pil_image, blocks: list[dict]):
+        page_hash = compute_dhash(pil_image)
+        with self._lock:
+            self._registered_pages.append((page_hash, blocks))
+
+    def get_cache_identity(self) -> dict:
+        return {"provider": "fake", "seed": self.seed}
+
+    def _find_registered_blocks(self, image_hash: int) -> list[dict] | None:
+        with self._lock:
+            registered_pages = list(self._registered_pages)
+        best_blocks, best_distance = None, self.max_match_distance + 1
+        for page_hash, blocks in registered_pages:
+            distance = hamming_distance(image_hash, page_hash)
+            if distance < best_distance:
+                best_blocks, best_distance = blocks, distance
+        return best_blocks
+
+    def _generate_blocks(self, rng: random.Random) -> list[dict]:
+        blocks = []
+        for block_idx in range(rng.randint(1, 6)):
+            x_min, y_min = rng.uniform(0.05, 0.7), rng.uniform(0.05, 0.8)
+            blocks.append(
+                {
+                    "id": f"fake_{block_idx}",
+                    "original_text": f"テキスト{block_idx}",
+                    "translated_text": "模拟译文" * rng.randint(1, 4),
+                    "orientation": "horizontal",
+                    "font_size_category": "medium",
+                    "bbox_norm": [x_min, y_min, x_min + 0.2, y_min + 0.1],
+                }
+            )
+        return blocks
+
+    def _begin_request(self, pil_image) -> tuple[int, random.Random, float]:
+        with self._lock:
+            self.call_count += 1
+        image_hash = compute_dhash(pil_image)
+        rng = random.Random(self.seed ^ image_hash)
+        delay = max(
+            0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)
+        ) / 1000.0
+        return image_hash, rng, delay
+
+    def _build_response(self, image_hash: int, rng: random.Random, tracer=None):
+        with trace_span(tracer, "provider.parse", "provider", provider="fake"):
+            blocks = self._find_registered_blocks(image_hash)
+            if blocks is None:
+                blocks = self._generate_blocks(rng)
+            return json.loads(json.dumps(blocks)), None
+
+    def request_blocks(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: float | None = None,
+        block_callback=None,
+    ):
+        image_hash, rng, delay = self._begin_request(pil_image)
+        with trace_span(tracer, "provider.http", "provider", provider="fake"):
+            if cancellation_event:
+                if cancellation_event.wait(delay):
+                    return None, None
+            else:
+                threading.Event().wait(delay)
+        blocks, error = self._build_response(image_hash, rng, tracer)
+        if block_callback:
+            for block in blocks:
+                block_callback(dict(block))
+        return blocks, error
+
+    async def request_blocks_async(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: float | None = None,
+    ):
+        image_hash, rng, delay = self._begin_request(pil_image)
+        with trace_span(tracer, "provider.http", "provider", provider="fake"):
+            completed, _ = await wait_cancellable(
+                asyncio.sleep(delay), cancellation_event
+            )
+            if not completed:
+                return None, None
+        return self._build_response(image_hash, rng, tracer)
@@ -0,0 +1,362 @@
+"""
+本地 OpenAI 兼容模拟服务器
+实现 POST {base_url}/chat/completions（含 stream=true 的 SSE 流式响应），返回固定格式的文本块 JSON。
+可注入延迟、429/5xx 错误率与截断的响应体，用于在无网络环境下对真实 HTTP 路径
+（连接池、重试、并发）进行压力测试。
+
+用法（在 src 目录下运行）:
+    python -m benchmarks.mock_openai_server --port 8765 --latency-ms 800 --rate-429 0.1
+然后在设置中把 OpenAI Compatible 的 base_url 设为 http://127.0.0.1:8765/v1
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SAMPLE_TRANSLATIONS = (
+    "你好",
+    "等一下！",
+    "这到底是怎么回事？",
+    "我们必须在天亮之前离开这里。",
+    "别担心，我会保护你的。",
+)
+
+
+class MockServerSettings:
+    """故障注入参数，运行中修改会立即对后续请求生效"""
+
+    def __init__(
+        self,
+        latency_ms: float = 500.0,
+        jitter_ms: float = 200.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        truncate_rate: float = 0.0,
+        retry_after_seconds: float = 1.0,
+        min_blocks: int = 2,
+        max_blocks: int = 12,
+        stream_chunk_size: int = 48,
+        seed: int = 1234,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.truncate_rate = truncate_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.min_blocks = min_blocks
+        self.max_blocks = max_blocks
+        self.stream_chunk_size = max(1, stream_chunk_size)
+        self.seed = seed
+
+
+def build_canned_blocks(rng: random.Random, min_blocks: int, max_blocks: int) -> list:
+    """生成与 OCR Prompt 约定一致的文本块（bounding_box 为 0-1000 的 [y_min, x_min, y_max, x_max]）"""
+    blocks = []
+    for block_idx in range(rng.randint(min_blocks, max(min_blocks, max_blocks))):
+        y_min, x_min = rng.randint(20, 850), rng.randint(20, 750)
+        blocks.append(
+            {
+                "original_text": f"テキスト{block_idx}",
+                "translated_text": rng.choice(_SAMPLE_TRANSLATIONS),
+                "orientation": rng.choice(["horizontal", "vertical_rtl"]),
+                "font_size_category": rng.choice(["small", "medium", "large"]),
+                "bounding_box": [
+                    y_min,
+                    x_min,
+                    y_min + rng.randint(40, 140),
+                    x_min + rng.randint(80, 230),
+                ],
+            }
+        )
+    return blocks
+
+
+def _count_request_images(request_payload: dict) -> int:
+    """统计请求中的图片数量，多图打包请求按图片分别生成带 image_index 的文本块"""
+    image_count = 0
+    for message in request_payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, list):
+            image_count += sum(
+                1
+                for part in content
+                if isinstance(part, dict) and part.get("type") == "image_url"
+            )
+    return image_count
+
+
+class _MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, extra_headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (extra_headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        mock_server = self.server.mock_server
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        content_length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(content_length)
+        try:
+            request_payload = json.loads(raw_body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        settings = mock_server.settings
+        request_hash = int(hashlib.sha256(raw_body).hexdigest()[:16], 16)
+        rng = random.Random(settings.seed ^ request_hash)
+        fault_rng = mock_server.next_fault_rng()
+        delay = max(
+            0.0,
+            settings.latency_ms + rng.uniform(-settings.jitter_ms, settings.jitter_ms),
+        )
+        mock_server.record("requests")
+        roll = fault_rng.random()
+        if roll < settings.rate_429:
+            mock_server.record("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                {"Retry-After": f"{settings.retry_after_seconds:g}"},
+            )
+            return
+        roll -= settings.rate_429
+        time.sleep(delay / 1000.0)
+        if roll < settings.rate_5xx:
+            mock_server.record("server_errors")
+            self._send_json(
+                fault_rng.choice([500, 502, 503]),
+                {"error": {"message": "Mock upstream error", "type": "server_error"}},
+            )
+            return
+        roll -= settings.rate_5xx
+        truncate = roll < settings.truncate_rate
+        image_count = _count_request_images(request_payload)
+        if image_count > 1:
+            canned_blocks = []
+            for image_index in range(image_count):
+                for block in build_canned_blocks(
+                    rng, settings.min_blocks, settings.max_blocks
+                ):
+                    block["image_index"] = image_index
+                    canned_blocks.append(block)
+        else:
+            canned_blocks = build_canned_blocks(
+                rng, settings.min_blocks, settings.max_blocks
+            )
+        content = json.dumps(canned_blocks, ensure_ascii=False)
+        if request_payload.get("stream"):
+            self._send_stream(request_payload, content, truncate)
+        else:
+            self._send_completion(request_payload, content, truncate)
+
+    def _send_completion(self, request_payload: dict, content: str, truncate: bool):
+        body = json.dumps(
+            {
+                "id": f"chatcmpl-mock-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request_payload.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content)},
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if truncate:
+            self.server.mock_server.record("truncated")
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+        self.server.mock_server.record("completed")
+
+    def _send_stream(self, request_payload: dict, content: str, truncate: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_size = self.server.mock_server.settings.stream_chunk_size
+        chunks = [
+            content[offset : offset + chunk_size]
+            for offset in range(0, len(content), chunk_size)
+        ]
+        if truncate:
+            chunks = chunks[: max(1, len(chunks) // 2)]
+        chunk_id = f"chatcmpl-mock-{time.time_ns()}"
+        try:
+            for chunk in chunks:
+                event = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "model": request_payload.get("model", "mock"),
+                    "choices": [
+                        {"index": 0, "delta": {"content": chunk}, "finish_reason": None}
+                    ],
+                }
+                self.wfile.write(
+                    f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+                )
+                self.wfile.flush()
+                time.sleep(0.01)
+            if truncate:
+                self.server.mock_server.record("truncated")
+                return
+            final_event = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            self.wfile.write(f"data: {json.dumps(final_event)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.server.mock_server.record("completed")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.mock_server.record("client_disconnects")
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    mock_server: "MockOpenAIServer"
+
+
+class MockOpenAIServer:
+    """在后台线程中运行的模拟服务器，port=0 时自动选择空闲端口"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        settings: MockServerSettings | None = None,
+    ):
+        self.settings = settings or MockServerSettings()
+        self._http_server = _MockHTTPServer((host, port), _MockOpenAIHandler)
+        self._http_server.mock_server = self
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._fault_rng = random.Random(self.settings.seed)
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "truncated": 0,
+            "client_disconnects": 0,
+        }
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._http_server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record(self, counter: str):
+        with self._lock:
+            self.stats[counter] = self.stats.get(counter, 0) + 1
+
+    def next_fault_rng(self) -> random.Random:
+        """故障注入按请求到达顺序确定，相同种子下的故障序列可复现"""
+        with self._lock:
+            return random.Random(self._fault_rng.random())
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._http_server.serve_forever,
+            name="MockOpenAIServer",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self):
+        """在当前线程中运行，直到被中断（命令行模式）"""
+        try:
+            self._http_server.serve_forever()
+        finally:
+            self._http_server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.mock_openai_server",
+        description="本地 OpenAI 兼容模拟服务器",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="返回 5xx 的比例")
+    parser.add_argument(
+        "--truncate-rate", type=float, default=0.0, help="响应体被截断的比例"
+    )
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    server = MockOpenAIServer(
+        args.host,
+        args.port,
+        MockServerSettings(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            rate_429=args.rate_429,
+            rate_5xx=args.rate_5xx,
+            truncate_rate=args.truncate_rate,
+            retry_after_seconds=args.retry_after,
+            seed=args.seed,
+        ),
+    )
+    print(f"模拟服务器已启动: {server.base_url} (Ctrl+C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"统计: {server.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+"""
+基准测试执行与基线比较
+串行模式逐页执行 process_image_request → draw_processed_blocks_pil → 保存；
+并发模式使用 BatchPipeline，async 模式使用 AsyncBatchPipeline。
+各模式共用同一个模拟 Provider 与同一组合成页面。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from core.config import ConfigManager
+from core.async_pipeline import AsyncBatchPipeline
+from core.pipeline import BatchPipeline, build_output_path, save_rendered_image
+from core.processor import ImageProcessor, ProcessingResult
+from utils.image import draw_processed_blocks_pil
+from utils.tracing import Tracer
+from services.cassette import Cassette, get_cassette, get_default_cassette_path
+from benchmarks.fake_provider import FakeProvider
+from benchmarks.mock_openai_server import MockOpenAIServer, MockServerSettings
+from benchmarks.synthetic import generate_pages
+
+try:
+    import psutil
+
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    psutil = None
+DEFAULT_BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines", "baseline.json"
+)
+_STAGE_NOISE_FLOOR_MS = 5.0
+
+
+def _read_rss_bytes() -> int | None:
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """后台线程定期采样常驻内存，记录运行期间的峰值"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes: int | None = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self):
+        rss_bytes = _read_rss_bytes()
+        if rss_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes or 0, rss_bytes)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(
+            target=self._run, name="RssSampler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop_event.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self) -> float | None:
+        if self.peak_bytes is None:
+            return None
+        return round(self.peak_bytes / (1024 * 1024), 1)
+
+
+def build_benchmark_config(
+    work_dir: str, concurrency: int, base_config_path: str = ""
+) -> ConfigManager:
+    """
+    在临时目录中创建独立配置，关闭缓存与近似重复复用，避免影响用户配置与测量结果。
+    指定 base_config_path 时复制该配置（用于回放录制时保持 Prompt、模型等参数一致）。
+    """
+    config_path = os.path.join(work_dir, "config.ini")
+    if base_config_path:
+        shutil.copyfile(base_config_path, config_path)
+    config_manager = ConfigManager(config_path=config_path)
+    config_manager.set("Cache", "enabled", "False")
+    config_manager.set("NearDuplicate", "enabled", "False")
+    config_manager.set("TranslationMemory", "enabled", "False")
+    config_manager.set("Tracing", "enabled", "False")
+    config_manager.set("Batch", "max_concurrent_pages", str(max(1, concurrency)))
+    return config_manager
+
+
+def _summarize_run(
+    mode: str,
+    page_count: int,
+    failed_pages: int,
+    wall_seconds: float,
+    tracer: Tracer,
+    rss_sampler: RssSampler,
+    provider_calls: int,
+) -> dict:
+    return {
+        "mode": mode,
+        "pages": page_count,
+        "failed_pages": failed_pages,
+        "wall_seconds": round(wall_seconds, 3),
+        "pages_per_sec": round(page_count / wall_seconds, 3) if wall_seconds else 0.0,
+        "peak_rss_mb": rss_sampler.peak_mb,
+        "provider_calls": provider_calls,
+        "stages": tracer.summarize(),
+    }
+
+
+def run_serial(
+    image_processor: ImageProcessor,
+    config_manager: ConfigManager,
+    page_paths: list[str],
+    output_dir: str,
+    count_provider_calls,
+) -> dict:
+    tracer = Tracer("serial")
+    calls_before = count_provider_calls()
+    failed_pages = 0
+    with RssSampler() as rss_sampler:
+        start_time = time.perf_counter()
+        for page_path in page_paths:
+            page_start = time.perf_counter()
+            result = image_processor.process_image_request(page_path, tracer=tracer)
+            if not result.succeeded:
+                failed_pages += 1
+                continue
+            stage_start = time.perf_counter()
+            rendered_image = draw_processed_blocks_pil(
+                result.image, result.blocks, config_manager
+            )
+            result.record_timing("render", stage_start, blocks=len(result.blocks))
+            stage_start = time.perf_counter()
+            save_rendered_image(rendered_image, build_output_path(page_path, output_dir))
+            result.record_timing("save", stage_start)
+            tracer.add_span("page", page_start, time.perf_counter(), category="page")
+        wall_seconds = time.perf_counter() - start_time
+    return _summarize_run(
+        "serial",
+        len(page_paths),
+        failed_pages,
+        wall_seconds,
+        tracer,
+        rss_sampler,
+        count_provider_calls() - calls_before,
+    )
+
+
+def _run_pipeline(
+    mode: str,
+    pipeline_class,
+    image_processor: ImageProcessor,
+    config_manager: ConfigManager,
+    page_paths: list[str],
+    output_dir: str,
+    count_provider_calls,
+) -> dict:
+    tracer = Tracer(mode)
+    calls_before = count_provider_calls()
+    failed_jobs = []
+    pipeline = pipeline_class(
+        image_processor,
+        config_manager,
+        output_dir,
+        on_page_done=lambda job: None if job.success else failed_jobs.append(job),
+        tracer=tracer,
+    )
+    with RssSampler() as rss_sampler:
+        start_time = time.perf_counter()
+        pipeline.start(page_paths)
+        pipeline.wait()
+        wall_seconds = time.perf_counter() - start_time
+    return _summarize_run(
+        mode,
+        len(page_paths),
+        len(failed_jobs),
+        wall_seconds,
+        tracer,
+        rss_sampler,
+        count_provider_calls() - calls_before,
+    )
+
+
+def run_concurrent(
+    image_processor: ImageProcessor,
+    config_manager: ConfigManager,
+    page_paths: list[str],
+    output_dir: str,
+    count_provider_calls,
+) -> dict:
+    return _run_pipeline(
+        "concurrent",
+        BatchPipeline,
+        image_processor,
+        config_manager,
+        page_paths,
+        output_dir,
+        count_provider_calls,
+    )
+
+
+def run_async(
+    image_processor: ImageProcessor,
+    config_manager: ConfigManager,
+    page_paths: list[str],
+    output_dir: str,
+    count_provider_calls,
+) -> dict:
+    return _run_pipeline(
+        "async",
+        AsyncBatchPipeline,
+        image_processor,
+        config_manager,
+        page_paths,
+        output_dir,
+        count_provider_calls,
+    )
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """返回相对基线的退化项描述；各阶段 p50 差值小于噪声阈值时忽略"""
+    regressions = []
+    for mode, run in report["runs"].items():
+        baseline_run = baseline.get("runs", {}).get(mode)
+        if not baseline_run:
+            continue
+        if run["pages_per_sec"] < baseline_run["pages_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"[{mode}] 吞吐量 {run['pages_per_sec']:.3f} 页/秒 < 基线 {baseline_run['pages_per_sec']:.3f}"
+            )
+        if (
+            run.get("peak_rss_mb")
+            and baseline_run.get("peak_rss_mb")
+            and run["peak_rss_mb"] > baseline_run["peak_rss_mb"] * (1 + tolerance)
+        ):
+            regressions.append(
+                f"[{mode}] 峰值内存 {run['peak_rss_mb']} MB > 基线 {baseline_run['peak_rss_mb']} MB"
+            )
+        for stage, stats in run["stages"].items():
+            baseline_stats = baseline_run.get("stages", {}).get(stage)
+            if not baseline_stats:
+                continue
+            p50_increase = stats["p50_ms"] - baseline_stats["p50_ms"]
+            if (
+                p50_increase > _STAGE_NOISE_FLOOR_MS
+                and stats["p50_ms"] > baseline_stats["p50_ms"] * (1 + tolerance)
+            ):
+                regressions.append(
+                    f"[{mode}] 阶段 {stage} p50 {stats['p50_ms']:.1f}ms > 基线 {baseline_stats['p50_ms']:.1f}ms"
+                )
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    for mode, run in report["runs"].items():
+        lines.append(
+            f"== {mode}: {run['pages']} 页, {run['wall_seconds']:.2f}s, "
+            f"{run['pages_per_sec']:.2f} 页/秒, 峰值内存 {run['peak_rss_mb']} MB, "
+            f"失败 {run['failed_pages']}, Provider 调用 {run['provider_calls']}"
+        )
+        for stage, stats in sorted(
+            run["stages"].items(), key=lambda item: -item[1]["total_ms"]
+        ):
+            lines.append(
+                f"   {stage:<16} n={stats['count']:<4} p50={stats['p50_ms']:>9.1f}ms "
+                f"p95={stats['p95_ms']:>9.1f}ms total={stats['total_ms']:>10.1f}ms"
+            )
+    return "\n".join(lines)
+
+
+def _list_image_files(image_dir: str) -> list[str]:
+    return sorted(
+        os.path.join(image_dir, file_name)
+        for file_name in os.listdir(image_dir)
+        if file_name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".webp"))
+    )
+
+
+def _apply_cassette_provider(config_manager: ConfigManager, cassette_path: str):
+    """未指定基础配置时，按录制文件中第一条记录的 Provider 与模型设置配置"""
+    first_entry = Cassette(cassette_path).get_any_entry()
+    if not first_entry or first_entry.get("provider") not in ("gemini", "openai"):
+        return
+    provider_name = first_entry["provider"]
+    config_manager.set("API", "ocr_provider", provider_name)
+    if first_entry.get("model"):
+        section = "GeminiAPI" if provider_name == "gemini" else "OpenAIAPI"
+        config_manager.set(section, "model_name", first_entry["model"])
+    if provider_name == "openai":
+        config_manager.set("OpenAIAPI", "api_key", "replay")
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="PicLingo 离线吞吐量基准测试"
+    )
+    parser.add_argument("--pages", type=int, default=12, help="合成页面数量")
+    parser.add_argument("--seed", type=int, default=1234, help="随机种子")
+    parser.add_argument("--min-blocks", type=int, default=3)
+    parser.add_argument("--max-blocks", type=int, default=25)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="模拟请求延迟")
+    parser.add_argument("--jitter-ms", type=float, default=200.0, help="延迟抖动范围")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发模式的同时请求页数")
+    parser.add_argument(
+        "--modes",
+        default="serial,concurrent",
+        help="逗号分隔的运行模式: serial, concurrent, async",
+    )
+    parser.add_argument(
+        "--async-in-flight", type=int, default=32, help="async 模式同时在途的请求数"
+    )
+    parser.add_argument(
+        "--provider",
+        choices=["fake", "mock-openai", "replay"],
+        default="fake",
+        help="fake: 进程内模拟 Provider；mock-openai: 真实 OpenAIProvider + 本地模拟服务器；"
+        "replay: 回放录制的真实响应",
+    )
+    parser.add_argument("--images", default="", help="使用该目录中的图片代替合成页面")
+    parser.add_argument("--config", default="", help="以该配置文件为基础（回放时需与录制时一致）")
+    parser.add_argument("--cassette", default="", help="回放使用的录制文件路径")
+    parser.add_argument(
+        "--replay-latency",
+        choices=["zero", "original"],
+        default="zero",
+        help="回放时立即返回或还原录制时的延迟",
+    )
+    parser.add_argument("--rate-429", type=float, default=0.0, help="模拟服务器返回 429 的比例")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="模拟服务器返回 5xx 的比例")
+    parser.add_argument(
+        "--truncate-rate", type=float, default=0.0, help="模拟服务器截断响应体的比例"
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15, help="判定退化的相对阈值"
+    )
+    parser.add_argument("--output", default="", help="将完整报告写入该 JSON 文件")
+    parser.add_argument("--keep-files", action="store_true", help="保留临时页面与输出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv if argv is not None else sys.argv[1:])
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    work_dir = tempfile.mkdtemp(prefix="piclingo_bench_")
+    mock_server = None
+    try:
+        config_manager = build_benchmark_config(
+            work_dir, args.concurrency, args.config
+        )
+        config_manager.set("Batch", "async_max_in_flight", str(args.async_in_flight))
+        if args.images:
+            page_paths = _list_image_files(args.images)[: args.pages or None]
+            pages = []
+        else:
+            pages = generate_pages(
+                os.path.join(work_dir, "pages"),
+                args.pages,
+                seed=args.seed,
+                min_blocks=args.min_blocks,
+                max_blocks=args.max_blocks,
+            )
+            page_paths = [page.path for page in pages]
+        if args.provider == "replay":
+            cassette_path = os.path.abspath(args.cassette or get_default_cassette_path())
+            config_manager.set("Cassette", "mode", "replay")
+            config_manager.set("Cassette", "path", cassette_path)
+            config_manager.set("Cassette", "replay_latency", args.replay_latency)
+            if not args.config:
+                _apply_cassette_provider(config_manager, cassette_path)
+            image_processor = ImageProcessor(config_manager)
+
+            def count_provider_calls():
+                cassette_stats = get_cassette(config_manager).get_stats()
+                return cassette_stats["hits"] + cassette_stats["misses"]
+
+        elif args.provider == "mock-openai":
+            mock_server = MockOpenAIServer(
+                settings=MockServerSettings(
+                    latency_ms=args.latency_ms,
+                    jitter_ms=args.jitter_ms,
+                    rate_429=args.rate_429,
+                    rate_5xx=args.rate_5xx,
+                    truncate_rate=args.truncate_rate,
+                    min_blocks=args.min_blocks,
+                    max_blocks=args.max_blocks,
+                    seed=args.seed,
+                )
+            ).start()
+            config_manager.set("API", "ocr_provider", "openai")
+            config_manager.set("OpenAIAPI", "base_url", mock_server.base_url)
+            config_manager.set("OpenAIAPI", "api_key", "mock-key")
+            config_manager.set("OpenAIAPI", "model_name", "mock-model")
+            config_manager.set("Proxy", "enabled", "False")
+            image_processor = ImageProcessor(config_manager)
+
+            def count_provider_calls():
+                return mock_server.get_stats()["requests"]
+
+        else:
+            provider = FakeProvider(
+                latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed
+            )
+            image_processor = ImageProcessor(config_manager)
+            image_processor.set_provider_override(provider, name="fake")
+            for page in pages:
+                page_image = image_processor.load_image(ProcessingResult(page.path))
+                if page_image is not None:
+                    provider.register_page(page_image, page.blocks)
+
+            def count_provider_calls():
+                return provider.call_count
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "config": {
+                "pages": args.pages,
+                "seed": args.seed,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "concurrency": args.concurrency,
+                "async_in_flight": args.async_in_flight,
+                "provider": args.provider,
+            },
+            "runs": {},
+        }
+        runners = {
+            "serial": run_serial,
+            "concurrent": run_concurrent,
+            "async": run_async,
+        }
+        for mode in modes:
+            if mode not in runners:
+                print(f"警告: 未知的运行模式 '{mode}'，已跳过。")
+                continue
+            output_dir = os.path.join(work_dir, f"output_{mode}")
+            os.makedirs(output_dir, exist_ok=True)
+            report["runs"][mode] = runners[mode](
+                image_processor,
+                config_manager,
+                page_paths,
+                output_dir,
+                count_provider_calls,
+            )
+        rate_limit_stats = image_processor.get_rate_limit_stats()
+        if rate_limit_stats:
+            report["rate_limit"] = rate_limit_stats
+        routing_stats = image_processor.get_routing_stats()
+        if routing_stats:
+            report["routing"] = routing_stats
+        packing_stats = image_processor.get_packing_stats()
+        if packing_stats:
+            report["packing"] = packing_stats
+        hedge_stats = image_processor.get_hedge_stats()
+        if hedge_stats:
+            report["hedging"] = hedge_stats
+        if mock_server:
+            report["mock_server"] = mock_server.get_stats()
+        if args.provider == "replay":
+            report["cassette"] = get_cassette(config_manager).get_stats()
+        print(format_report(report))
+        if mock_server:
+            print(f"模拟服务器统计: {report['mock_server']}")
+        for name, stats in report.get("rate_limit", {}).items():
+            print(f"限流/重试统计 [{name}]: {stats}")
+        if "routing" in report:
+            print(f"端点路由统计: {report['routing']}")
+        for name, stats in report.get("packing", {}).items():
+            print(f"多页打包统计 [{name}]: {stats}")
+        for name, stats in report.get("hedging", {}).items():
+            print(f"对冲请求统计 [{name}]: {stats}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        exit_code = 0
+        if args.save_baseline:
+            os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"基线已保存: {args.baseline}")
+        elif os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+            if baseline.get("config") != report["config"]:
+                print("警告: 基线的测试参数与本次不同，比较结果可能没有意义。")
+            regressions = compare_with_baseline(report, baseline, args.tolerance)
+            if regressions:
+                print("检测到性能退化:")
+                for regression in regressions:
+                    print(f"  {regression}")
+                exit_code = 1
+            else:
+                print("与基线相比未发现性能退化。")
+        return exit_code
+    finally:
+        if mock_server:
+            mock_server.stop()
+        if args.keep_files:
+            print(f"临时文件保留在: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
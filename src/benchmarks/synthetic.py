@@ -0,0 +1,117 @@
+"""
+合成测试页面
+生成带网点背景和对话框的漫画风格页面，尺寸与文本块数量各不相同，结果由随机种子完全确定。
+"""
+
+import os
+import random
+
+try:
+    from PIL import Image, ImageDraw
+
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    Image = None
+    ImageDraw = None
+PAGE_SIZES = (
+    (1200, 1700),
+    (1654, 2339),
+    (2480, 3508),
+    (1600, 1200),
+    (800, 9000),
+)
+_SAMPLE_TRANSLATIONS = (
+    "你好",
+    "等一下！",
+    "这到底是怎么回事？",
+    "我们必须在天亮之前离开这里。",
+    "别担心，我会保护你的。",
+    "……",
+    "原来如此，那就没办法了呢。",
+    "快跑！后面有东西追过来了！",
+)
+
+
+class SyntheticPage:
+    """合成页面的描述：文件路径、尺寸以及对应的中间块（bbox_norm 坐标）"""
+
+    def __init__(self, path: str, size: tuple[int, int], blocks: list[dict]):
+        self.path = path
+        self.size = size
+        self.blocks = blocks
+
+
+def _random_blocks(rng: random.Random, block_count: int) -> list[dict]:
+    blocks = []
+    for block_idx in range(block_count):
+        width = rng.uniform(0.08, 0.3)
+        height = rng.uniform(0.03, 0.12)
+        x_min = rng.uniform(0.02, 0.98 - width)
+        y_min = rng.uniform(0.02, 0.98 - height)
+        translated_text = rng.choice(_SAMPLE_TRANSLATIONS)
+        blocks.append(
+            {
+                "id": f"synthetic_{block_idx}",
+                "original_text": f"テキスト{block_idx}",
+                "translated_text": translated_text,
+                "orientation": rng.choice(
+                    ["horizontal", "horizontal", "vertical_rtl"]
+                ),
+                "font_size_category": rng.choice(["small", "medium", "large"]),
+                "bbox_norm": [x_min, y_min, x_min + width, y_min + height],
+            }
+        )
+    return blocks
+
+
+def _draw_page(rng: random.Random, size: tuple[int, int], blocks: list[dict]):
+    width, height = size
+    page = Image.new("RGB", size, (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+    tone_step = rng.choice([4, 6, 8])
+    for panel_idx in range(rng.randint(3, 6)):
+        left = rng.randint(0, width // 2)
+        top = rng.randint(0, max(1, height - height // 4))
+        right = min(width - 1, left + rng.randint(width // 4, width // 2))
+        bottom = min(height - 1, top + rng.randint(height // 8, height // 4))
+        draw.rectangle((left, top, right, bottom), outline=(0, 0, 0), width=4)
+        for y in range(top + 4, bottom - 4, tone_step):
+            for x in range(left + 4 + (y // tone_step % 2) * 2, right - 4, tone_step):
+                draw.point((x, y), fill=(90, 90, 90))
+    for block in blocks:
+        x_min, y_min, x_max, y_max = block["bbox_norm"]
+        box = (x_min * width, y_min * height, x_max * width, y_max * height)
+        draw.ellipse(box, fill=(255, 255, 255), outline=(0, 0, 0), width=3)
+        line_height = max(6, int((box[3] - box[1]) / 5))
+        for line_idx in range(1, 4):
+            y = box[1] + line_idx * line_height
+            draw.line(
+                (box[0] + (box[2] - box[0]) * 0.25, y, box[2] - (box[2] - box[0]) * 0.25, y),
+                fill=(20, 20, 20),
+                width=max(2, line_height // 3),
+            )
+    return page
+
+
+def generate_pages(
+    output_dir: str,
+    page_count: int,
+    seed: int = 1234,
+    min_blocks: int = 3,
+    max_blocks: int = 25,
+    sizes: tuple[tuple[int, int], ...] = PAGE_SIZES,
+) -> list[SyntheticPage]:
+    """在 output_dir 下生成 page_count 张 PNG 页面，返回页面描述列表"""
+    if not PILLOW_AVAILABLE:
+        raise RuntimeError("Pillow 库未安装，无法生成合成页面。")
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    pages = []
+    for page_idx in range(page_count):
+        size = sizes[page_idx % len(sizes)]
+        blocks = _random_blocks(rng, rng.randint(min_blocks, max_blocks))
+        page_path = os.path.join(output_dir, f"page_{page_idx:03d}.png")
+        _draw_page(rng, size, blocks).save(page_path, "PNG", compress_level=1)
+        pages.append(SyntheticPage(page_path, size, blocks))
+    return pages
@@ -0,0 +1,160 @@
+"""
+基于 asyncio 的批处理驱动
+与 BatchPipeline 使用相同的阶段处理函数和回调，但 LLM 请求阶段在一个事件循环线程中以协程并发执行，
+同时在途的页面数只受 Batch.async_max_in_flight 限制，而不是每个请求占用一个系统线程。
+解码、排版渲染与保存等 CPU 阶段仍交给小型线程池执行，不阻塞事件循环。
+"""
+
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from core.config import ConfigManager
+from core.pipeline import (
+    STAGE_DECODE,
+    STAGE_ENCODE,
+    STAGE_LLM,
+    STAGE_RENDER,
+    BatchPipeline,
+    PageJob,
+    _PipelineStage,
+)
+from core.processor import ImageProcessor
+from utils.async_tasks import bridge_cancellation
+from utils.tracing import Tracer
+
+
+class AsyncBatchPipeline(BatchPipeline):
+    """
+    start()/wait()/get_stage_stats() 与 BatchPipeline 一致，可直接替换。
+    on_page_done(job) 在事件循环线程中被调用，每页恰好一次。
+    """
+
+    def __init__(
+        self,
+        image_processor: ImageProcessor,
+        config_manager: ConfigManager,
+        output_dir: str,
+        cancellation_event: threading.Event | None = None,
+        on_page_done=None,
+        tracer: Tracer | None = None,
+    ):
+        super().__init__(
+            image_processor,
+            config_manager,
+            output_dir,
+            cancellation_event=cancellation_event,
+            on_page_done=on_page_done,
+            tracer=tracer,
+        )
+        self.max_in_flight = max(
+            1, self.config_manager.getint("Batch", "async_max_in_flight", fallback=32)
+        )
+        self.cpu_workers = max(
+            1, self.config_manager.getint("Batch", "async_cpu_workers", fallback=2)
+        )
+        self._stages_by_name = {stage.name: stage for stage in self.stages}
+        self._stages_by_name[STAGE_LLM].worker_count = self.max_in_flight
+        self._admitted_pages_limit = (
+            self.max_in_flight + self.stages[0].input_queue.maxsize
+        )
+        self._loop_thread: threading.Thread | None = None
+
+    def start(self, file_paths: list[str]):
+        self._loop_thread = threading.Thread(
+            target=self._run_event_loop,
+            args=(list(file_paths),),
+            name="AsyncBatchPipeline-loop",
+            daemon=True,
+        )
+        self._loop_thread.start()
+
+    def _run_event_loop(self, file_paths: list[str]):
+        try:
+            asyncio.run(self._run_all(file_paths))
+        except Exception as e:
+            print(
+                f"AsyncBatchPipeline: 事件循环异常退出: {e}\n{traceback.format_exc()}"
+            )
+        finally:
+            self._done_event.set()
+
+    async def _run_all(self, file_paths: list[str]):
+        admission = asyncio.Semaphore(self._admitted_pages_limit)
+        llm_slots = asyncio.Semaphore(self.max_in_flight)
+        # 整个批次共用一个取消信号桥，各页的请求等待时不再各自轮询取消信号
+        with bridge_cancellation(self.cancellation_event), ThreadPoolExecutor(
+            max_workers=self.cpu_workers, thread_name_prefix="AsyncBatchPipeline-cpu"
+        ) as executor:
+            try:
+                await asyncio.gather(
+                    *(
+                        self._process_page(
+                            index, image_path, admission, llm_slots, executor
+                        )
+                        for index, image_path in enumerate(file_paths)
+                    )
+                )
+            finally:
+                await self.image_processor.aclose_async_clients()
+
+    async def _process_page(
+        self,
+        index: int,
+        image_path: str,
+        admission: asyncio.Semaphore,
+        llm_slots: asyncio.Semaphore,
+        executor: ThreadPoolExecutor,
+    ):
+        async with admission:
+            if self.cancellation_event.is_set():
+                return
+            job = PageJob(index, image_path, self.output_dir, tracer=self.tracer)
+            success = await self._run_stage_in_executor(STAGE_DECODE, job, executor)
+            if success:
+                async with llm_slots:
+                    success = await self._run_llm_stage_async(job)
+            if success:
+                success = await self._run_stage_in_executor(STAGE_RENDER, job, executor)
+            if success:
+                success = await self._run_stage_in_executor(STAGE_ENCODE, job, executor)
+            job.success = success
+            self._complete_job(job)
+
+    async def _run_stage_in_executor(
+        self, stage_name: str, job: PageJob, executor: ThreadPoolExecutor
+    ) -> bool:
+        stage = self._stages_by_name[stage_name]
+        with stage.lock:
+            stage.active_count += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, self._run_stage_handler, stage, job
+            )
+        finally:
+            with stage.lock:
+                stage.active_count -= 1
+
+    async def _run_llm_stage_async(self, job: PageJob) -> bool:
+        stage: _PipelineStage = self._stages_by_name[STAGE_LLM]
+        if self.cancellation_event.is_set():
+            job.result.cancelled = True
+            job.message = "处理已取消。"
+            return False
+        with stage.lock:
+            stage.active_count += 1
+        try:
+            job.intermediate_blocks = (
+                await self.image_processor.request_intermediate_blocks_async(
+                    job.pil_image_for_llm,
+                    job.result,
+                    cancellation_event=self.cancellation_event,
+                )
+            )
+            return self._finish_llm_stage(job)
+        except Exception as e:
+            self._record_stage_error(stage, job, e)
+            return False
+        finally:
+            with stage.lock:
+                stage.active_count -= 1
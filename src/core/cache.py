@@ -0,0 +1,234 @@
+"""
+识别/翻译结果的磁盘缓存
+以图片字节哈希与全部请求参数（Provider、模型、Prompt、术语表、语言、预处理设置）
+为键，保存 Provider 返回的中间块（含 bbox_norm），超出容量时按 LRU 淘汰。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from core.config import CONFIG_FILE
+from utils.async_tasks import CompletionEvent
+
+
+def get_default_cache_dir(name: str) -> str:
+    return os.path.join(os.path.dirname(CONFIG_FILE) or ".", "cache", name)
+
+
+def compute_cache_key(image_sha256: str, identity: dict) -> str:
+    identity_json = json.dumps(identity, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(
+        f"{image_sha256}\n{identity_json}".encode("utf-8")
+    ).hexdigest()
+
+
+class ResultCache:
+    """
+    线程安全的内容寻址磁盘缓存，每个条目保存为一个 JSON 文件。
+    get_or_compute 对相同的键只会计算一次，同一批次中的重复图片会等待并复用结果。
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max(0, max_size_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[int, float]] = {}
+        self._total_size = 0
+        self._in_flight: dict[str, CompletionEvent] = {}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"警告: 无法创建结果缓存目录 '{self.cache_dir}': {e}")
+        self._load_index()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                continue
+            self._entries[file_name[:-5]] = (stat.st_size, stat.st_mtime)
+            self._total_size += stat.st_size
+        with self._lock:
+            evicted_paths = self._evict_locked()
+        self._delete_files(evicted_paths)
+
+    def _read(self, key: str) -> list[dict] | None:
+        with self._lock:
+            if key not in self._entries:
+                return None
+        try:
+            with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                blocks = json.load(f)["blocks"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"警告: 读取缓存条目 {key[:12]} 失败: {e}")
+            with self._lock:
+                removed_path = self._remove_locked(key)
+            self._delete_files([removed_path])
+            return None
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = (self._entries[key][0], now)
+        try:
+            os.utime(self._entry_path(key), (now, now))
+        except OSError:
+            pass
+        return blocks
+
+    def get(self, key: str) -> list[dict] | None:
+        blocks = self._read(key)
+        with self._lock:
+            if blocks is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return blocks
+
+    def put(self, key: str, blocks: list[dict]):
+        try:
+            payload = json.dumps(
+                {"created_at": time.time(), "blocks": blocks}, ensure_ascii=False
+            ).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            print(f"警告: 无法序列化缓存条目: {e}")
+            return
+        if self.max_size_bytes and len(payload) > self.max_size_bytes:
+            return
+        entry_path = self._entry_path(key)
+        temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            print(f"警告: 写入缓存条目失败: {e}")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_size -= self._entries[key][0]
+            self._entries[key] = (len(payload), time.time())
+            self._total_size += len(payload)
+            evicted_paths = self._evict_locked()
+        self._delete_files(evicted_paths)
+
+    def get_or_compute(self, key: str, compute, should_cache=None):
+        """
+        命中缓存时直接返回；否则调用 compute() 并缓存成功的结果（带错误信息的不完整结果不缓存）。
+        should_cache(blocks) 返回 False 时结果也不缓存。
+        同一个键同时只有一个线程在计算，其余线程等待后复用结果。
+        Returns:
+            ((blocks, error), 是否命中缓存)，compute 的返回值为 (blocks, error)
+        """
+        while True:
+            cached_blocks = self._read(key)
+            if cached_blocks is not None:
+                with self._lock:
+                    self.hits += 1
+                return (cached_blocks, None), True
+            with self._lock:
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = CompletionEvent()
+                    self._in_flight[key] = in_flight
+                    self.misses += 1
+                    break
+            in_flight.wait()
+        try:
+            computed = compute()
+            if (
+                computed
+                and computed[0] is not None
+                and computed[1] is None
+                and (should_cache is None or should_cache(computed[0]))
+            ):
+                self.put(key, computed[0])
+            return computed, False
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            in_flight.set()
+
+    async def get_or_compute_async(self, key: str, compute_async, should_cache=None):
+        """
+        get_or_compute 的 asyncio 版本，compute_async 为返回 (blocks, error) 的协程函数。
+        与同步调用方共享同一个单飞 (single-flight) 表，等待其他调用方时不阻塞事件循环。
+        """
+        while True:
+            cached_blocks = self._read(key)
+            if cached_blocks is not None:
+                with self._lock:
+                    self.hits += 1
+                return (cached_blocks, None), True
+            with self._lock:
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = CompletionEvent()
+                    self._in_flight[key] = in_flight
+                    self.misses += 1
+                    break
+            await in_flight.wait_async()
+        try:
+            computed = await compute_async()
+            if (
+                computed
+                and computed[0] is not None
+                and computed[1] is None
+                and (should_cache is None or should_cache(computed[0]))
+            ):
+                self.put(key, computed[0])
+            return computed, False
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            in_flight.set()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size_bytes": self._total_size,
+            }
+
+    def clear(self):
+        with self._lock:
+            removed_paths = [self._remove_locked(key) for key in list(self._entries)]
+        self._delete_files(removed_paths)
+
+    def _remove_locked(self, key: str) -> str:
+        """从索引中移除条目并返回其文件路径，文件由调用方在释放锁之后删除"""
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._total_size -= entry[0]
+        return self._entry_path(key)
+
+    def _evict_locked(self) -> list[str]:
+        if not self.max_size_bytes or self._total_size <= self.max_size_bytes:
+            return []
+        evicted_paths = []
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_size <= self.max_size_bytes:
+                break
+            evicted_paths.append(self._remove_locked(key))
+        return evicted_paths
+
+    @staticmethod
+    def _delete_files(paths: list[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,5 +1,6 @@
 import configparser
 import os
+import threading
 
 
 def _get_config_path():
@@ -61,6 +62,9 @@ DEFAULT_CONFIG = {
         "target_language": "Chinese",
         "source_language": "Japanese",
         "glossary_text": "",
+        "requests_per_minute": "0",
+        "tokens_per_minute": "0",
+        "extra_api_keys": "",
     },
     "OpenAIAPI": {
         "api_key": "",
@@ -69,17 +73,127 @@ DEFAULT_CONFIG = {
         "request_timeout": "60",
         "source_language": "Japanese",
         "target_language": "Chinese",
+        "requests_per_minute": "0",
+        "tokens_per_minute": "0",
+        "extra_base_urls": "",
+        "extra_api_keys": "",
     },
     "LLMImagePreprocessing": {
         "enabled": "False",
         "upscale_factor": "1.5",
         "contrast_factor": "1.2",
         "upscale_resample_method": "LANCZOS",
+        "max_upload_long_edge": "3072",
+        "max_upload_pixels": "6000000",
+        "grayscale": "False",
+        "sharpen_amount": "0.0",
     },
     "Prompt": {
         "use_custom_prompt": "False",
         "custom_prompt_template": "",
     },
+    "Batch": {
+        "max_concurrent_pages": "3",
+        "decode_workers": "1",
+        "render_workers": "1",
+        "encode_workers": "1",
+        "stage_queue_size": "2",
+        "async_enabled": "False",
+        "async_max_in_flight": "32",
+        "async_cpu_workers": "2",
+    },
+    "Cache": {
+        "enabled": "True",
+        "cache_dir": "",
+        "max_size_mb": "200",
+    },
+    "NearDuplicate": {
+        "enabled": "False",
+        "hash_method": "dhash",
+        "max_hamming_distance": "4",
+        "max_aspect_ratio_diff": "0.01",
+        "max_region_distance": "3",
+        "allow_cross_folder": "False",
+        "max_entries": "2000",
+    },
+    "Tiling": {
+        "enabled": "True",
+        "min_aspect_ratio": "2.5",
+        "max_tile_aspect": "1.6",
+        "overlap_ratio": "0.15",
+        "max_tile_pixels": "16000000",
+        "max_concurrent_tiles": "4",
+        "dedup_iou_threshold": "0.5",
+        "dedup_text_similarity": "0.6",
+    },
+    "UploadEncoding": {
+        "format": "png",
+        "max_upload_kb": "1500",
+        "min_quality": "60",
+        "max_quality": "92",
+        "background_color": "#FFFFFF",
+    },
+    "Retry": {
+        "max_retries": "4",
+        "base_delay_seconds": "1.0",
+        "max_delay_seconds": "30",
+        "page_deadline_seconds": "180",
+    },
+    "Streaming": {
+        "enabled": "True",
+    },
+    "TranslationMemory": {
+        "enabled": "True",
+        "db_path": "",
+        "fuzzy_threshold": "0.75",
+        "max_fuzzy_references": "20",
+        "override_fused": "False",
+    },
+    "TwoStage": {
+        "enabled": "False",
+        "text_model_name": "",
+    },
+    "TextTranslation": {
+        "batch_enabled": "True",
+        "max_batch_tokens": "2000",
+        "max_parallel_batches": "4",
+    },
+    "Packing": {
+        "enabled": "False",
+        "max_images": "4",
+        "max_page_pixels": "1500000",
+        "max_total_pixels": "6000000",
+        "wait_ms": "150",
+    },
+    "Routing": {
+        "enabled": "False",
+        "failure_threshold": "3",
+        "open_seconds": "30",
+        "health_smoothing": "0.2",
+    },
+    "Hedging": {
+        "enabled": "False",
+        "latency_percentile": "95",
+        "min_samples": "20",
+        "max_hedge_ratio": "0.1",
+        "min_hedge_delay_seconds": "1.0",
+        "hedge_provider": "",
+    },
+    "HttpClient": {
+        "pool_size": "8",
+        "keep_alive": "True",
+        "http2": "False",
+    },
+    "Cassette": {
+        "mode": "off",
+        "path": "",
+        "replay_latency": "zero",
+    },
+    "Tracing": {
+        "enabled": "False",
+        "trace_dir": "",
+        "format": "chrome",
+    },
 }
 
 
@@ -87,6 +201,9 @@ class ConfigManager:
     def __init__(self, config_path=CONFIG_FILE):
         self.config_path = config_path
         self.config = configparser.ConfigParser(interpolation=None)
+        self.version = 0
+        self._snapshots: dict = {}
+        self._snapshot_lock = threading.Lock()
         self._load_or_create_config()
 
     def _load_or_create_config(self):
@@ -217,9 +334,26 @@ class ConfigManager:
         if not self.config.has_section(section):
             self.config.add_section(section)
         self.config.set(section, option, str(value))
+        self.version += 1
 
     def save(self):
         self._save_config_to_file()
+        self.version += 1
+
+    def get_snapshot(self, factory):
+        """
+        返回 factory(self) 构建的只读设置快照。
+        同一配置版本内复用同一个对象，set/save 使版本号递增后重新构建。
+        """
+        with self._snapshot_lock:
+            cached = self._snapshots.get(factory)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+        version = self.version
+        snapshot = factory(self)
+        with self._snapshot_lock:
+            self._snapshots[factory] = (version, snapshot)
+        return snapshot
 
     def get_raw_config_parser(self):
         return self.config
@@ -0,0 +1,293 @@
+"""
+近似重复页面检测
+使用 NumPy 计算感知哈希（dHash / pHash），为已处理的页面建立索引。
+重新编码或缩放后的同一页面可直接复用之前的文本块，避免再次调用 LLM。
+全局哈希相近只说明整体构图相似，同一角色的相邻分镜也可能满足，因此复用还要求：
+宽高比几乎一致（文本块使用归一化坐标 bbox_norm，按新尺寸换算时不会因裁剪或留白而错位）、
+2x2 分区哈希逐块相近（只有局部文字不同的页面会在对应分区产生差异），
+且默认只在同一文件夹内复用。
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+try:
+    from PIL import Image
+
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    Image = None
+HASH_METHODS = ("dhash", "phash")
+REGION_GRID = 2
+_PHASH_SIZE = 32
+_PHASH_LOW_FREQ = 8
+_dct_matrix_cache = None
+
+
+def _get_dct_matrix():
+    global _dct_matrix_cache
+    if _dct_matrix_cache is None:
+        n = _PHASH_SIZE
+        k = np.arange(n).reshape(-1, 1)
+        i = np.arange(n).reshape(1, -1)
+        matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+        matrix[0, :] = np.sqrt(1.0 / n)
+        _dct_matrix_cache = matrix
+    return _dct_matrix_cache
+
+
+def _bits_to_int(bits) -> int:
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bool(bit))
+    return value
+
+
+def compute_dhash(pil_image) -> int:
+    """64 位差值哈希：比较 9x8 灰度缩略图中相邻像素的亮度"""
+    gray = pil_image.convert("L").resize((9, 8), Image.Resampling.BOX)
+    pixels = np.asarray(gray, dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def compute_phash(pil_image) -> int:
+    """64 位 DCT 感知哈希：取 32x32 灰度图 DCT 的低频 8x8 分量与中位数比较"""
+    gray = pil_image.convert("L").resize(
+        (_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.BOX
+    )
+    pixels = np.asarray(gray, dtype=np.float32)
+    dct_matrix = _get_dct_matrix()
+    dct = dct_matrix @ pixels @ dct_matrix.T
+    low_freq = dct[:_PHASH_LOW_FREQ, :_PHASH_LOW_FREQ]
+    median = np.median(low_freq.flatten()[1:])
+    return _bits_to_int(low_freq > median)
+
+
+def compute_region_hashes(pil_image, grid: int = REGION_GRID) -> list[int]:
+    """把图片分为 grid x grid 个区域，分别计算 dHash"""
+    width, height = pil_image.size
+    region_hashes = []
+    for row in range(grid):
+        for col in range(grid):
+            box = (
+                width * col // grid,
+                height * row // grid,
+                max(width * (col + 1) // grid, width * col // grid + 1),
+                max(height * (row + 1) // grid, height * row // grid + 1),
+            )
+            region_hashes.append(compute_dhash(pil_image.crop(box)))
+    return region_hashes
+
+
+def compute_perceptual_hash(pil_image, method: str = "dhash") -> int | None:
+    if not NUMPY_AVAILABLE or not PILLOW_AVAILABLE or pil_image is None:
+        return None
+    try:
+        if method == "phash":
+            return compute_phash(pil_image)
+        return compute_dhash(pil_image)
+    except Exception as e:
+        print(f"警告: 计算感知哈希失败: {e}")
+        return None
+
+
+def compute_page_hashes(
+    pil_image, method: str = "dhash"
+) -> tuple[int | None, list[int] | None]:
+    """返回 (全局感知哈希, 分区哈希)，依赖缺失或计算失败时为 (None, None)"""
+    perceptual_hash = compute_perceptual_hash(pil_image, method)
+    if perceptual_hash is None:
+        return None, None
+    try:
+        return perceptual_hash, compute_region_hashes(pil_image)
+    except Exception as e:
+        print(f"警告: 计算分区哈希失败: {e}")
+        return None, None
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def max_region_distance(hashes_a: list[int], hashes_b: list[int]) -> int:
+    """分区哈希中差异最大的一块的汉明距离；分区数不同时视为完全不同"""
+    if not hashes_a or len(hashes_a) != len(hashes_b):
+        return 64
+    return max(hamming_distance(a, b) for a, b in zip(hashes_a, hashes_b))
+
+
+class NearDuplicateIndex:
+    """
+    线程安全的感知哈希索引，持久化为单个 JSON 文件。
+    条目按请求参数 (identity_key) 隔离，只有 Prompt/模型/语言等完全一致的页面才会被复用；
+    allow_cross_folder 为 False 时只匹配同一文件夹中的页面。
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        max_distance: int = 4,
+        max_aspect_ratio_diff: float = 0.01,
+        max_entries: int = 2000,
+        max_region_distance: int = 3,
+        allow_cross_folder: bool = False,
+    ):
+        self.index_path = index_path
+        self.max_distance = max(0, max_distance)
+        self.max_aspect_ratio_diff = max(0.0, max_aspect_ratio_diff)
+        self.max_entries = max(1, max_entries)
+        self.max_region_distance = max(0, max_region_distance)
+        self.allow_cross_folder = allow_cross_folder
+        self.calls_avoided = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+        self._entries: list[dict] = []
+        self._dirty = False
+        self._last_saved = time.time()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._entries = [
+                entry
+                for entry in data.get("entries", [])
+                if isinstance(entry, dict)
+                and "hash" in entry
+                and "blocks" in entry
+                and entry.get("region_hashes")
+                and "source_dir" in entry
+            ]
+        except (OSError, ValueError) as e:
+            print(f"警告: 读取近似重复索引失败: {e}")
+            self._entries = []
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"entries": self._entries}, ensure_ascii=False)
+            self._dirty = False
+            self._last_saved = time.time()
+        try:
+            index_dir = os.path.dirname(self.index_path)
+            if index_dir:
+                os.makedirs(index_dir, exist_ok=True)
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"警告: 保存近似重复索引失败: {e}")
+
+    @staticmethod
+    def _get_source_dir(source_path: str) -> str:
+        return os.path.normcase(os.path.dirname(os.path.abspath(source_path)))
+
+    def find(
+        self,
+        perceptual_hash: int,
+        region_hashes: list[int],
+        identity_key: str,
+        image_size: tuple[int, int],
+        source_path: str,
+    ) -> tuple[list[dict], str] | None:
+        """
+        返回最相近页面的中间块副本及该页面的路径，未找到时返回 None。
+        候选必须宽高比一致、全局哈希与每个分区哈希都在阈值内。
+        """
+        width, height = image_size
+        if width <= 0 or height <= 0:
+            return None
+        aspect_ratio = width / height
+        source_dir = self._get_source_dir(source_path)
+        with self._lock:
+            self.lookups += 1
+            best_entry, best_distance = None, self.max_distance + 1
+            for entry in self._entries:
+                if entry["identity_key"] != identity_key:
+                    continue
+                if not self.allow_cross_folder and entry["source_dir"] != source_dir:
+                    continue
+                entry_aspect = entry["width"] / max(1, entry["height"])
+                if abs(entry_aspect - aspect_ratio) / entry_aspect > (
+                    self.max_aspect_ratio_diff
+                ):
+                    continue
+                distance = hamming_distance(perceptual_hash, entry["hash"])
+                if distance >= best_distance:
+                    continue
+                if (
+                    max_region_distance(region_hashes, entry["region_hashes"])
+                    > self.max_region_distance
+                ):
+                    continue
+                best_entry, best_distance = entry, distance
+            if best_entry is None:
+                return None
+            best_entry["last_used"] = time.time()
+            self.calls_avoided += 1
+            self._dirty = True
+            return (
+                json.loads(json.dumps(best_entry["blocks"])),
+                best_entry["source_path"],
+            )
+
+    def add(
+        self,
+        perceptual_hash: int,
+        region_hashes: list[int],
+        identity_key: str,
+        image_size: tuple[int, int],
+        blocks: list[dict],
+        source_path: str,
+    ):
+        entry = {
+            "hash": perceptual_hash,
+            "region_hashes": list(region_hashes),
+            "identity_key": identity_key,
+            "source_path": os.path.abspath(source_path),
+            "source_dir": self._get_source_dir(source_path),
+            "width": image_size[0],
+            "height": image_size[1],
+            "blocks": blocks,
+            "last_used": time.time(),
+        }
+        with self._lock:
+            self._entries = [
+                existing
+                for existing in self._entries
+                if not (
+                    existing["identity_key"] == identity_key
+                    and existing["hash"] == perceptual_hash
+                )
+            ]
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                self._entries.sort(key=lambda item: item.get("last_used", 0))
+                self._entries = self._entries[-self.max_entries :]
+            self._dirty = True
+            should_save = time.time() - self._last_saved > 10.0
+        if should_save:
+            self.save()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "calls_avoided": self.calls_avoided,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,331 @@
+"""
+批量处理流水线
+将每一页的处理拆分为 解码/预处理 → LLM 请求 → 排版/渲染 → 编码保存 四个阶段，
+阶段之间通过有界队列连接，使下一页的 CPU 阶段与当前页的网络请求重叠执行。
+"""
+
+import os
+import queue
+import threading
+import time
+import traceback
+from core.config import ConfigManager
+from core.processor import (
+    ImageProcessor,
+    ProcessingResult,
+    fill_block_display_defaults,
+)
+from utils.image import PILLOW_AVAILABLE, draw_processed_blocks_pil
+from utils.tracing import Tracer
+
+if PILLOW_AVAILABLE:
+    from PIL import Image
+
+_STAGE_SENTINEL = object()
+STAGE_DECODE = "decode"
+STAGE_LLM = "llm"
+STAGE_RENDER = "render"
+STAGE_ENCODE = "encode"
+
+
+class PageJob:
+    """流水线中单页的工作状态，在各阶段之间传递"""
+
+    def __init__(
+        self,
+        index: int,
+        image_path: str,
+        output_dir: str,
+        tracer: Tracer | None = None,
+    ):
+        self.index = index
+        self.image_path = image_path
+        self.output_dir = output_dir
+        self.result = ProcessingResult(image_path, tracer=tracer)
+        self.started_at = time.perf_counter()
+        self.pil_image_for_llm = None
+        self.intermediate_blocks: list[dict] | None = None
+        self.rendered_image = None
+        self.output_path: str | None = None
+        self.success = False
+        self.message = ""
+
+
+class _PipelineStage:
+    def __init__(self, name: str, handler, worker_count: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.worker_count = max(1, worker_count)
+        self.input_queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.next_stage: "_PipelineStage | None" = None
+        self.active_count = 0
+        self.finished_workers = 0
+        self.error_count = 0
+        self.lock = threading.Lock()
+        self.threads: list[threading.Thread] = []
+
+
+def build_output_path(image_path: str, output_dir: str) -> str:
+    base, ext = os.path.splitext(os.path.basename(image_path))
+    output_filename = f"{base}_translated{ext if ext.lower() in ['.png', '.jpg', '.jpeg', '.bmp'] else '.png'}"
+    return os.path.join(output_dir, output_filename)
+
+
+def save_rendered_image(pil_image, output_path: str):
+    save_format = "PNG"
+    if output_path.lower().endswith((".jpg", ".jpeg")):
+        save_format = "JPEG"
+    elif output_path.lower().endswith(".bmp"):
+        save_format = "BMP"
+    if save_format == "JPEG" and pil_image.mode == "RGBA":
+        bg = Image.new("RGB", pil_image.size, (255, 255, 255))
+        bg.paste(pil_image, mask=pil_image.split()[3])
+        bg.save(output_path, save_format, quality=95)
+    else:
+        pil_image.save(output_path, save_format)
+
+
+class BatchPipeline:
+    """
+    有界队列连接的多阶段批处理引擎。
+    on_page_done(job) 在任意阶段线程中被调用，每页恰好一次。
+    """
+
+    def __init__(
+        self,
+        image_processor: ImageProcessor,
+        config_manager: ConfigManager,
+        output_dir: str,
+        cancellation_event: threading.Event | None = None,
+        on_page_done=None,
+        tracer: Tracer | None = None,
+    ):
+        self.image_processor = image_processor
+        self.config_manager = config_manager
+        self.output_dir = output_dir
+        self.cancellation_event = cancellation_event or threading.Event()
+        self.on_page_done = on_page_done
+        self.tracer = tracer
+        queue_size = max(
+            1, self.config_manager.getint("Batch", "stage_queue_size", fallback=2)
+        )
+        self.stages: list[_PipelineStage] = [
+            _PipelineStage(
+                STAGE_DECODE,
+                self._run_decode_stage,
+                self.config_manager.getint("Batch", "decode_workers", fallback=1),
+                queue_size,
+            ),
+            _PipelineStage(
+                STAGE_LLM,
+                self._run_llm_stage,
+                self.config_manager.getint("Batch", "max_concurrent_pages", fallback=3),
+                queue_size,
+            ),
+            _PipelineStage(
+                STAGE_RENDER,
+                self._run_render_stage,
+                self.config_manager.getint("Batch", "render_workers", fallback=1),
+                queue_size,
+            ),
+            _PipelineStage(
+                STAGE_ENCODE,
+                self._run_encode_stage,
+                self.config_manager.getint("Batch", "encode_workers", fallback=1),
+                queue_size,
+            ),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self._feeder_thread: threading.Thread | None = None
+        self._done_event = threading.Event()
+
+    def start(self, file_paths: list[str]):
+        for stage in self.stages:
+            for worker_index in range(stage.worker_count):
+                thread = threading.Thread(
+                    target=self._stage_worker_loop,
+                    args=(stage,),
+                    name=f"BatchPipeline-{stage.name}-{worker_index}",
+                    daemon=True,
+                )
+                stage.threads.append(thread)
+                thread.start()
+        self._feeder_thread = threading.Thread(
+            target=self._feed,
+            args=(list(file_paths),),
+            name="BatchPipeline-feeder",
+            daemon=True,
+        )
+        self._feeder_thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """等待所有阶段结束，返回流水线是否已经完成"""
+        return self._done_event.wait(timeout)
+
+    def get_queue_depths(self) -> dict[str, int]:
+        return {stage.name: stage.input_queue.qsize() for stage in self.stages}
+
+    def get_stage_stats(self) -> dict[str, dict[str, int]]:
+        return {
+            stage.name: {
+                "queued": stage.input_queue.qsize(),
+                "active": stage.active_count,
+                "workers": stage.worker_count,
+                "errors": stage.error_count,
+            }
+            for stage in self.stages
+        }
+
+    def _feed(self, file_paths: list[str]):
+        first_stage = self.stages[0]
+        for index, image_path in enumerate(file_paths):
+            job = PageJob(index, image_path, self.output_dir, tracer=self.tracer)
+            while True:
+                if self.cancellation_event.is_set():
+                    break
+                try:
+                    first_stage.input_queue.put(job, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if self.cancellation_event.is_set():
+                break
+        for _ in range(first_stage.worker_count):
+            first_stage.input_queue.put(_STAGE_SENTINEL)
+
+    def _stage_worker_loop(self, stage: _PipelineStage):
+        while True:
+            job = stage.input_queue.get()
+            if job is _STAGE_SENTINEL:
+                with stage.lock:
+                    stage.finished_workers += 1
+                    is_last_worker = stage.finished_workers == stage.worker_count
+                if is_last_worker:
+                    if stage.next_stage:
+                        for _ in range(stage.next_stage.worker_count):
+                            stage.next_stage.input_queue.put(_STAGE_SENTINEL)
+                    else:
+                        self._done_event.set()
+                return
+            with stage.lock:
+                stage.active_count += 1
+            try:
+                should_continue = self._run_stage_handler(stage, job)
+            finally:
+                with stage.lock:
+                    stage.active_count -= 1
+            if should_continue and stage.next_stage:
+                stage.next_stage.input_queue.put(job)
+            else:
+                job.success = should_continue
+                self._complete_job(job)
+
+    def _run_stage_handler(self, stage: _PipelineStage, job: PageJob) -> bool:
+        if self.cancellation_event.is_set():
+            job.result.cancelled = True
+            job.message = "处理已取消。"
+            return False
+        try:
+            return stage.handler(job)
+        except Exception as e:
+            self._record_stage_error(stage, job, e)
+            return False
+
+    def _record_stage_error(
+        self, stage: _PipelineStage, job: PageJob, error: Exception
+    ):
+        """阶段处理函数抛出的意外异常计入阶段统计，并作为该页的处理错误返回"""
+        with stage.lock:
+            stage.error_count += 1
+        job.result.error = f"处理时发生意外错误 ({stage.name}) {error}"
+        job.message = job.result.error
+        print(
+            f"BatchPipeline: {os.path.basename(job.image_path)} 在 {stage.name} "
+            f"阶段出错: {error}\n{traceback.format_exc()}"
+        )
+
+    def _complete_job(self, job: PageJob):
+        job.pil_image_for_llm = None
+        job.rendered_image = None
+        if self.tracer:
+            self.tracer.add_span(
+                "page",
+                job.started_at,
+                time.perf_counter(),
+                category="page",
+                args={
+                    "page": os.path.basename(job.image_path),
+                    "success": job.success,
+                    "cache_hit": job.result.cache_hit,
+                },
+            )
+        if self.on_page_done:
+            try:
+                self.on_page_done(job)
+            except Exception as e:
+                print(f"BatchPipeline: on_page_done 回调出错: {e}")
+
+    def _run_decode_stage(self, job: PageJob) -> bool:
+        pil_image_original = self.image_processor.load_image(job.result)
+        if pil_image_original is None:
+            job.message = job.result.error or f"处理失败: {os.path.basename(job.image_path)}"
+            return False
+        job.result.image = pil_image_original
+        job.pil_image_for_llm = self.image_processor.prepare_llm_image(
+            pil_image_original, job.result
+        )
+        return True
+
+    def _run_llm_stage(self, job: PageJob) -> bool:
+        job.intermediate_blocks = self.image_processor.request_intermediate_blocks(
+            job.pil_image_for_llm,
+            job.result,
+            cancellation_event=self.cancellation_event,
+        )
+        return self._finish_llm_stage(job)
+
+    def _finish_llm_stage(self, job: PageJob) -> bool:
+        job.pil_image_for_llm = None
+        if self.image_processor._check_cancelled(job.result, self.cancellation_event):
+            job.message = "处理已取消。"
+            return False
+        if job.intermediate_blocks is None:
+            job.message = job.result.error or f"处理失败: {os.path.basename(job.image_path)}"
+            return False
+        return True
+
+    def _run_render_stage(self, job: PageJob) -> bool:
+        blocks = self.image_processor.build_processed_blocks(
+            job.intermediate_blocks, job.result.image, job.result
+        )
+        self.image_processor.remember_translations(job.result)
+        job.intermediate_blocks = None
+        for block in blocks:
+            fill_block_display_defaults(block)
+        stage_start = time.perf_counter()
+        job.rendered_image = draw_processed_blocks_pil(
+            job.result.image, blocks, self.config_manager
+        )
+        job.result.record_timing("render", stage_start, blocks=len(blocks))
+        if not job.rendered_image:
+            last_proc_error = job.result.error
+            job.message = f"绘制文本块失败: {os.path.basename(job.image_path)}" + (
+                f" (原始处理错误: {last_proc_error})" if last_proc_error else ""
+            )
+            return False
+        return True
+
+    def _run_encode_stage(self, job: PageJob) -> bool:
+        output_path = build_output_path(job.image_path, job.output_dir)
+        stage_start = time.perf_counter()
+        try:
+            save_rendered_image(job.rendered_image, output_path)
+        except Exception as e:
+            job.message = f"保存失败 {output_path}: {e}"
+            return False
+        finally:
+            job.result.record_timing("save", stage_start)
+        job.output_path = output_path
+        job.message = output_path
+        return True
@@ -1,12 +1,32 @@
 import os
+import math
+import asyncio
 import time
 import json
 import sys
 import threading
-import base64
+import hashlib
+import importlib.util
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from core.config import ConfigManager
+from core.settings import RenderSettings, get_render_settings
+from core.cache import ResultCache, compute_cache_key, get_default_cache_dir
+from core.translation_memory import TranslationMemory, compute_glossary_version
+from core.tiling import (
+    plan_tiles,
+    map_tile_blocks_to_page,
+    deduplicate_tile_blocks,
+)
+from core.near_duplicate import (
+    HASH_METHODS,
+    NearDuplicateIndex,
+    compute_page_hashes,
+)
 from utils.image import _render_single_block_pil_for_preview
+from utils.preprocess import preprocess_llm_image
+from utils.prompts import is_two_stage_enabled
+from utils.tracing import Tracer
 from utils.font import (
     PILLOW_AVAILABLE,
     get_pil_font,
@@ -17,15 +37,23 @@ from utils.font import (
 if PILLOW_AVAILABLE:
     from PIL import Image, ImageDraw, ImageFont
 from services.gemini import GeminiMultimodalProvider, GENAI_LIB_AVAILABLE
+from services.cassette import get_cassette
+from services.hedging import HedgedProvider
 from services.openai import OpenAIProvider
+from services.packing import PagePacker
+from services.router import (
+    ProviderRouter,
+    build_provider_router,
+    is_routed_result,
+    parse_config_list,
+)
+from services.rate_limit import build_retry_policy, get_all_rate_limit_stats
+from services.translation import get_translation_provider
+from services.upload_encoding import get_upload_encoding_settings
 
-try:
-    import numpy as np
-
-    NUMPY_AVAILABLE = True
-except ImportError:
-    NUMPY_AVAILABLE = False
-    print("警告: 未安装 numpy 库。LLM图像对比度增强功能将不可用。")
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+if not NUMPY_AVAILABLE:
+    print("警告: 未安装 numpy 库。近似重复页面检测所需的感知哈希将不可用。")
 
 
 class ProcessedBlock:
@@ -77,6 +105,65 @@ class ProcessedBlock:
         )
 
 
+def fill_block_display_defaults(block):
+    """补齐编辑器和渲染所需、模型结果中没有的显示属性"""
+    if not hasattr(block, "main_color"):
+        block.main_color = None
+    if not hasattr(block, "outline_color"):
+        block.outline_color = None
+    if not hasattr(block, "background_color"):
+        block.background_color = None
+    if not hasattr(block, "outline_thickness"):
+        block.outline_thickness = None
+    if not hasattr(block, "shape_type"):
+        block.shape_type = "box"
+
+
+class ProcessingResult:
+    """单页处理结果，承载图像、文本块、错误信息和各阶段耗时（秒）"""
+
+    def __init__(self, image_path: str, tracer: Tracer | None = None):
+        self.image_path = image_path
+        self.tracer = tracer
+        self.image: Image.Image | None = None
+        self.blocks: list[ProcessedBlock] | None = None
+        self.error: str | None = None
+        # 流式响应中断或超时时只保留了部分文本块，记录原因供界面提示
+        self.partial_error: str | None = None
+        self.cancelled = False
+        self.timings: dict[str, float] = {}
+        self.image_sha256: str | None = None
+        self.perceptual_hash: int | None = None
+        self.region_hashes: list[int] | None = None
+        self.cache_hit = False
+        self.near_duplicate_hit = False
+        self.language_pair: tuple[str, str] | None = None
+
+    def record_timing(self, stage: str, start: float, **args):
+        """记录阶段耗时，并在设置了追踪器时写入对应的 span"""
+        end = time.perf_counter()
+        self.timings[stage] = end - start
+        if self.tracer:
+            self.tracer.add_span(
+                stage,
+                start,
+                end,
+                args={"page": os.path.basename(self.image_path), **args},
+            )
+
+    @property
+    def succeeded(self) -> bool:
+        return (
+            not self.cancelled and self.image is not None and self.blocks is not None
+        )
+
+    def __repr__(self):
+        return (
+            f"ProcessingResult(path='{self.image_path}', blocks={len(self.blocks) if self.blocks is not None else None}, "
+            f"error={self.error!r}, cancelled={self.cancelled}, timings={self.timings})"
+        )
+
+
 class ImageProcessor:
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
@@ -84,34 +171,41 @@ class ImageProcessor:
         self.dependencies = self._check_internal_dependencies()
         self.gemini_provider = GeminiMultimodalProvider(self.config_manager)
         self.openai_provider = OpenAIProvider(self.config_manager)
+        self.provider_override = None
+        self.provider_override_name = "override"
+        self.page_packers: dict[str, PagePacker] = {}
+        self._page_packers_lock = threading.Lock()
+        self.hedged_providers: dict[tuple, HedgedProvider] = {}
+        self._hedged_providers_lock = threading.Lock()
+        self.provider_router: ProviderRouter | None = None
+        self._provider_router_name: str | None = None
+        self._provider_router_lock = threading.Lock()
+        self.text_translation_provider = None
+        self._text_translation_lock = threading.Lock()
+        self.result_cache = self._build_result_cache()
+        self.translation_memory = self._build_translation_memory()
+        self.near_duplicate_hash_method = "dhash"
+        self.near_duplicate_index = self._build_near_duplicate_index()
         self._apply_proxy_settings_to_env()
-        self.font_size_mapping = {
-            "very_small": self.config_manager.getint(
-                "FontSizeMapping", "very_small", 12
-            ),
-            "small": self.config_manager.getint("FontSizeMapping", "small", 16),
-            "medium": self.config_manager.getint("FontSizeMapping", "medium", 22),
-            "large": self.config_manager.getint("FontSizeMapping", "large", 28),
-            "very_large": self.config_manager.getint(
-                "FontSizeMapping", "very_large", 36
-            ),
-        }
 
     def reload_config(self):
         self.gemini_provider.reload_client()
         self.openai_provider.reload_client()
+        self._close_provider_router()
+        with self._text_translation_lock:
+            self.text_translation_provider = None
+            # 不关闭旧实例：其他线程可能仍在使用它，最后一个引用释放后连接随对象一起关闭
+            if (
+                self.translation_memory is None
+                or self._get_translation_memory_settings()
+                != self.translation_memory_settings
+            ):
+                self.translation_memory = self._build_translation_memory()
+        self.result_cache = self._build_result_cache()
+        if self.near_duplicate_index:
+            self.near_duplicate_index.save()
+        self.near_duplicate_index = self._build_near_duplicate_index()
         self._apply_proxy_settings_to_env()
-        self.font_size_mapping = {
-            "very_small": self.config_manager.getint(
-                "FontSizeMapping", "very_small", 12
-            ),
-            "small": self.config_manager.getint("FontSizeMapping", "small", 16),
-            "medium": self.config_manager.getint("FontSizeMapping", "medium", 22),
-            "large": self.config_manager.getint("FontSizeMapping", "large", 28),
-            "very_large": self.config_manager.getint(
-                "FontSizeMapping", "very_large", 36
-            ),
-        }
 
     def _apply_proxy_settings_to_env(self):
         if self.config_manager.getboolean("Proxy", "enabled", fallback=False):
@@ -136,6 +230,436 @@ class ImageProcessor:
             ):
                 del os.environ["HTTP_PROXY"]
 
+    def _build_result_cache(self) -> ResultCache | None:
+        if not self.config_manager.getboolean("Cache", "enabled", fallback=True):
+            return None
+        cache_dir = self.config_manager.get(
+            "Cache", "cache_dir", fallback=""
+        ).strip() or get_default_cache_dir("results")
+        max_size_mb = self.config_manager.getint("Cache", "max_size_mb", fallback=200)
+        return ResultCache(cache_dir, max_size_mb * 1024 * 1024)
+
+    def _get_translation_memory_settings(self) -> tuple | None:
+        """返回 (数据库路径, 模糊匹配阈值)，未启用时返回 None"""
+        if not self.config_manager.getboolean(
+            "TranslationMemory", "enabled", fallback=True
+        ):
+            return None
+        db_path = self.config_manager.get(
+            "TranslationMemory", "db_path", fallback=""
+        ).strip()
+        if not db_path:
+            cache_dir = self.config_manager.get(
+                "Cache", "cache_dir", fallback=""
+            ).strip() or get_default_cache_dir("results")
+            db_path = os.path.join(
+                os.path.dirname(cache_dir), "translation_memory.sqlite3"
+            )
+        return (
+            os.path.abspath(db_path),
+            self.config_manager.getfloat(
+                "TranslationMemory", "fuzzy_threshold", fallback=0.75
+            ),
+        )
+
+    def _build_translation_memory(self) -> TranslationMemory | None:
+        self.translation_memory_settings = self._get_translation_memory_settings()
+        if self.translation_memory_settings is None:
+            return None
+        db_path, fuzzy_threshold = self.translation_memory_settings
+        try:
+            return TranslationMemory(db_path, fuzzy_threshold=fuzzy_threshold)
+        except Exception as e:
+            print(f"警告: 打开翻译记忆库失败，翻译记忆不可用: {e}")
+            return None
+
+    def set_provider_override(self, provider, name: str = "override"):
+        """使用指定的 Provider 代替配置中的 Provider（用于基准测试），传入 None 恢复"""
+        self.provider_override = provider
+        self.provider_override_name = name
+
+    def _get_active_provider(self):
+        if self.provider_override is not None:
+            return self.provider_override_name, self.provider_override
+        ocr_provider = self.config_manager.get(
+            "API", "ocr_provider", fallback="gemini"
+        ).lower()
+        if ocr_provider != "openai":
+            ocr_provider = "gemini"
+        if self.config_manager.getboolean("Routing", "enabled", fallback=False):
+            return ocr_provider, self._get_provider_router(ocr_provider)
+        if ocr_provider == "openai":
+            return "openai", self.openai_provider
+        return "gemini", self.gemini_provider
+
+    def _create_extra_endpoint_providers(self, provider_name: str) -> list[tuple]:
+        """按 GeminiAPI.extra_api_keys / OpenAIAPI.extra_base_urls 等配置创建额外端点"""
+        if provider_name == "gemini":
+            return [
+                (
+                    f"GeminiAPI#{index + 2}",
+                    GeminiMultimodalProvider(
+                        self.config_manager,
+                        api_key=api_key,
+                        endpoint_name=f"GeminiAPI#{index + 2}",
+                    ),
+                )
+                for index, api_key in enumerate(
+                    parse_config_list(
+                        self.config_manager.get(
+                            "GeminiAPI", "extra_api_keys", fallback=""
+                        )
+                    )
+                )
+            ]
+        base_urls = parse_config_list(
+            self.config_manager.get("OpenAIAPI", "extra_base_urls", fallback="")
+        )
+        api_keys = parse_config_list(
+            self.config_manager.get("OpenAIAPI", "extra_api_keys", fallback="")
+        )
+        extra_providers = []
+        for index, base_url in enumerate(base_urls):
+            endpoint_name = f"OpenAIAPI#{index + 2}"
+            extra_providers.append(
+                (
+                    endpoint_name,
+                    OpenAIProvider(
+                        self.config_manager,
+                        base_url=base_url,
+                        api_key=api_keys[index] if index < len(api_keys) else None,
+                        endpoint_name=endpoint_name,
+                    ),
+                )
+            )
+        return extra_providers
+
+    def _get_provider_router(self, provider_name: str) -> ProviderRouter:
+        with self._provider_router_lock:
+            if (
+                self.provider_router is None
+                or self._provider_router_name != provider_name
+            ):
+                self._close_provider_router_locked()
+                self.provider_router = build_provider_router(
+                    self.config_manager,
+                    provider_name,
+                    {"gemini": self.gemini_provider, "openai": self.openai_provider},
+                    self._create_extra_endpoint_providers,
+                )
+                self._provider_router_name = provider_name
+            return self.provider_router
+
+    def _close_provider_router(self):
+        with self._provider_router_lock:
+            self._close_provider_router_locked()
+
+    def _close_provider_router_locked(self):
+        if self.provider_router is None:
+            return
+        for endpoint in self.provider_router.endpoints:
+            if endpoint.provider not in (self.gemini_provider, self.openai_provider):
+                close = getattr(endpoint.provider, "close", None)
+                if close is not None:
+                    close()
+        self.provider_router = None
+        self._provider_router_name = None
+
+    def _get_packing_provider(self, provider_name: str, provider):
+        """启用多页打包时返回包装后的 Provider；录制/回放响应时不打包"""
+        if not self.config_manager.getboolean("Packing", "enabled", fallback=False):
+            return provider
+        if get_cassette(self.config_manager) is not None:
+            return provider
+        with self._page_packers_lock:
+            page_packer = self.page_packers.get(provider_name)
+            if page_packer is None or page_packer.provider is not provider:
+                page_packer = PagePacker(provider)
+                self.page_packers[provider_name] = page_packer
+        page_packer.configure(self.config_manager)
+        return page_packer
+
+    def get_packing_stats(self) -> dict:
+        with self._page_packers_lock:
+            page_packers = dict(self.page_packers)
+        return {
+            provider_name: page_packer.get_stats()
+            for provider_name, page_packer in page_packers.items()
+        }
+
+    def _get_hedged_provider(self, provider_name: str, provider):
+        """启用对冲请求时返回包装后的 Provider，否则原样返回"""
+        if not self.config_manager.getboolean("Hedging", "enabled", fallback=False):
+            return provider
+        hedge_name = (
+            self.config_manager.get("Hedging", "hedge_provider", fallback="")
+            .strip()
+            .lower()
+        )
+        if hedge_name == "openai":
+            hedge_provider = self.openai_provider
+        elif hedge_name == "gemini":
+            hedge_provider = self.gemini_provider
+        else:
+            hedge_name, hedge_provider = provider_name, provider
+        with self._hedged_providers_lock:
+            hedged_provider = self.hedged_providers.get((provider_name, hedge_name))
+            if (
+                hedged_provider is None
+                or hedged_provider.primary_provider is not provider
+            ):
+                hedged_provider = HedgedProvider(provider, hedge_provider, hedge_name)
+                self.hedged_providers[(provider_name, hedge_name)] = hedged_provider
+        hedged_provider.configure(self.config_manager)
+        return hedged_provider
+
+    def _get_upload_budget_scale(
+        self, image_size: tuple[int, int], pre_scale: float = 1.0
+    ) -> float:
+        """
+        计算满足上传像素预算所需的缩放系数（<= 1.0）。
+        预算作用于单次请求的图像，启用分块时按最大分块计算，避免长条图被整体缩小。
+        预算属于 LLM 图像预处理，未启用预处理时不缩小图像。
+        """
+        max_long_edge = self.config_manager.getint(
+            "LLMImagePreprocessing", "max_upload_long_edge", fallback=0
+        )
+        max_pixels = self.config_manager.getint(
+            "LLMImagePreprocessing", "max_upload_pixels", fallback=0
+        )
+        if (max_long_edge <= 0 and max_pixels <= 0) or not (
+            self.config_manager.getboolean(
+                "LLMImagePreprocessing", "enabled", fallback=False
+            )
+        ):
+            return 1.0
+        scaled_width = max(1, int(image_size[0] * pre_scale))
+        scaled_height = max(1, int(image_size[1] * pre_scale))
+        tiles = self._plan_llm_tiles((scaled_width, scaled_height))
+        tile_width = max(right - left for left, _, right, _ in tiles)
+        tile_height = max(bottom - top for _, top, _, bottom in tiles)
+        scale = 1.0
+        if max_long_edge > 0:
+            scale = min(scale, max_long_edge / max(tile_width, tile_height))
+        if max_pixels > 0:
+            scale = min(scale, math.sqrt(max_pixels / (tile_width * tile_height)))
+        return max(scale, 1e-3)
+
+    def _get_preprocessing_identity(self) -> dict:
+        return {
+            "enabled": self.config_manager.getboolean(
+                "LLMImagePreprocessing", "enabled", fallback=False
+            ),
+            "upscale_factor": self.config_manager.getfloat(
+                "LLMImagePreprocessing", "upscale_factor", fallback=1.0
+            ),
+            "contrast_factor": self.config_manager.getfloat(
+                "LLMImagePreprocessing", "contrast_factor", fallback=1.0
+            ),
+            "upscale_resample_method": self.config_manager.get(
+                "LLMImagePreprocessing", "upscale_resample_method", "LANCZOS"
+            ).upper(),
+            "max_upload_long_edge": self.config_manager.getint(
+                "LLMImagePreprocessing", "max_upload_long_edge", fallback=0
+            ),
+            "max_upload_pixels": self.config_manager.getint(
+                "LLMImagePreprocessing", "max_upload_pixels", fallback=0
+            ),
+            "grayscale": self.config_manager.getboolean(
+                "LLMImagePreprocessing", "grayscale", fallback=False
+            ),
+            "sharpen_amount": self.config_manager.getfloat(
+                "LLMImagePreprocessing", "sharpen_amount", fallback=0.0
+            ),
+        }
+
+    def _get_tiling_identity(self) -> dict:
+        """影响切块方式与合并结果的 Tiling 设置；并发数不影响结果，不计入"""
+        return {
+            "enabled": self.config_manager.getboolean(
+                "Tiling", "enabled", fallback=True
+            ),
+            "min_aspect_ratio": self.config_manager.getfloat(
+                "Tiling", "min_aspect_ratio", fallback=2.5
+            ),
+            "max_tile_aspect": self.config_manager.getfloat(
+                "Tiling", "max_tile_aspect", fallback=1.6
+            ),
+            "overlap_ratio": self.config_manager.getfloat(
+                "Tiling", "overlap_ratio", fallback=0.15
+            ),
+            "max_tile_pixels": self.config_manager.getint(
+                "Tiling", "max_tile_pixels", fallback=16000000
+            ),
+            "dedup_iou_threshold": self.config_manager.getfloat(
+                "Tiling", "dedup_iou_threshold", fallback=0.5
+            ),
+            "dedup_text_similarity": self.config_manager.getfloat(
+                "Tiling", "dedup_text_similarity", fallback=0.6
+            ),
+        }
+
+    def _get_cache_identity(self, provider) -> dict:
+        identity = provider.get_cache_identity()
+        identity["preprocessing"] = self._get_preprocessing_identity()
+        identity["tiling"] = self._get_tiling_identity()
+        identity["upload_encoding"] = get_upload_encoding_settings(self.config_manager)
+        return identity
+
+    def _build_near_duplicate_index(self) -> NearDuplicateIndex | None:
+        if not self.config_manager.getboolean(
+            "NearDuplicate", "enabled", fallback=False
+        ):
+            return None
+        if not NUMPY_AVAILABLE:
+            print("警告: 未安装 numpy 库，近似重复页面复用功能不可用。")
+            return None
+        self.near_duplicate_hash_method = self.config_manager.get(
+            "NearDuplicate", "hash_method", "dhash"
+        ).lower()
+        if self.near_duplicate_hash_method not in HASH_METHODS:
+            self.near_duplicate_hash_method = "dhash"
+        cache_dir = self.config_manager.get(
+            "Cache", "cache_dir", fallback=""
+        ).strip() or get_default_cache_dir("results")
+        return NearDuplicateIndex(
+            os.path.join(os.path.dirname(cache_dir), "near_duplicates.json"),
+            max_distance=self.config_manager.getint(
+                "NearDuplicate", "max_hamming_distance", fallback=4
+            ),
+            max_aspect_ratio_diff=self.config_manager.getfloat(
+                "NearDuplicate", "max_aspect_ratio_diff", fallback=0.01
+            ),
+            max_entries=self.config_manager.getint(
+                "NearDuplicate", "max_entries", fallback=2000
+            ),
+            max_region_distance=self.config_manager.getint(
+                "NearDuplicate", "max_region_distance", fallback=3
+            ),
+            allow_cross_folder=self.config_manager.getboolean(
+                "NearDuplicate", "allow_cross_folder", fallback=False
+            ),
+        )
+
+    def get_cache_stats(self) -> dict | None:
+        return self.result_cache.get_stats() if self.result_cache else None
+
+    def get_rate_limit_stats(self) -> dict:
+        return get_all_rate_limit_stats()
+
+    def get_routing_stats(self) -> dict | None:
+        provider_router = self.provider_router
+        return provider_router.get_stats() if provider_router else None
+
+    def get_hedge_stats(self) -> dict:
+        with self._hedged_providers_lock:
+            hedged_providers = dict(self.hedged_providers)
+        return {
+            f"{primary_name}->{hedge_name}": hedged_provider.get_stats()
+            for (primary_name, hedge_name), hedged_provider in hedged_providers.items()
+        }
+
+    def get_translation_memory_stats(self) -> dict | None:
+        translation_memory = self.translation_memory
+        return translation_memory.get_stats() if translation_memory else None
+
+    def export_translation_memory(self, file_path: str) -> int | None:
+        """导出翻译记忆为 JSON Lines 文件，未启用时返回 None"""
+        translation_memory = self.translation_memory
+        if not translation_memory:
+            return None
+        return translation_memory.export_entries(file_path)
+
+    def import_translation_memory(self, file_path: str) -> int | None:
+        """导入 JSON Lines 格式的翻译记忆，返回新增或更新的条目数，未启用时返回 None"""
+        translation_memory = self.translation_memory
+        if not translation_memory:
+            return None
+        return translation_memory.import_entries(file_path)
+
+    def _get_glossary_version(self) -> str:
+        return compute_glossary_version(
+            self.config_manager.get("GeminiAPI", "glossary_text", fallback="")
+        )
+
+    def apply_translation_memory(
+        self,
+        intermediate_blocks: list[dict],
+        result: ProcessingResult,
+        report_progress=None,
+    ) -> list[dict]:
+        """
+        单阶段（OCR 与翻译合并）模式下，用翻译记忆中完全相同原文的译文替换模型给出的译文，
+        使反复出现的台词在各页保持一致。返回新的中间块列表，不修改输入（它们可能来自结果缓存）。
+        仅在 TranslationMemory.override_fused 开启时生效，默认保留模型的新译文。
+        """
+        translation_memory = self.translation_memory
+        if not translation_memory or not intermediate_blocks or not result.language_pair:
+            return intermediate_blocks
+        if not self.config_manager.getboolean(
+            "TranslationMemory", "override_fused", fallback=False
+        ):
+            return intermediate_blocks
+        try:
+            remembered_translations = translation_memory.find_exact(
+                [block.get("original_text", "") for block in intermediate_blocks],
+                *result.language_pair,
+                self._get_glossary_version(),
+            )
+        except Exception as e:
+            print(f"警告: 查询翻译记忆失败: {e}")
+            return intermediate_blocks
+        hits = sum(
+            translation is not None for translation in remembered_translations
+        )
+        if not hits:
+            return intermediate_blocks
+        if report_progress:
+            report_progress(76, f"翻译记忆命中 {hits} 个文本块，使用已有译文。")
+        return [
+            dict(block, translated_text=translation) if translation else block
+            for block, translation in zip(intermediate_blocks, remembered_translations)
+        ]
+
+    def remember_translations(self, result: ProcessingResult):
+        """把一页最终的 ProcessedBlock 原文/译文写入翻译记忆"""
+        translation_memory = self.translation_memory
+        if not translation_memory or not result.blocks or not result.language_pair:
+            return
+        try:
+            translation_memory.add_many(
+                [
+                    (block.original_text, block.translated_text)
+                    for block in result.blocks
+                ],
+                *result.language_pair,
+                self._get_glossary_version(),
+            )
+        except Exception as e:
+            print(f"警告: 写入翻译记忆失败: {e}")
+
+    def get_near_duplicate_stats(self) -> dict | None:
+        if not self.near_duplicate_index:
+            return None
+        return self.near_duplicate_index.get_stats()
+
+    def save_caches(self):
+        if self.near_duplicate_index:
+            self.near_duplicate_index.save()
+
+    async def aclose_async_clients(self):
+        """关闭各 Provider 绑定当前事件循环的异步客户端"""
+        providers = [
+            self.gemini_provider,
+            self.openai_provider,
+            self.provider_override,
+            self.provider_router,
+        ]
+        for provider in providers:
+            aclose = getattr(provider, "aclose_async_client", None)
+            if aclose is not None:
+                await aclose()
+
     def _check_internal_dependencies(self):
         return {
             "pillow": PILLOW_AVAILABLE,
@@ -146,38 +670,14 @@ class ImageProcessor:
     def get_last_error(self) -> str | None:
         return self.last_error
 
-    def _encode_pil_image_to_base64(
-        self, pil_image: Image.Image, image_format="PNG"
-    ) -> str:
-        buffered = BytesIO()
-        save_format = image_format.upper()
-        if save_format not in ["PNG", "JPEG", "WEBP"]:
-            save_format = "PNG"
-        try:
-            if save_format == "JPEG":
-                if pil_image.mode == "RGBA" or pil_image.mode == "LA":
-                    rgb_image = pil_image.convert("RGB")
-                    rgb_image.save(buffered, format="JPEG", quality=90)
-                else:
-                    pil_image.save(buffered, format="JPEG", quality=90)
-            else:
-                pil_image.save(buffered, format=save_format)
-        except Exception as e:
-            print(
-                f"Warning: Error saving image to buffer with format {save_format}: {e}. Falling back to PNG."
-            )
-            pil_image.save(buffered, format="PNG")
-        img_byte = buffered.getvalue()
-        return base64.b64encode(img_byte).decode("utf-8")
-
     def _adjust_block_bbox_for_text_fit(
         self,
         block: ProcessedBlock,
         pil_font_for_calc: ImageFont.FreeTypeFont | ImageFont.ImageFont | None,
+        render_settings: RenderSettings | None = None,
     ):
-        if not self.config_manager.getboolean(
-            "UI", "auto_adjust_bbox_to_fit_text", fallback=True
-        ):
+        render_settings = render_settings or get_render_settings(self.config_manager)
+        if not render_settings.auto_adjust_bbox_to_fit_text:
             return
         if (
             not block.translated_text
@@ -186,19 +686,11 @@ class ImageProcessor:
             or not PILLOW_AVAILABLE
         ):
             return
-        text_padding = self.config_manager.getint("UI", "text_padding", 3)
-        h_char_spacing_px = self.config_manager.getint(
-            "UI", "h_text_char_spacing_px", 0
-        )
-        h_line_spacing_px = self.config_manager.getint(
-            "UI", "h_text_line_spacing_px", 0
-        )
-        v_char_spacing_px = self.config_manager.getint(
-            "UI", "v_text_char_spacing_px", 0
-        )
-        v_col_spacing_px = self.config_manager.getint(
-            "UI", "v_text_column_spacing_px", 0
-        )
+        text_padding = render_settings.text_padding
+        h_char_spacing_px = render_settings.h_char_spacing_px
+        h_line_spacing_px = render_settings.h_line_spacing_px
+        v_char_spacing_px = render_settings.v_char_spacing_px
+        v_col_spacing_px = render_settings.v_col_spacing_px
         current_bbox_width = block.bbox[2] - block.bbox[0]
         current_bbox_height = block.bbox[3] - block.bbox[1]
         if current_bbox_width <= 0 or current_bbox_height <= 0:
@@ -284,45 +776,149 @@ class ImageProcessor:
         progress_callback=None,
         cancellation_event: threading.Event = None,
     ) -> tuple[Image.Image, list[ProcessedBlock]] | None:
-        self.last_error = None
+        result = self.process_image_request(
+            image_path,
+            progress_callback=progress_callback,
+            cancellation_event=cancellation_event,
+        )
+        self.last_error = result.error
+        if not result.succeeded:
+            return None
+        return result.image, result.blocks
+
+    def _check_cancelled(
+        self, result: ProcessingResult, cancellation_event: threading.Event | None
+    ) -> bool:
+        if cancellation_event and cancellation_event.is_set():
+            result.error = "处理已取消。"
+            result.cancelled = True
+            return True
+        return False
+
+    def process_image_request(
+        self,
+        image_path: str,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer: Tracer | None = None,
+        block_callback=None,
+    ) -> ProcessingResult:
+        """
+        可重入的单页处理接口。所有状态都保存在返回的 ProcessingResult 中，
+        同一个 ImageProcessor 可以被多个线程同时调用。
+        block_callback(ProcessedBlock) 在流式响应每解析出一个文本块时被调用，用于提前预览。
+        """
+        result = ProcessingResult(image_path, tracer=tracer)
 
         def _report_progress(percentage, message):
             if progress_callback:
                 progress_callback(percentage, message)
 
-        def _check_cancelled():
-            if cancellation_event and cancellation_event.is_set():
-                self.last_error = "处理已取消。"
-                return True
-            return False
-
         _report_progress(0, f"开始处理: {os.path.basename(image_path)}")
-        if _check_cancelled():
-            return None
+        if self._check_cancelled(result, cancellation_event):
+            return result
+        pil_image_original = self.load_image(result, _report_progress)
+        if pil_image_original is None:
+            return result
+        if self._check_cancelled(result, cancellation_event):
+            return result
+        pil_image_for_llm = self.prepare_llm_image(
+            pil_image_original, result, _report_progress
+        )
+        if self._check_cancelled(result, cancellation_event):
+            return result
+        intermediate_block_callback = None
+        if block_callback:
+
+            def intermediate_block_callback(intermediate_block):
+                if "translated_text" not in intermediate_block:
+                    intermediate_block = dict(
+                        intermediate_block,
+                        translated_text=intermediate_block.get("original_text", ""),
+                    )
+                preview_blocks = self.build_processed_blocks(
+                    [intermediate_block],
+                    pil_image_original,
+                    ProcessingResult(image_path),
+                )
+                for preview_block in preview_blocks:
+                    block_callback(preview_block)
+
+        intermediate_blocks_for_processing = self.request_intermediate_blocks(
+            pil_image_for_llm,
+            result,
+            _report_progress,
+            cancellation_event,
+            block_callback=intermediate_block_callback,
+        )
+        del pil_image_for_llm
+        if self._check_cancelled(result, cancellation_event):
+            return result
+        if intermediate_blocks_for_processing is None:
+            return result
+        self.build_processed_blocks(
+            intermediate_blocks_for_processing,
+            pil_image_original,
+            result,
+            _report_progress,
+        )
+        self.remember_translations(result)
+        return result
+
+    def load_image(
+        self, result: ProcessingResult, report_progress=None
+    ) -> Image.Image | None:
+        """解码阶段：读取并解码图片，失败时写入 result.error 并返回 None"""
+        _report_progress = report_progress or (lambda p, m: None)
+        image_path = result.image_path
         if not self.dependencies["pillow"]:
-            self.last_error = "Pillow 库缺失，无法处理图片。"
+            result.error = "Pillow 库缺失，无法处理图片。"
             _report_progress(100, "错误: Pillow缺失")
             return None
         if not os.path.exists(image_path):
-            self.last_error = f"图片文件不存在: {image_path}"
+            result.error = f"图片文件不存在: {image_path}"
             _report_progress(100, "错误: 文件不存在")
             return None
-        pil_image_original: Image.Image | None = None
-        img_width, img_height = 0, 0
+        stage_start = time.perf_counter()
         try:
-            pil_image_original = Image.open(image_path).convert("RGBA")
-            img_width, img_height = pil_image_original.size
+            with open(image_path, "rb") as image_file:
+                image_bytes = image_file.read()
+            result.image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+            pil_image_original = Image.open(BytesIO(image_bytes)).convert("RGBA")
+            if self.near_duplicate_index:
+                result.perceptual_hash, result.region_hashes = compute_page_hashes(
+                    pil_image_original, self.near_duplicate_hash_method
+                )
             _report_progress(5, "图片加载完成。")
+            return pil_image_original
         except Exception as e:
-            self.last_error = f"使用 Pillow 加载图片失败: {e}"
-            _report_progress(100, f"错误: {self.last_error}")
+            result.error = f"使用 Pillow 加载图片失败: {e}"
+            _report_progress(100, f"错误: {result.error}")
             return None
-        if _check_cancelled():
-            return None
-        pil_image_for_llm = pil_image_original.copy()
+        finally:
+            result.record_timing("load", stage_start)
+
+    def prepare_llm_image(
+        self,
+        pil_image_original: Image.Image,
+        result: ProcessingResult,
+        report_progress=None,
+    ) -> Image.Image:
+        """
+        预处理阶段：生成发送给 LLM 的图像（放大、按上传像素预算缩小、灰度、对比度、锐化）。
+        这些操作都只在启用 LLM 图像预处理时执行。
+        无需处理时直接返回原图对象，调用方不得原地修改返回的图像。
+        """
+        _report_progress = report_progress or (lambda p, m: None)
+        stage_start = time.perf_counter()
         preprocess_enabled = self.config_manager.getboolean(
             "LLMImagePreprocessing", "enabled", fallback=False
         )
+        upscale_factor_conf = 1.0
+        contrast_factor_conf = 1.0
+        grayscale_conf = False
+        sharpen_amount_conf = 0.0
+        resample_method_str = "LANCZOS"
         if preprocess_enabled and PILLOW_AVAILABLE:
             _report_progress(6, "LLM图像预处理...")
             upscale_factor_conf = self.config_manager.getfloat(
@@ -331,109 +927,564 @@ class ImageProcessor:
             contrast_factor_conf = self.config_manager.getfloat(
                 "LLMImagePreprocessing", "contrast_factor", fallback=1.0
             )
+            grayscale_conf = self.config_manager.getboolean(
+                "LLMImagePreprocessing", "grayscale", fallback=False
+            )
+            sharpen_amount_conf = self.config_manager.getfloat(
+                "LLMImagePreprocessing", "sharpen_amount", fallback=0.0
+            )
             resample_method_str = self.config_manager.get(
                 "LLMImagePreprocessing", "upscale_resample_method", "LANCZOS"
             ).upper()
-            resample_filter = Image.Resampling.LANCZOS
-            if resample_method_str == "NEAREST":
-                resample_filter = Image.Resampling.NEAREST
-            elif resample_method_str == "BILINEAR":
-                resample_filter = Image.Resampling.BILINEAR
-            elif resample_method_str == "BICUBIC":
-                resample_filter = Image.Resampling.BICUBIC
-            try:
-                if upscale_factor_conf > 1.0 and upscale_factor_conf != 1.0:
-                    original_llm_width, original_llm_height = pil_image_for_llm.size
-                    new_llm_width, new_llm_height = int(
-                        original_llm_width * upscale_factor_conf
-                    ), int(original_llm_height * upscale_factor_conf)
-                    pil_image_for_llm = pil_image_for_llm.resize(
-                        (new_llm_width, new_llm_height), resample_filter
-                    )
-                    _report_progress(
-                        7, f"LLM图像已放大 (至 {new_llm_width}x{new_llm_height})"
-                    )
-                if contrast_factor_conf != 1.0 and NUMPY_AVAILABLE:
-                    img_array = np.array(pil_image_for_llm).astype(np.float32)
-                    if img_array.ndim == 3 and img_array.shape[2] == 4:
-                        rgb_channels, alpha_channel = (
-                            img_array[:, :, :3],
-                            img_array[:, :, 3],
-                        )
-                        rgb_channels = np.clip(
-                            contrast_factor_conf * (rgb_channels - 128.0) + 128.0,
-                            0,
-                            255,
-                        )
-                        pil_image_for_llm = Image.fromarray(
-                            np.dstack((rgb_channels, alpha_channel)).astype(np.uint8),
-                            "RGBA",
-                        )
-                    elif img_array.ndim == 3 and img_array.shape[2] == 3:
-                        img_array = np.clip(
-                            contrast_factor_conf * (img_array - 128.0) + 128.0, 0, 255
-                        )
-                        pil_image_for_llm = Image.fromarray(
-                            img_array.astype(np.uint8), "RGB"
-                        )
-                    elif img_array.ndim == 2:
-                        img_array = np.clip(
-                            contrast_factor_conf * (img_array - 128.0) + 128.0, 0, 255
-                        )
-                        pil_image_for_llm = Image.fromarray(
-                            img_array.astype(np.uint8), "L"
-                        )
-                    _report_progress(
-                        8, f"LLM图像对比度已调整 (系数: {contrast_factor_conf})"
-                    )
-                elif contrast_factor_conf != 1.0 and not NUMPY_AVAILABLE:
-                    _report_progress(8, f"警告: Numpy未安装，跳过LLM图像对比度调整。")
-            except Exception as e_preprocess:
-                _report_progress(8, f"警告: LLM图像预处理失败: {e_preprocess}")
-        if _check_cancelled():
-            return None
-        ocr_provider = self.config_manager.get(
-            "API", "ocr_provider", fallback="gemini"
-        ).lower()
-        intermediate_blocks_for_processing = None
+        upscale_scale = upscale_factor_conf if upscale_factor_conf > 1.0 else 1.0
+        budget_scale = self._get_upload_budget_scale(
+            pil_image_original.size, upscale_scale
+        )
+        effective_scale = upscale_scale * budget_scale
+        pil_image_for_llm = pil_image_original
+        try:
+            pil_image_for_llm, applied_ops = preprocess_llm_image(
+                pil_image_original,
+                scale=effective_scale,
+                contrast_factor=contrast_factor_conf,
+                grayscale=grayscale_conf,
+                sharpen_amount=sharpen_amount_conf,
+                resample_method=resample_method_str,
+            )
+            new_llm_width, new_llm_height = pil_image_for_llm.size
+            if "upscale" in applied_ops:
+                _report_progress(
+                    7, f"LLM图像已放大 (至 {new_llm_width}x{new_llm_height})"
+                )
+            elif "downscale" in applied_ops:
+                _report_progress(
+                    7,
+                    f"LLM图像超出上传像素预算，已缩小至 {new_llm_width}x{new_llm_height}",
+                )
+            if "contrast" in applied_ops:
+                _report_progress(
+                    8, f"LLM图像对比度已调整 (系数: {contrast_factor_conf})"
+                )
+        except Exception as e_preprocess:
+            pil_image_for_llm = pil_image_original
+            _report_progress(8, f"警告: LLM图像预处理失败: {e_preprocess}")
+        result.record_timing(
+            "preprocess", stage_start, size=list(pil_image_for_llm.size)
+        )
+        return pil_image_for_llm
+
+    def _begin_intermediate_request(self, report_progress):
+        ocr_provider, provider = self._get_active_provider()
         if ocr_provider == "openai":
-            _report_progress(10, "使用 OpenAI Compatible API 进行OCR和翻译...")
-            intermediate_blocks_for_processing = self.openai_provider.process_image(
+            report_progress(10, "使用 OpenAI Compatible API 进行OCR和翻译...")
+        else:
+            report_progress(10, "使用 Gemini (google-genai SDK) 进行OCR和翻译...")
+        cache_identity = self._get_cache_identity(provider)
+        provider = self._get_packing_provider(ocr_provider, provider)
+        provider = self._get_hedged_provider(ocr_provider, provider)
+        return ocr_provider, provider, cache_identity
+
+    def _find_near_duplicate_blocks(
+        self, result: ProcessingResult, identity_key: str, llm_image_size
+    ) -> list[dict] | None:
+        if not self.near_duplicate_index or result.perceptual_hash is None:
+            return None
+        match = self.near_duplicate_index.find(
+            result.perceptual_hash,
+            result.region_hashes,
+            identity_key,
+            llm_image_size,
+            result.image_path,
+        )
+        if match is None:
+            return None
+        reused_blocks, matched_path = match
+        result.near_duplicate_hit = True
+        if os.path.dirname(os.path.abspath(matched_path)) != os.path.dirname(
+            os.path.abspath(result.image_path)
+        ):
+            print(
+                f"警告: {os.path.basename(result.image_path)} 复用了其他文件夹中"
+                f"近似页面的识别结果: {matched_path}"
+            )
+        return reused_blocks
+
+    def _remember_near_duplicate_blocks(
+        self,
+        result: ProcessingResult,
+        identity_key: str,
+        llm_image_size,
+        blocks,
+        error: str | None = None,
+    ):
+        if (
+            blocks is not None
+            and error is None
+            and not is_routed_result(blocks)
+            and self.near_duplicate_index
+            and result.perceptual_hash is not None
+        ):
+            self.near_duplicate_index.add(
+                result.perceptual_hash,
+                result.region_hashes,
+                identity_key,
+                llm_image_size,
+                blocks,
+                result.image_path,
+            )
+
+    def _finish_intermediate_request(
+        self,
+        result: ProcessingResult,
+        intermediate_blocks_for_processing: list[dict] | None,
+        provider_error: str | None,
+        ocr_provider: str,
+        stage_start: float,
+        report_progress,
+        cancellation_event: threading.Event = None,
+    ) -> list[dict] | None:
+        result.language_pair = self._get_language_pair(ocr_provider)
+        if result.cache_hit:
+            report_progress(70, "命中结果缓存，跳过 API 请求。")
+        if result.near_duplicate_hit:
+            report_progress(70, "检测到近似重复页面，复用已有识别结果。")
+        result.record_timing(
+            "request",
+            stage_start,
+            provider=ocr_provider,
+            cache_hit=result.cache_hit,
+            near_duplicate_hit=result.near_duplicate_hit,
+        )
+        if not intermediate_blocks_for_processing and provider_error:
+            result.error = provider_error
+        elif intermediate_blocks_for_processing and provider_error:
+            result.partial_error = provider_error
+            report_progress(70, f"警告: {provider_error}，仅保留已收到的部分文本块。")
+        if cancellation_event and cancellation_event.is_set():
+            return None
+        if intermediate_blocks_for_processing is None:
+            if not result.error:
+                result.error = "未从 API 获取到有效的文本块。"
+            report_progress(75, f"错误: {result.error}")
+            return None
+        report_progress(
+            75,
+            f"API 解析到 {len(intermediate_blocks_for_processing)} 块。",
+        )
+        return intermediate_blocks_for_processing
+
+    def request_intermediate_blocks(
+        self,
+        pil_image_for_llm: Image.Image,
+        result: ProcessingResult,
+        report_progress=None,
+        cancellation_event: threading.Event = None,
+        block_callback=None,
+    ) -> list[dict] | None:
+        """网络阶段：调用当前配置的 Provider，返回带 bbox_norm 的中间块列表"""
+        _report_progress = report_progress or (lambda p, m: None)
+        stage_start = time.perf_counter()
+        ocr_provider, provider, cache_identity = self._begin_intermediate_request(
+            _report_progress
+        )
+        identity_key = compute_cache_key("", cache_identity)
+        llm_image_size = pil_image_for_llm.size
+        deadline = build_retry_policy(self.config_manager).get_deadline()
+
+        def _request_from_provider():
+            reused_blocks = self._find_near_duplicate_blocks(
+                result, identity_key, llm_image_size
+            )
+            if reused_blocks is not None:
+                return reused_blocks, None
+            blocks, error = self._request_blocks_with_tiling(
+                provider,
                 pil_image_for_llm,
                 progress_callback=lambda p, m: _report_progress(10 + int(p * 0.65), m),
                 cancellation_event=cancellation_event,
+                tracer=result.tracer,
+                deadline=deadline,
+                block_callback=block_callback,
+            )
+            self._remember_near_duplicate_blocks(
+                result, identity_key, llm_image_size, blocks, error
+            )
+            return blocks, error
+
+        if self.result_cache and result.image_sha256:
+            cache_key = compute_cache_key(result.image_sha256, cache_identity)
+            (intermediate_blocks_for_processing, provider_error), result.cache_hit = (
+                self.result_cache.get_or_compute(
+                    cache_key,
+                    _request_from_provider,
+                    should_cache=lambda blocks: not is_routed_result(blocks),
+                )
             )
-            if (
-                not intermediate_blocks_for_processing
-                and self.openai_provider.last_error
-            ):
-                self.last_error = self.openai_provider.last_error
         else:
-            _report_progress(10, "使用 Gemini (google-genai SDK) 进行OCR和翻译...")
-            intermediate_blocks_for_processing = self.gemini_provider.process_image(
+            intermediate_blocks_for_processing, provider_error = (
+                _request_from_provider()
+            )
+        intermediate_blocks_for_processing = self._finish_intermediate_request(
+            result,
+            intermediate_blocks_for_processing,
+            provider_error,
+            ocr_provider,
+            stage_start,
+            _report_progress,
+            cancellation_event,
+        )
+        if intermediate_blocks_for_processing is None:
+            return None
+        if not is_two_stage_enabled(self.config_manager):
+            return self.apply_translation_memory(
+                intermediate_blocks_for_processing, result, _report_progress
+            )
+        return self.translate_intermediate_blocks(
+            intermediate_blocks_for_processing,
+            result,
+            ocr_provider,
+            _report_progress,
+            cancellation_event,
+        )
+
+    async def request_intermediate_blocks_async(
+        self,
+        pil_image_for_llm: Image.Image,
+        result: ProcessingResult,
+        report_progress=None,
+        cancellation_event: threading.Event = None,
+    ) -> list[dict] | None:
+        """request_intermediate_blocks 的 asyncio 版本，供 AsyncBatchPipeline 使用"""
+        _report_progress = report_progress or (lambda p, m: None)
+        stage_start = time.perf_counter()
+        ocr_provider, provider, cache_identity = self._begin_intermediate_request(
+            _report_progress
+        )
+        identity_key = compute_cache_key("", cache_identity)
+        llm_image_size = pil_image_for_llm.size
+        deadline = build_retry_policy(self.config_manager).get_deadline()
+
+        async def _request_from_provider():
+            reused_blocks = self._find_near_duplicate_blocks(
+                result, identity_key, llm_image_size
+            )
+            if reused_blocks is not None:
+                return reused_blocks, None
+            blocks, error = await self._request_blocks_with_tiling_async(
+                provider,
                 pil_image_for_llm,
                 progress_callback=lambda p, m: _report_progress(10 + int(p * 0.65), m),
                 cancellation_event=cancellation_event,
+                tracer=result.tracer,
+                deadline=deadline,
             )
-            if (
-                not intermediate_blocks_for_processing
-                and self.gemini_provider.last_error
-            ):
-                self.last_error = self.gemini_provider.last_error
+            self._remember_near_duplicate_blocks(
+                result, identity_key, llm_image_size, blocks, error
+            )
+            return blocks, error
+
+        if self.result_cache and result.image_sha256:
+            cache_key = compute_cache_key(result.image_sha256, cache_identity)
+            (intermediate_blocks_for_processing, provider_error), result.cache_hit = (
+                await self.result_cache.get_or_compute_async(
+                    cache_key,
+                    _request_from_provider,
+                    should_cache=lambda blocks: not is_routed_result(blocks),
+                )
+            )
+        else:
+            intermediate_blocks_for_processing, provider_error = (
+                await _request_from_provider()
+            )
+        intermediate_blocks_for_processing = self._finish_intermediate_request(
+            result,
+            intermediate_blocks_for_processing,
+            provider_error,
+            ocr_provider,
+            stage_start,
+            _report_progress,
+            cancellation_event,
+        )
         if intermediate_blocks_for_processing is None:
-            if not self.last_error:
-                self.last_error = "未从 API 获取到有效的文本块。"
-            _report_progress(75, f"错误: {self.last_error}")
+            return None
+        if not is_two_stage_enabled(self.config_manager):
+            return await asyncio.to_thread(
+                self.apply_translation_memory,
+                intermediate_blocks_for_processing,
+                result,
+                _report_progress,
+            )
+        return await asyncio.to_thread(
+            self.translate_intermediate_blocks,
+            intermediate_blocks_for_processing,
+            result,
+            ocr_provider,
+            _report_progress,
+            cancellation_event,
+        )
+
+    def _get_text_translation_provider(self):
+        with self._text_translation_lock:
+            if self.text_translation_provider is None:
+                text_model_name = self.config_manager.get(
+                    "TwoStage", "text_model_name", fallback=""
+                ).strip()
+                self.text_translation_provider = get_translation_provider(
+                    self.config_manager,
+                    self.config_manager.get(
+                        "API", "translation_provider", fallback="gemini"
+                    ),
+                    self.gemini_provider.create_text_model(text_model_name or None),
+                    translation_memory=self.translation_memory,
+                )
+            return self.text_translation_provider
+
+    def _get_language_pair(self, ocr_provider: str) -> tuple[str, str]:
+        section = "OpenAIAPI" if "openai" in ocr_provider else "GeminiAPI"
+        source_language = (
+            self.config_manager.get(
+                section, "source_language", fallback="Japanese"
+            ).strip()
+            or "Japanese"
+        )
+        target_language = self.config_manager.get(
+            section, "target_language", "Chinese"
+        )
+        return source_language, target_language
+
+    def translate_intermediate_blocks(
+        self,
+        intermediate_blocks: list[dict],
+        result: ProcessingResult,
+        ocr_provider: str,
+        report_progress=None,
+        cancellation_event: threading.Event = None,
+    ) -> list[dict] | None:
+        """
+        两阶段模式的翻译阶段：把 OCR 得到的中间块交给文本翻译 Provider 批量翻译。
+        返回带 translated_text 的新中间块列表，不修改输入（它们可能来自结果缓存）。
+        """
+        _report_progress = report_progress or (lambda p, m: None)
+        stage_start = time.perf_counter()
+        source_language, target_language = self._get_language_pair(ocr_provider)
+        translation_provider = self._get_text_translation_provider()
+        if translation_provider is None:
+            result.error = "两阶段模式需要的文本翻译 Provider 不可用。"
+            _report_progress(80, f"错误: {result.error}")
             return None
         _report_progress(
-            75,
-            f"API 解析到 {len(intermediate_blocks_for_processing)} 块。",
+            76, f"翻译 {len(intermediate_blocks)} 个文本块到 {target_language}..."
         )
-        if _check_cancelled():
+        translation_results = translation_provider.translate_batch(
+            [block.get("original_text", "") for block in intermediate_blocks],
+            target_language,
+            source_language=source_language,
+            cancellation_event=cancellation_event,
+            item_progress_callback=lambda done, total, message: _report_progress(
+                76 + int(8 * done / max(total, 1)), message
+            ),
+        )
+        result.record_timing(
+            "translate", stage_start, blocks=len(intermediate_blocks)
+        )
+        if cancellation_event and cancellation_event.is_set():
             return None
+        if translation_results is None:
+            result.error = (
+                translation_provider.get_last_error() or "文本翻译阶段未返回结果。"
+            )
+            _report_progress(84, f"错误: {result.error}")
+            return None
+        return [
+            dict(block, translated_text=translation.translated_text)
+            for block, translation in zip(intermediate_blocks, translation_results)
+        ]
+
+    def _plan_llm_tiles(self, image_size: tuple[int, int]) -> list[tuple]:
+        if not self.config_manager.getboolean("Tiling", "enabled", fallback=True):
+            return [(0, 0, image_size[0], image_size[1])]
+        return plan_tiles(
+            image_size[0],
+            image_size[1],
+            min_aspect_ratio=self.config_manager.getfloat(
+                "Tiling", "min_aspect_ratio", fallback=2.5
+            ),
+            max_tile_aspect=self.config_manager.getfloat(
+                "Tiling", "max_tile_aspect", fallback=1.6
+            ),
+            overlap_ratio=self.config_manager.getfloat(
+                "Tiling", "overlap_ratio", fallback=0.15
+            ),
+            max_tile_pixels=self.config_manager.getint(
+                "Tiling", "max_tile_pixels", fallback=16000000
+            ),
+        )
+
+    def _request_blocks_with_tiling(
+        self,
+        provider,
+        pil_image_for_llm: Image.Image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer: Tracer | None = None,
+        deadline: float | None = None,
+        block_callback=None,
+    ) -> tuple[list[dict] | None, str | None]:
+        """超长或超大图片切分为重叠分块并行请求，否则直接整图请求"""
+        tiles = self._plan_llm_tiles(pil_image_for_llm.size)
+        if len(tiles) <= 1:
+            return provider.request_blocks(
+                pil_image_for_llm,
+                progress_callback=progress_callback,
+                cancellation_event=cancellation_event,
+                tracer=tracer,
+                deadline=deadline,
+                block_callback=block_callback,
+            )
+        if progress_callback:
+            progress_callback(
+                10, f"图片过长/过大，切分为 {len(tiles)} 个分块并行请求..."
+            )
+        max_workers = max(
+            1, self.config_manager.getint("Tiling", "max_concurrent_tiles", fallback=4)
+        )
+
+        def _request_tile(tile_index, tile_box):
+            tile_block_callback = None
+            if block_callback:
+
+                def tile_block_callback(tile_block):
+                    for page_block in map_tile_blocks_to_page(
+                        [tile_block], tile_box, pil_image_for_llm.size, tile_index
+                    ):
+                        block_callback(page_block)
+
+            return provider.request_blocks(
+                pil_image_for_llm.crop(tile_box),
+                progress_callback=None,
+                cancellation_event=cancellation_event,
+                tracer=tracer,
+                deadline=deadline,
+                block_callback=tile_block_callback,
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(tiles)), thread_name_prefix="LLMTile"
+        ) as executor:
+            tile_results = list(
+                executor.map(_request_tile, range(len(tiles)), tiles)
+            )
+        return self._merge_tile_results(
+            tiles, tile_results, pil_image_for_llm.size, progress_callback
+        )
+
+    async def _request_blocks_with_tiling_async(
+        self,
+        provider,
+        pil_image_for_llm: Image.Image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer: Tracer | None = None,
+        deadline: float | None = None,
+    ) -> tuple[list[dict] | None, str | None]:
+        """_request_blocks_with_tiling 的 asyncio 版本；Provider 没有异步接口时在线程中调用同步接口"""
+        request_async = getattr(provider, "request_blocks_async", None)
+
+        async def _request(pil_image):
+            if request_async is not None:
+                return await request_async(
+                    pil_image,
+                    progress_callback=None,
+                    cancellation_event=cancellation_event,
+                    tracer=tracer,
+                    deadline=deadline,
+                )
+            return await asyncio.to_thread(
+                provider.request_blocks,
+                pil_image,
+                progress_callback=None,
+                cancellation_event=cancellation_event,
+                tracer=tracer,
+                deadline=deadline,
+            )
+
+        tiles = self._plan_llm_tiles(pil_image_for_llm.size)
+        if len(tiles) <= 1:
+            return await _request(pil_image_for_llm)
+        if progress_callback:
+            progress_callback(
+                10, f"图片过长/过大，切分为 {len(tiles)} 个分块并行请求..."
+            )
+        max_workers = max(
+            1, self.config_manager.getint("Tiling", "max_concurrent_tiles", fallback=4)
+        )
+        tile_slots = asyncio.Semaphore(max_workers)
+
+        async def _request_tile(tile_box):
+            async with tile_slots:
+                return await _request(pil_image_for_llm.crop(tile_box))
+
+        tile_results = await asyncio.gather(*(_request_tile(tile) for tile in tiles))
+        return self._merge_tile_results(
+            tiles, tile_results, pil_image_for_llm.size, progress_callback
+        )
+
+    def _merge_tile_results(
+        self,
+        tiles: list[tuple],
+        tile_results: list[tuple],
+        image_size: tuple[int, int],
+        progress_callback=None,
+    ) -> tuple[list[dict] | None, str | None]:
+        page_blocks: list[dict] = []
+        partial_errors: list[str] = []
+        for tile_index, (tile_box, (tile_blocks, tile_error)) in enumerate(
+            zip(tiles, tile_results)
+        ):
+            if tile_blocks is None:
+                return None, (
+                    f"分块 {tile_index + 1}/{len(tiles)} 请求失败: {tile_error}"
+                    if tile_error
+                    else None
+                )
+            if tile_error:
+                partial_errors.append(
+                    f"分块 {tile_index + 1}/{len(tiles)}: {tile_error}"
+                )
+            page_blocks.extend(
+                map_tile_blocks_to_page(tile_blocks, tile_box, image_size, tile_index)
+            )
+        deduplicated_blocks = deduplicate_tile_blocks(
+            page_blocks,
+            iou_threshold=self.config_manager.getfloat(
+                "Tiling", "dedup_iou_threshold", fallback=0.5
+            ),
+            text_similarity_threshold=self.config_manager.getfloat(
+                "Tiling", "dedup_text_similarity", fallback=0.6
+            ),
+        )
+        if progress_callback:
+            progress_callback(
+                100,
+                f"分块结果合并完成: {len(page_blocks)} 块，去重后 {len(deduplicated_blocks)} 块。",
+            )
+        return deduplicated_blocks, ("; ".join(partial_errors) or None)
+
+    def build_processed_blocks(
+        self,
+        intermediate_blocks_for_processing: list[dict],
+        pil_image_original: Image.Image,
+        result: ProcessingResult,
+        report_progress=None,
+    ) -> list[ProcessedBlock]:
+        """排版阶段：把中间块转换为像素坐标的 ProcessedBlock，并按需调整文本框"""
+        _report_progress = report_progress or (lambda p, m: None)
+        img_width, img_height = pil_image_original.size
         _report_progress(
             85, f"转换 {len(intermediate_blocks_for_processing)} 个中间块..."
         )
+        stage_start = time.perf_counter()
+        render_settings = get_render_settings(self.config_manager)
         final_processed_blocks: list[ProcessedBlock] = []
         for iblock_data in intermediate_blocks_for_processing:
             pixel_bbox = []
@@ -480,14 +1531,7 @@ class ImageProcessor:
                 continue
             font_size_cat = iblock_data.get("font_size_category", "medium")
             orientation = iblock_data.get("orientation", "horizontal")
-            font_size_px = self.font_size_mapping.get(
-                font_size_cat, self.font_size_mapping["medium"]
-            )
-            fixed_font_size_override = self.config_manager.getint(
-                "UI", "fixed_font_size", 0
-            )
-            if fixed_font_size_override > 0:
-                font_size_px = fixed_font_size_override
+            font_size_px = render_settings.font_size_for(font_size_cat)
             current_block = ProcessedBlock(
                 id=iblock_data.get("id"),
                 original_text=iblock_data["original_text"],
@@ -499,24 +1543,21 @@ class ImageProcessor:
                 angle=0.0,
                 text_align=iblock_data.get("text_align", None),
             )
-            if (
-                self.config_manager.getboolean(
-                    "UI", "auto_adjust_bbox_to_fit_text", fallback=True
-                )
-                and PILLOW_AVAILABLE
-            ):
-                font_name_for_adjust = self.config_manager.get(
-                    "UI", "font_name", "msyh.ttc"
-                )
+            if render_settings.auto_adjust_bbox_to_fit_text and PILLOW_AVAILABLE:
                 pil_font_instance_for_adjust = get_pil_font(
-                    font_name_for_adjust, current_block.font_size_pixels
+                    render_settings.font_name, current_block.font_size_pixels
                 )
                 if pil_font_instance_for_adjust:
                     self._adjust_block_bbox_for_text_fit(
-                        current_block, pil_font_instance_for_adjust
+                        current_block, pil_font_instance_for_adjust, render_settings
                     )
             final_processed_blocks.append(current_block)
-        if not final_processed_blocks and not self.last_error:
-            self.last_error = "未在图像中检测到可处理的文本块。"
+        result.record_timing(
+            "convert", stage_start, blocks=len(final_processed_blocks)
+        )
+        if not final_processed_blocks and not result.error:
+            result.error = "未在图像中检测到可处理的文本块。"
+        result.image = pil_image_original
+        result.blocks = final_processed_blocks
         _report_progress(100, "图像处理完成。")
-        return pil_image_original, final_processed_blocks
+        return final_processed_blocks
@@ -0,0 +1,113 @@
+"""
+只读的类型化设置快照
+热路径（逐文本块的排版、渲染）不再逐次调用 ConfigManager.get*，
+而是读取按配置版本构建一次、之后不可修改的快照。配置被修改 (set/save) 后版本号递增，
+下次获取时自动重建。
+"""
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+from core.config import ConfigManager
+
+FONT_SIZE_CATEGORIES = ("very_small", "small", "medium", "large", "very_large")
+_DEFAULT_FONT_SIZES = {
+    "very_small": 12,
+    "small": 16,
+    "medium": 22,
+    "large": 28,
+    "very_large": 36,
+}
+
+
+def parse_rgba_color(color_str: str, default_rgba: tuple) -> tuple:
+    """解析 "r,g,b" 或 "r,g,b,a" 格式的颜色字符串"""
+    try:
+        parts = list(map(int, color_str.split(",")))
+        if len(parts) == 3:
+            return (parts[0], parts[1], parts[2], 255)
+        if len(parts) == 4:
+            return (parts[0], parts[1], parts[2], parts[3])
+    except (ValueError, AttributeError):
+        pass
+    return default_rgba
+
+
+@dataclass(frozen=True)
+class RenderSettings:
+    """文本排版与渲染相关设置（UI / FontSizeMapping 节）"""
+
+    version: int
+    font_name: str
+    text_padding: int
+    text_main_color: tuple
+    text_outline_color: tuple
+    text_background_color: tuple
+    text_outline_thickness: int
+    h_char_spacing_px: int
+    h_line_spacing_px: int
+    v_char_spacing_px: int
+    v_col_spacing_px: int
+    h_manual_break_extra_px: int
+    v_manual_break_extra_px: int
+    fixed_font_size: int
+    auto_adjust_bbox_to_fit_text: bool
+    font_size_mapping: Mapping[str, int]
+
+    def font_size_for(self, font_size_category: str) -> int:
+        """按字号类别返回像素字号，设置了固定字号时优先使用固定字号"""
+        if self.fixed_font_size > 0:
+            return self.fixed_font_size
+        return self.font_size_mapping.get(
+            font_size_category, self.font_size_mapping["medium"]
+        )
+
+
+def build_render_settings(config_manager: ConfigManager) -> RenderSettings:
+    return RenderSettings(
+        version=config_manager.version,
+        font_name=config_manager.get("UI", "font_name", "msyh.ttc"),
+        text_padding=config_manager.getint("UI", "text_padding", 3),
+        text_main_color=parse_rgba_color(
+            config_manager.get("UI", "text_main_color", "255,255,255,255"),
+            (255, 255, 255, 255),
+        ),
+        text_outline_color=parse_rgba_color(
+            config_manager.get("UI", "text_outline_color", "0,0,0,255"),
+            (0, 0, 0, 255),
+        ),
+        text_background_color=parse_rgba_color(
+            config_manager.get("UI", "text_background_color", "0,0,0,128"),
+            (0, 0, 0, 128),
+        ),
+        text_outline_thickness=config_manager.getint(
+            "UI", "text_outline_thickness", 2
+        ),
+        h_char_spacing_px=config_manager.getint("UI", "h_text_char_spacing_px", 0),
+        h_line_spacing_px=config_manager.getint("UI", "h_text_line_spacing_px", 0),
+        v_char_spacing_px=config_manager.getint("UI", "v_text_char_spacing_px", 0),
+        v_col_spacing_px=config_manager.getint("UI", "v_text_column_spacing_px", 0),
+        h_manual_break_extra_px=config_manager.getint(
+            "UI", "h_manual_break_extra_spacing_px", 0
+        ),
+        v_manual_break_extra_px=config_manager.getint(
+            "UI", "v_manual_break_extra_spacing_px", 0
+        ),
+        fixed_font_size=config_manager.getint("UI", "fixed_font_size", 0),
+        auto_adjust_bbox_to_fit_text=config_manager.getboolean(
+            "UI", "auto_adjust_bbox_to_fit_text", fallback=True
+        ),
+        font_size_mapping=MappingProxyType(
+            {
+                category: config_manager.getint(
+                    "FontSizeMapping", category, default_size
+                )
+                for category, default_size in _DEFAULT_FONT_SIZES.items()
+            }
+        ),
+    )
+
+
+def get_render_settings(config_manager: ConfigManager) -> RenderSettings:
+    """返回当前配置版本的渲染设置快照（同一版本内返回同一个对象）"""
+    return config_manager.get_snapshot(build_render_settings)
@@ -0,0 +1,163 @@
+"""
+超长/超大图片的分块处理
+将长条漫画等图片切分为相互重叠的分块分别请求，再把每块返回的 bbox_norm
+映射回整页坐标，并按 IoU 与文本相似度去除重叠区域中的重复文本块。
+"""
+
+import math
+from difflib import SequenceMatcher
+
+
+def _split_axis(length: int, max_tile_length: int, overlap_ratio: float) -> list[int]:
+    """返回沿一个轴的分块起点列表，各块长度为 min(length, max_tile_length)"""
+    if length <= max_tile_length:
+        return [0]
+    overlap = int(max_tile_length * overlap_ratio)
+    step = max(1, max_tile_length - overlap)
+    tile_count = math.ceil((length - overlap) / step)
+    tile_count = max(2, tile_count)
+    even_step = (length - max_tile_length) / (tile_count - 1)
+    return [int(round(i * even_step)) for i in range(tile_count)]
+
+
+def plan_tiles(
+    width: int,
+    height: int,
+    min_aspect_ratio: float = 2.5,
+    max_tile_aspect: float = 1.6,
+    overlap_ratio: float = 0.15,
+    max_tile_pixels: int = 16_000_000,
+) -> list[tuple[int, int, int, int]]:
+    """
+    规划分块区域 (left, top, right, bottom)。
+    长宽比超过 min_aspect_ratio 时沿长边切分，使每块长宽比不超过 max_tile_aspect；
+    像素数超过 max_tile_pixels 时再按像素预算切分。无需分块时返回单个整图区域。
+    """
+    if width <= 0 or height <= 0:
+        return [(0, 0, max(0, width), max(0, height))]
+    overlap_ratio = min(max(overlap_ratio, 0.0), 0.5)
+    max_tile_aspect = max(max_tile_aspect, 1.0)
+    tile_width, tile_height = width, height
+    long_side, short_side = max(width, height), min(width, height)
+    if long_side / short_side > min_aspect_ratio:
+        tile_long = min(long_side, int(short_side * max_tile_aspect))
+        if height >= width:
+            tile_height = tile_long
+        else:
+            tile_width = tile_long
+    if max_tile_pixels > 0 and tile_width * tile_height > max_tile_pixels:
+        scale = math.sqrt(max_tile_pixels / (tile_width * tile_height))
+        tile_width = max(1, int(tile_width * scale))
+        tile_height = max(1, int(tile_height * scale))
+    x_starts = _split_axis(width, tile_width, overlap_ratio)
+    y_starts = _split_axis(height, tile_height, overlap_ratio)
+    tiles = []
+    for top in y_starts:
+        for left in x_starts:
+            tiles.append(
+                (
+                    left,
+                    top,
+                    min(width, left + tile_width),
+                    min(height, top + tile_height),
+                )
+            )
+    return tiles
+
+
+def map_tile_blocks_to_page(
+    blocks: list[dict],
+    tile_box: tuple[int, int, int, int],
+    page_size: tuple[int, int],
+    tile_index: int,
+) -> list[dict]:
+    """把分块内的 bbox_norm 转换为整页归一化坐标，并记录文本块到分块内部切边的距离"""
+    page_width, page_height = page_size
+    left, top, right, bottom = tile_box
+    tile_width, tile_height = right - left, bottom - top
+    mapped_blocks = []
+    for block_idx, block in enumerate(blocks):
+        bbox_norm = block.get("bbox_norm")
+        if not (isinstance(bbox_norm, list) and len(bbox_norm) == 4):
+            continue
+        x_min = left + bbox_norm[0] * tile_width
+        y_min = top + bbox_norm[1] * tile_height
+        x_max = left + bbox_norm[2] * tile_width
+        y_max = top + bbox_norm[3] * tile_height
+        edge_distances = []
+        if left > 0:
+            edge_distances.append(x_min - left)
+        if right < page_width:
+            edge_distances.append(right - x_max)
+        if top > 0:
+            edge_distances.append(y_min - top)
+        if bottom < page_height:
+            edge_distances.append(bottom - y_max)
+        mapped_block = dict(block)
+        mapped_block["bbox_norm"] = [
+            float(x_min / page_width),
+            float(y_min / page_height),
+            float(x_max / page_width),
+            float(y_max / page_height),
+        ]
+        mapped_block["id"] = f"tile{tile_index}_{block.get('id', block_idx)}"
+        mapped_block["_tile_edge_margin"] = (
+            min(edge_distances) if edge_distances else float("inf")
+        )
+        mapped_blocks.append(mapped_block)
+    return mapped_blocks
+
+
+def _bbox_iou_and_containment(box_a: list[float], box_b: list[float]):
+    inter_w = min(box_a[2], box_b[2]) - max(box_a[0], box_b[0])
+    inter_h = min(box_a[3], box_b[3]) - max(box_a[1], box_b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0, 0.0
+    intersection = inter_w * inter_h
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - intersection
+    iou = intersection / union if union > 0 else 0.0
+    containment = intersection / max(1e-12, min(area_a, area_b))
+    return iou, containment
+
+
+def deduplicate_tile_blocks(
+    blocks: list[dict],
+    iou_threshold: float = 0.5,
+    text_similarity_threshold: float = 0.6,
+) -> list[dict]:
+    """
+    去除分块重叠区域中的重复文本块。两个块满足以下任一条件即视为重复：
+    IoU 超过阈值；或一个块大部分落在另一个块内且原文相似。
+    重复时保留距离分块切边更远（即未被切断）的块。
+    """
+    ordered_blocks = sorted(
+        blocks, key=lambda block: block.get("_tile_edge_margin", 0.0), reverse=True
+    )
+    kept_blocks: list[dict] = []
+    for candidate in ordered_blocks:
+        is_duplicate = False
+        for kept in kept_blocks:
+            iou, containment = _bbox_iou_and_containment(
+                candidate["bbox_norm"], kept["bbox_norm"]
+            )
+            if iou <= 0.0:
+                continue
+            if iou >= iou_threshold:
+                is_duplicate = True
+                break
+            text_similarity = SequenceMatcher(
+                None,
+                candidate.get("original_text", ""),
+                kept.get("original_text", ""),
+            ).ratio()
+            if containment >= 0.5 and text_similarity >= text_similarity_threshold:
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            kept_blocks.append(candidate)
+    kept_blocks.sort(key=lambda block: (block["bbox_norm"][1], block["bbox_norm"][0]))
+    for block in kept_blocks:
+        block.pop("_tile_edge_margin", None)
+    return kept_blocks
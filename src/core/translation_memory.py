@@ -0,0 +1,325 @@
+"""
+翻译记忆 (translation memory)
+使用 SQLite 持久化保存 (源语言, 目标语言, 术语表版本, 规范化原文) -> 译文。
+完全相同的原文直接复用已有译文；相似的原文通过字符 n-gram 倒排索引找出候选，
+作为参考译文提供给文本翻译 Prompt，使角色口癖、拟声词、界面文字等反复出现的内容译法保持一致。
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+NGRAM_SIZE = 2
+MAX_QUERY_NGRAMS = 200
+FAILED_TRANSLATION_PREFIXES = ("[Gemini", "[翻译")
+
+
+def normalize_memory_text(text: str) -> str:
+    """NFKC 规范化（统一全角/半角）并合并空白，作为翻译记忆的查找键"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def compute_glossary_version(glossary_text: str) -> str:
+    """术语表内容的短哈希；术语表变化后旧的译文不再被复用"""
+    glossary_lines = sorted(
+        {
+            line.strip()
+            for line in (glossary_text or "").splitlines()
+            if line.strip() and "->" in line
+        }
+    )
+    if not glossary_lines:
+        return "none"
+    return hashlib.sha256("\n".join(glossary_lines).encode("utf-8")).hexdigest()[:16]
+
+
+def extract_ngrams(normalized_text: str) -> set[str]:
+    compact_text = normalized_text.replace(" ", "")
+    if len(compact_text) <= NGRAM_SIZE:
+        return {compact_text} if compact_text else set()
+    return {
+        compact_text[i : i + NGRAM_SIZE]
+        for i in range(len(compact_text) - NGRAM_SIZE + 1)
+    }
+
+
+def is_reusable_translation(original_text: str, translated_text: str) -> bool:
+    """空文本与 "[Gemini错误]"、"[翻译取消]" 这类失败标记不写入翻译记忆"""
+    return bool(
+        normalize_memory_text(original_text)
+        and translated_text
+        and translated_text.strip()
+        and not translated_text.startswith(FAILED_TRANSLATION_PREFIXES)
+    )
+
+
+class TranslationMemory:
+    """线程安全的翻译记忆库，所有查询共用一个 SQLite 连接"""
+
+    def __init__(
+        self,
+        db_path: str,
+        fuzzy_threshold: float = 0.75,
+        max_fuzzy_candidates: int = 50,
+    ):
+        self.db_path = db_path
+        self.fuzzy_threshold = min(max(fuzzy_threshold, 0.0), 1.0)
+        self.max_fuzzy_candidates = max(1, max_fuzzy_candidates)
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "exact_hits": 0, "fuzzy_hits": 0, "stored": 0}
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    source_lang TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    glossary_version TEXT NOT NULL,
+                    normalized_text TEXT NOT NULL,
+                    original_text TEXT NOT NULL,
+                    translated_text TEXT NOT NULL,
+                    use_count INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (source_lang, target_lang, glossary_version, normalized_text)
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entry_ngrams (
+                    gram TEXT NOT NULL,
+                    entry_id INTEGER NOT NULL,
+                    PRIMARY KEY (gram, entry_id)
+                ) WITHOUT ROWID
+                """
+            )
+
+    @staticmethod
+    def _language_key(language: str) -> str:
+        return (language or "").strip().lower()
+
+    def _find_entry_locked(
+        self,
+        source_key: str,
+        target_key: str,
+        glossary_version: str,
+        normalized_text: str,
+    ) -> tuple[int, str] | None:
+        return self._connection.execute(
+            "SELECT id, translated_text FROM entries WHERE source_lang = ? "
+            "AND target_lang = ? AND glossary_version = ? "
+            "AND normalized_text = ?",
+            (source_key, target_key, glossary_version, normalized_text),
+        ).fetchone()
+
+    def find_exact(
+        self,
+        texts: list[str],
+        source_lang: str,
+        target_lang: str,
+        glossary_version: str,
+    ) -> list[str | None]:
+        """返回与 texts 一一对应的已有译文，未命中为 None"""
+        source_key = self._language_key(source_lang)
+        target_key = self._language_key(target_lang)
+        translations: list[str | None] = []
+        with self._lock, self._connection:
+            for text in texts:
+                normalized_text = normalize_memory_text(text)
+                if not normalized_text:
+                    translations.append(None)
+                    continue
+                self.stats["lookups"] += 1
+                row = self._find_entry_locked(
+                    source_key, target_key, glossary_version, normalized_text
+                )
+                if row is None:
+                    translations.append(None)
+                    continue
+                self.stats["exact_hits"] += 1
+                self._connection.execute(
+                    "UPDATE entries SET use_count = use_count + 1 WHERE id = ?",
+                    (row[0],),
+                )
+                translations.append(row[1])
+        return translations
+
+    def find_fuzzy(
+        self,
+        text: str,
+        source_lang: str,
+        target_lang: str,
+        glossary_version: str,
+        limit: int = 3,
+    ) -> list[tuple[float, str, str]]:
+        """
+        通过 n-gram 倒排索引取出共享 n-gram 最多的候选，再按编辑相似度过滤。
+        Returns:
+            [(相似度, 原文, 译文)]，按相似度降序，不包含与 text 完全相同的条目
+        """
+        normalized_text = normalize_memory_text(text)
+        query_ngrams = sorted(extract_ngrams(normalized_text))[:MAX_QUERY_NGRAMS]
+        if not query_ngrams:
+            return []
+        placeholders = ",".join("?" * len(query_ngrams))
+        with self._lock:
+            rows = self._connection.execute(
+                f"""
+                SELECT e.normalized_text, e.original_text, e.translated_text
+                FROM entry_ngrams g JOIN entries e ON e.id = g.entry_id
+                WHERE g.gram IN ({placeholders})
+                    AND e.source_lang = ? AND e.target_lang = ?
+                    AND e.glossary_version = ? AND e.normalized_text != ?
+                GROUP BY e.id
+                ORDER BY COUNT(*) DESC
+                LIMIT ?
+                """,
+                (
+                    *query_ngrams,
+                    self._language_key(source_lang),
+                    self._language_key(target_lang),
+                    glossary_version,
+                    normalized_text,
+                    self.max_fuzzy_candidates,
+                ),
+            ).fetchall()
+        matches = []
+        for candidate_text, original_text, translated_text in rows:
+            similarity = difflib.SequenceMatcher(
+                None, normalized_text, candidate_text
+            ).ratio()
+            if similarity >= self.fuzzy_threshold:
+                matches.append((similarity, original_text, translated_text))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        if matches:
+            with self._lock:
+                self.stats["fuzzy_hits"] += 1
+        return matches[:limit]
+
+    def add_many(
+        self,
+        pairs: list[tuple[str, str]],
+        source_lang: str,
+        target_lang: str,
+        glossary_version: str,
+    ) -> int:
+        """写入 (原文, 译文) 列表，已存在的条目更新译文；返回新增或更新的条目数"""
+        source_key = self._language_key(source_lang)
+        target_key = self._language_key(target_lang)
+        now = time.time()
+        changed = 0
+        with self._lock, self._connection:
+            for original_text, translated_text in pairs:
+                if not is_reusable_translation(original_text, translated_text):
+                    continue
+                normalized_text = normalize_memory_text(original_text)
+                translated_text = translated_text.strip()
+                row = self._find_entry_locked(
+                    source_key, target_key, glossary_version, normalized_text
+                )
+                if row is not None:
+                    if row[1] != translated_text:
+                        self._connection.execute(
+                            "UPDATE entries SET translated_text = ?, "
+                            "original_text = ?, updated_at = ? WHERE id = ?",
+                            (translated_text, original_text, now, row[0]),
+                        )
+                        changed += 1
+                    continue
+                entry_id = self._connection.execute(
+                    "INSERT INTO entries (source_lang, target_lang, glossary_version, "
+                    "normalized_text, original_text, translated_text, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        source_key,
+                        target_key,
+                        glossary_version,
+                        normalized_text,
+                        original_text,
+                        translated_text,
+                        now,
+                    ),
+                ).lastrowid
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO entry_ngrams (gram, entry_id) VALUES (?, ?)",
+                    [(gram, entry_id) for gram in extract_ngrams(normalized_text)],
+                )
+                changed += 1
+            self.stats["stored"] += changed
+        return changed
+
+    def export_entries(self, file_path: str) -> int:
+        """导出全部条目为 JSON Lines 文件，返回导出的条目数"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT source_lang, target_lang, glossary_version, original_text, "
+                "translated_text FROM entries ORDER BY id"
+            ).fetchall()
+        with open(file_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                entry = dict(
+                    zip(
+                        (
+                            "source_lang",
+                            "target_lang",
+                            "glossary_version",
+                            "original_text",
+                            "translated_text",
+                        ),
+                        row,
+                    )
+                )
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return len(rows)
+
+    def import_entries(self, file_path: str) -> int:
+        """
+        从 export_entries 导出的 JSON Lines 文件导入条目，无法解析的行被跳过。
+        缺少 glossary_version 的条目视为未使用术语表。
+        Returns:
+            新增或更新的条目数
+        """
+        grouped_pairs: dict[tuple, list[tuple[str, str]]] = {}
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    group_key = (
+                        entry["source_lang"],
+                        entry["target_lang"],
+                        entry.get("glossary_version") or "none",
+                    )
+                    pair = (str(entry["original_text"]), str(entry["translated_text"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                grouped_pairs.setdefault(group_key, []).append(pair)
+        return sum(
+            self.add_many(pairs, *group_key)
+            for group_key, pairs in grouped_pairs.items()
+        )
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._connection.execute(
+                "SELECT COUNT(*) FROM entries"
+            ).fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,171 @@
+"""
+Provider 响应录制/回放 (cassette)
+record 模式下把 Provider 返回的原始文本按请求指纹追加写入 gzip 压缩的 JSON Lines 文件；
+replay 模式下按指纹读取并返回，可选择还原原始延迟或立即返回，用于可复现的基准测试与回归测试。
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from core.config import CONFIG_FILE, ConfigManager
+
+CASSETTE_MODES = ("off", "record", "replay")
+_open_cassettes: Dict[str, "Cassette"] = {}
+_open_cassettes_lock = threading.Lock()
+
+
+def get_default_cassette_path() -> str:
+    return os.path.join(
+        os.path.dirname(CONFIG_FILE) or ".", "cassettes", "responses.jsonl.gz"
+    )
+
+
+def compute_request_fingerprint(
+    provider: str, model: str, prompt: str, image_bytes: bytes, params: dict
+) -> str:
+    """请求指纹：Provider、模型、Prompt、上传图像字节与生成参数的 SHA-256"""
+    digest = hashlib.sha256()
+    header = json.dumps(
+        {"provider": provider, "model": model, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    digest.update(header.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(hashlib.sha256(image_bytes).digest())
+    return digest.hexdigest()
+
+
+class Cassette:
+    """线程安全的录制文件。多个 gzip 成员依次追加，读取时视为一个连续的 JSON Lines 流"""
+
+    def __init__(self, path: str, mode: str = "replay", replay_latency: str = "zero"):
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["fingerprint"]] = entry
+                    except (ValueError, KeyError):
+                        continue
+        except (OSError, EOFError) as e:
+            print(f"警告: 读取录制文件 '{self.path}' 失败（已读取 {len(self._entries)} 条）: {e}")
+
+    def lookup(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def get_any_entry(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next(iter(self._entries.values()), None)
+
+    def replay_delay(self, entry: Dict[str, Any]) -> float:
+        if self.replay_latency == "original":
+            return max(0.0, float(entry.get("latency", 0.0)))
+        return 0.0
+
+    def record(
+        self,
+        fingerprint: str,
+        raw_text: str,
+        latency: float,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        entry = {
+            "fingerprint": fingerprint,
+            "raw_text": raw_text,
+            "latency": round(latency, 4),
+            "recorded_at": time.time(),
+            **(metadata or {}),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._entries[fingerprint] = entry
+            try:
+                cassette_dir = os.path.dirname(self.path)
+                if cassette_dir:
+                    os.makedirs(cassette_dir, exist_ok=True)
+                with gzip.open(self.path, "at", encoding="utf-8") as f:
+                    f.write(line)
+                self.recorded += 1
+            except OSError as e:
+                print(f"警告: 写入录制文件失败: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+            }
+
+
+def get_cassette(config_manager: ConfigManager) -> Optional[Cassette]:
+    """按 Cassette 配置返回共享的录制文件实例；mode 为 off 时返回 None"""
+    mode = config_manager.get("Cassette", "mode", fallback="off").strip().lower()
+    if mode not in CASSETTE_MODES or mode == "off":
+        return None
+    path = (
+        config_manager.get("Cassette", "path", fallback="").strip()
+        or get_default_cassette_path()
+    )
+    replay_latency = (
+        config_manager.get("Cassette", "replay_latency", fallback="zero").strip().lower()
+    )
+    with _open_cassettes_lock:
+        cassette = _open_cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path, mode, replay_latency)
+            _open_cassettes[path] = cassette
+        else:
+            cassette.mode = mode
+            cassette.replay_latency = replay_latency
+        return cassette
+
+
+def replay_response(
+    cassette: Cassette,
+    fingerprint: str,
+    parse_response,
+    cancellation_event: Optional[threading.Event] = None,
+):
+    """回放录制的原始文本并交给 parse_response 解析；未录制的请求返回错误而不是访问网络"""
+    entry = cassette.lookup(fingerprint)
+    if entry is None:
+        return None, f"回放模式下未找到匹配的录制响应 (指纹 {fingerprint[:12]})。"
+    delay = cassette.replay_delay(entry)
+    if delay > 0:
+        if cancellation_event:
+            if cancellation_event.wait(delay):
+                return None, None
+        else:
+            time.sleep(delay)
+    return parse_response(entry["raw_text"])
@@ -1,7 +1,9 @@
+import asyncio
 import os
 import json
 import threading
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from PIL import Image
 
 try:
@@ -14,30 +16,63 @@ except ImportError:
     genai = None
     google_genai_types = None
 from core.config import ConfigManager
-from utils.prompts import get_gemini_ocr_translation_prompt
+from services.cassette import (
+    compute_request_fingerprint,
+    get_cassette,
+    replay_response,
+)
+from services.rate_limit import (
+    RequestDeadlineExceeded,
+    call_with_retries,
+    call_with_retries_async,
+    estimate_image_tokens,
+    estimate_request_tokens,
+    get_rate_limiter,
+)
+from services.packing import split_packed_response
+from services.upload_encoding import EncodedImage, encode_image_for_upload
+from utils.async_tasks import iter_async_abortable, run_coroutine_abortable
+from utils.cancellation import get_abort_error
+from utils.json_stream import StreamingBlockCollector
+from utils.tracing import trace_span
+from utils.prompts import (
+    build_ocr_glossary_section,
+    get_gemini_ocr_translation_prompt,
+    get_multi_image_prompt,
+    get_ocr_only_prompt,
+    is_two_stage_enabled,
+)
 
 
 class GeminiMultimodalProvider:
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(
+        self,
+        config_manager: ConfigManager,
+        api_key: Optional[str] = None,
+        endpoint_name: str = "GeminiAPI",
+    ):
+        """api_key 用于在同一配置下创建使用其他 Key 的端点，未指定时读取 GeminiAPI 配置"""
         self.config_manager = config_manager
+        self.endpoint_name = endpoint_name
+        self._api_key_override = api_key
         self.last_error = None
+        self.client_error: Optional[str] = None
         self.genai_client: Optional[genai.Client] = None
         self.configured_model_name: Optional[str] = None
+        self._async_genai_clients: Dict[Any, Any] = {}
         self._initialize_client()
 
     def reload_client(self):
         self._initialize_client()
 
     def _initialize_client(self):
+        self.client_error = None
         if not GENAI_LIB_AVAILABLE:
-            self.last_error = "Google Gen AI 库 (google-genai) 未安装。"
+            self.client_error = "Google Gen AI 库 (google-genai) 未安装。"
+            self.last_error = self.client_error
             return
-        api_key = self.config_manager.get("GeminiAPI", "api_key")
         try:
-            if api_key:
-                self.genai_client = genai.Client(api_key=api_key)
-            else:
-                self.genai_client = genai.Client()
+            self.genai_client = self._create_genai_client()
             self.configured_model_name = self.config_manager.get(
                 "GeminiAPI", "model_name", "gemini-1.5-flash-latest"
             )
@@ -46,55 +81,181 @@ class GeminiMultimodalProvider:
                     f"Info: Model name starts with 'models/'. Using '{self.configured_model_name}'."
                 )
         except Exception as e:
-            self.last_error = f"配置 Google Gen AI SDK 客户端时发生错误: {e}"
+            self.client_error = f"配置 Google Gen AI SDK 客户端时发生错误: {e}"
+            self.last_error = self.client_error
             self.genai_client = None
 
+    def _get_api_key(self) -> str:
+        return self._api_key_override or self.config_manager.get("GeminiAPI", "api_key")
+
+    def _get_rate_limiter(self):
+        return get_rate_limiter(self.config_manager, "GeminiAPI", self.endpoint_name)
+
+    def _create_genai_client(self, api_key: Optional[str] = None):
+        if api_key is None:
+            api_key = self._get_api_key()
+        if api_key:
+            return genai.Client(api_key=api_key)
+        return genai.Client()
+
+    def _get_async_genai_client(self):
+        """
+        返回绑定当前事件循环的 client.aio。
+        异步客户端内部的连接池属于创建它的事件循环，因此每个批处理循环使用独立的客户端。
+        """
+        loop = asyncio.get_running_loop()
+        api_key = self._get_api_key()
+        cached = self._async_genai_clients.get(loop)
+        if cached is not None and cached[0] == api_key:
+            return cached[1]
+        async_client = self._create_genai_client(api_key).aio
+        self._async_genai_clients[loop] = (api_key, async_client)
+        if cached is not None:
+            loop.create_task(cached[1].aclose())
+        return async_client
+
+    async def aclose_async_client(self):
+        """关闭当前事件循环的异步客户端，应在事件循环结束前调用"""
+        cached = self._async_genai_clients.pop(asyncio.get_running_loop(), None)
+        if cached is not None:
+            try:
+                await cached[1].aclose()
+            except Exception as e:
+                print(f"警告: 关闭 Gemini 异步客户端时出错: {e}")
+
+    async def _generate_content_async(self, model_name: str, contents, config):
+        return await self._get_async_genai_client().models.generate_content(
+            model=model_name, contents=contents, config=config
+        )
+
+    def generate_content(self, model_name: str, contents, config):
+        """
+        同步调用：在后台事件循环中通过 client.aio 执行，
+        使 call_with_retries 的 AbortHandle 能在取消或超时时取消在途请求
+        """
+        return run_coroutine_abortable(
+            self._generate_content_async(model_name, contents, config)
+        )
+
+    async def _aiter_content_stream(self, model_name: str, contents, config):
+        async_client = self._get_async_genai_client()
+        async for chunk in await async_client.models.generate_content_stream(
+            model=model_name, contents=contents, config=config
+        ):
+            yield chunk
+
+    def generate_content_stream(self, model_name: str, contents, config):
+        """generate_content 的流式版本，逐个产出响应片段"""
+        return iter_async_abortable(
+            self._aiter_content_stream(model_name, contents, config)
+        )
+
     def get_last_error(self) -> Optional[str]:
         return self.last_error
 
-    def process_image(
-        self,
-        pil_image: Image.Image,
-        progress_callback=None,
-        cancellation_event: threading.Event = None,
-    ) -> Optional[List[Dict[str, Any]]]:
-        self.last_error = None
-        if not GENAI_LIB_AVAILABLE or not self.genai_client:
-            self.last_error = self.last_error or "Gemini 客户端未初始化。"
-            return None
-        target_language = self.config_manager.get(
-            "GeminiAPI", "target_language", "Chinese"
+    def create_text_model(self, model_name: Optional[str] = None) -> "GeminiTextModel":
+        """返回供文本翻译 Provider 使用的纯文本模型，未指定模型时使用当前配置的模型"""
+        return GeminiTextModel(
+            self,
+            model_name
+            or self.configured_model_name
+            or self.config_manager.get("GeminiAPI", "model_name"),
         )
+
+    def get_language_pair(self) -> Tuple[str, str]:
         source_language = (
             self.config_manager.get(
                 "GeminiAPI", "source_language", fallback="Japanese"
             ).strip()
             or "Japanese"
         )
-        raw_glossary_text = self.config_manager.get(
-            "GeminiAPI", "glossary_text", fallback=""
-        ).strip()
-        glossary_section = ""
-        if raw_glossary_text:
-            glossary_lines = [
-                line.strip()
-                for line in raw_glossary_text.splitlines()
-                if line.strip() and "->" in line.strip()
-            ]
-            if glossary_lines:
-                actual_glossary_content = "\n".join(glossary_lines)
-                glossary_section = f"""
-IMPORTANT: When translating, strictly adhere to the following glossary (source_term->target_term format). Apply these translations wherever applicable:
-<glossary>
-{actual_glossary_content}
-</glossary>
-"""
-        prompt_text = get_gemini_ocr_translation_prompt(
-            source_language, target_language, glossary_section, self.config_manager
+        target_language = self.config_manager.get(
+            "GeminiAPI", "target_language", "Chinese"
         )
-        if cancellation_event and cancellation_event.is_set():
-            return None
-        request_contents = [prompt_text, pil_image]
+        return source_language, target_language
+
+    def build_prompt(self) -> str:
+        source_language, target_language = self.get_language_pair()
+        if is_two_stage_enabled(self.config_manager):
+            return get_ocr_only_prompt(source_language)
+        return get_gemini_ocr_translation_prompt(
+            source_language,
+            target_language,
+            build_ocr_glossary_section(self.config_manager),
+            self.config_manager,
+        )
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        """
+        返回影响识别/翻译结果的全部请求参数，用于结果缓存的键。
+        两阶段模式下视觉请求只做 OCR，目标语言与术语表不计入键，更换后仍可复用缓存。
+        """
+        source_language, target_language = self.get_language_pair()
+        if is_two_stage_enabled(self.config_manager):
+            return {
+                "provider": "gemini",
+                "model": self.configured_model_name,
+                "prompt": self.build_prompt(),
+                "source_language": source_language,
+            }
+        return {
+            "provider": "gemini",
+            "model": self.configured_model_name,
+            "prompt": self.build_prompt(),
+            "glossary": self.config_manager.get(
+                "GeminiAPI", "glossary_text", fallback=""
+            ).strip(),
+            "source_language": source_language,
+            "target_language": target_language,
+        }
+
+    def process_image(
+        self,
+        pil_image: Image.Image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        blocks, self.last_error = self.request_blocks(
+            pil_image,
+            progress_callback=progress_callback,
+            cancellation_event=cancellation_event,
+        )
+        return blocks
+
+    def _prepare_request(self, pil_image, tracer=None):
+        """构建 Prompt、编码上传图像并计算录制指纹（同步与异步请求共用）"""
+        prompt_text = self.build_prompt()
+        if isinstance(pil_image, EncodedImage):
+            encoded_image = pil_image
+        else:
+            with trace_span(tracer, "upload_encode", "provider") as span_args:
+                encoded_image = encode_image_for_upload(pil_image, self.config_manager)
+                span_args["format"] = encoded_image.format
+                span_args["bytes"] = encoded_image.size_bytes
+        cassette = get_cassette(self.config_manager)
+        fingerprint = None
+        if cassette:
+            fingerprint = compute_request_fingerprint(
+                "gemini",
+                self.configured_model_name
+                or self.config_manager.get("GeminiAPI", "model_name"),
+                prompt_text,
+                encoded_image.data,
+                {"temperature": 0.5, "thinking_budget": 21145},
+            )
+        return prompt_text, encoded_image, cassette, fingerprint
+
+    def _build_request(self, prompt_text: str, *encoded_images: EncodedImage):
+        """传入多张图片时（多页打包）在每张图片前加 "Image i" 标记"""
+        request_contents = [prompt_text]
+        for image_index, encoded_image in enumerate(encoded_images):
+            if len(encoded_images) > 1:
+                request_contents.append(f"Image {image_index}:")
+            request_contents.append(
+                google_genai_types.Part.from_bytes(
+                    data=encoded_image.data, mime_type=encoded_image.mime_type
+                )
+            )
         current_generation_config = None
         if google_genai_types:
             thinking_config_obj = google_genai_types.ThinkingConfig(
@@ -105,47 +266,353 @@ IMPORTANT: When translating, strictly adhere to the following glossary (source_t
                 response_mime_type="application/json",
                 thinking_config=thinking_config_obj,
             )
+        return request_contents, current_generation_config
+
+    @staticmethod
+    def _extract_response_text(response) -> str:
+        raw_response_text = ""
+        if hasattr(response, "text") and response.text:
+            raw_response_text = response.text
+        elif hasattr(response, "candidates") and response.candidates:
+            if (
+                response.candidates
+                and response.candidates[0].content
+                and response.candidates[0].content.parts
+            ):
+                raw_response_text = "".join(
+                    part.text
+                    for part in response.candidates[0].content.parts
+                    if hasattr(part, "text") and part.text
+                )
+        return raw_response_text
+
+    def _handle_response(
+        self, response, cassette, fingerprint, request_start: float, tracer=None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        raw_response_text = self._extract_response_text(response)
+        if not raw_response_text:
+            feedback_msg = ""
+            if hasattr(response, "prompt_feedback"):
+                feedback_msg = f" Prompt Feedback: {response.prompt_feedback}"
+            return None, f"Gemini API 未返回有效内容文本.{feedback_msg}"
+        return self._handle_raw_text(
+            raw_response_text, cassette, fingerprint, request_start, tracer
+        )
+
+    def _handle_raw_text(
+        self,
+        raw_response_text: str,
+        cassette,
+        fingerprint,
+        request_start: float,
+        tracer=None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        if not raw_response_text:
+            return None, "Gemini API 未返回有效内容文本."
+        if cassette and cassette.mode == "record":
+            cassette.record(
+                fingerprint,
+                raw_response_text,
+                time.perf_counter() - request_start,
+                {"provider": "gemini", "model": self.configured_model_name},
+            )
+        with trace_span(tracer, "provider.parse", "provider", provider="gemini"):
+            return self._parse_json_response(raw_response_text)
+
+    def _estimate_request_tokens(
+        self, prompt_text: str, *encoded_images: EncodedImage
+    ) -> int:
+        image_tokens = sum(
+            estimate_image_tokens(
+                encoded_image.image_size, tile_px=768, tokens_per_tile=258
+            )
+            for encoded_image in encoded_images
+        )
+        return estimate_request_tokens(prompt_text, image_tokens)
+
+    def request_blocks(
+        self,
+        pil_image: Image.Image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+        block_callback=None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        可重入的请求接口，不修改实例状态，可被多个线程同时调用。
+        429/5xx/网络错误在 deadline（time.monotonic() 时间）之前按重试策略重试。
+        传入 block_callback 且启用流式响应时，每解析出一个文本块就回调一次；
+        流中途中断时返回已收到的块和错误信息（这种不完整的结果不会被缓存）。
+        Returns:
+            (中间块列表或 None, 错误信息或 None)
+        """
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        prompt_text, encoded_image, cassette, fingerprint = self._prepare_request(
+            pil_image, tracer
+        )
+        if cassette and cassette.mode == "replay":
+            with trace_span(tracer, "provider.replay", "provider", provider="gemini"):
+                return replay_response(
+                    cassette,
+                    fingerprint,
+                    self._parse_json_response,
+                    cancellation_event,
+                )
+        if not GENAI_LIB_AVAILABLE or not self.genai_client:
+            return None, self.client_error or "Gemini 客户端未初始化。"
+        request_contents, current_generation_config = self._build_request(
+            prompt_text, encoded_image
+        )
         try:
             if progress_callback:
                 progress_callback(
                     25, f"发送请求给 Gemini ({self.configured_model_name})..."
                 )
-            response = self.genai_client.models.generate_content(
-                model=self.configured_model_name,
-                contents=request_contents,
-                config=current_generation_config,
+            if block_callback is not None and self.config_manager.getboolean(
+                "Streaming", "enabled", fallback=True
+            ):
+                return self._request_blocks_streaming(
+                    request_contents,
+                    current_generation_config,
+                    self._estimate_request_tokens(prompt_text, encoded_image),
+                    cassette,
+                    fingerprint,
+                    block_callback,
+                    cancellation_event,
+                    tracer,
+                    deadline,
+                )
+
+            def _attempt():
+                request_start = time.perf_counter()
+                with trace_span(tracer, "provider.http", "provider", provider="gemini"):
+                    response = self.generate_content(
+                        self.configured_model_name,
+                        request_contents,
+                        current_generation_config,
+                    )
+                return response, request_start
+
+            attempt_result = call_with_retries(
+                self._get_rate_limiter(),
+                _attempt,
+                self._estimate_request_tokens(prompt_text, encoded_image),
+                deadline,
+                cancellation_event,
+                tracer,
             )
-            if cancellation_event and cancellation_event.is_set():
-                return None
-            raw_response_text = ""
-            if hasattr(response, "text") and response.text:
-                raw_response_text = response.text
-            elif hasattr(response, "candidates") and response.candidates:
-                if (
-                    response.candidates
-                    and response.candidates[0].content
-                    and response.candidates[0].content.parts
+            if attempt_result is None or (
+                cancellation_event and cancellation_event.is_set()
+            ):
+                return None, None
+            response, request_start = attempt_result
+            return self._handle_response(
+                response, cassette, fingerprint, request_start, tracer
+            )
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            return None, f"Gemini API 调用/处理时发生错误: {e}"
+
+    def request_blocks_packed(
+        self,
+        pil_images: List[Image.Image],
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Optional[List[Dict[str, Any]]]]], Optional[str]]:
+        """
+        多页打包：在一次请求中发送多张图片，按 image_index 拆分回各页。
+        Returns:
+            (每张图片的中间块列表，解析失败或缺失的图片为 None；整体失败时为 None, 错误信息或 None)
+        """
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        if not GENAI_LIB_AVAILABLE or not self.genai_client:
+            return None, self.client_error or "Gemini 客户端未初始化。"
+        prompt_text = get_multi_image_prompt(self.build_prompt(), len(pil_images))
+        with trace_span(
+            tracer, "upload_encode", "provider", images=len(pil_images)
+        ) as span_args:
+            encoded_images = [
+                encode_image_for_upload(pil_image, self.config_manager)
+                for pil_image in pil_images
+            ]
+            span_args["bytes"] = sum(image.size_bytes for image in encoded_images)
+        request_contents, current_generation_config = self._build_request(
+            prompt_text, *encoded_images
+        )
+        try:
+
+            def _attempt():
+                with trace_span(
+                    tracer, "provider.http", "provider", provider="gemini", packed=True
                 ):
-                    raw_response_text = "".join(
-                        part.text
-                        for part in response.candidates[0].content.parts
-                        if hasattr(part, "text")
+                    return self.generate_content(
+                        self.configured_model_name,
+                        request_contents,
+                        current_generation_config,
                     )
+
+            response = call_with_retries(
+                self._get_rate_limiter(),
+                _attempt,
+                self._estimate_request_tokens(prompt_text, *encoded_images),
+                deadline,
+                cancellation_event,
+                tracer,
+            )
+            if response is None or (cancellation_event and cancellation_event.is_set()):
+                return None, None
+            raw_response_text = self._extract_response_text(response)
             if not raw_response_text:
-                feedback_msg = ""
-                if hasattr(response, "prompt_feedback"):
-                    feedback_msg = f" Prompt Feedback: {response.prompt_feedback}"
-                self.last_error = f"Gemini API 未返回有效内容文本.{feedback_msg}"
-                return None
-            return self._parse_json_response(raw_response_text)
+                return None, "Gemini API 未返回有效内容文本."
+            with trace_span(tracer, "provider.parse", "provider", provider="gemini"):
+                return split_packed_response(
+                    raw_response_text, len(pil_images), self._normalize_block
+                )
+        except Exception as e:
+            return None, f"Gemini API 调用/处理时发生错误: {e}"
+
+    def _request_blocks_streaming(
+        self,
+        request_contents,
+        generation_config,
+        estimated_tokens: int,
+        cassette,
+        fingerprint,
+        block_callback,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        def _attempt():
+            collector = StreamingBlockCollector(self._normalize_block, block_callback)
+            request_start = time.perf_counter()
+            try:
+                with trace_span(
+                    tracer, "provider.http", "provider", provider="gemini", stream=True
+                ):
+                    for chunk in self.generate_content_stream(
+                        self.configured_model_name, request_contents, generation_config
+                    ):
+                        collector.feed(self._extract_response_text(chunk))
+            except Exception as e:
+                # 取消或超过截止时间时连接被看门狗关闭，保留已收到的块作为部分结果
+                if not collector.blocks:
+                    raise
+                return collector, request_start, get_abort_error(e)
+            return collector, request_start, None
+
+        attempt_result = call_with_retries(
+            self._get_rate_limiter(),
+            _attempt,
+            estimated_tokens,
+            deadline,
+            cancellation_event,
+            tracer,
+        )
+        if attempt_result is None or (
+            cancellation_event and cancellation_event.is_set()
+        ):
+            return None, None
+        collector, request_start, stream_error = attempt_result
+        if stream_error is not None:
+            print(
+                f"警告: Gemini 流式响应中断，保留已收到的 {len(collector.blocks)} 个文本块: {stream_error}"
+            )
+            return collector.blocks, f"流式响应中断: {stream_error}"
+        blocks, error = self._handle_raw_text(
+            collector.text, cassette, fingerprint, request_start, tracer
+        )
+        if blocks is None and collector.blocks:
+            return collector.blocks, error
+        return blocks, error
+
+    async def request_blocks_async(
+        self,
+        pil_image: Image.Image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """request_blocks 的 asyncio 版本，使用 google-genai 的 client.aio 接口"""
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        prompt_text, encoded_image, cassette, fingerprint = await asyncio.to_thread(
+            self._prepare_request, pil_image, tracer
+        )
+        if cassette and cassette.mode == "replay":
+            with trace_span(tracer, "provider.replay", "provider", provider="gemini"):
+                return await asyncio.to_thread(
+                    replay_response,
+                    cassette,
+                    fingerprint,
+                    self._parse_json_response,
+                    cancellation_event,
+                )
+        if not GENAI_LIB_AVAILABLE or not self.genai_client:
+            return None, self.client_error or "Gemini 客户端未初始化。"
+        request_contents, current_generation_config = self._build_request(
+            prompt_text, encoded_image
+        )
+        try:
+            if progress_callback:
+                progress_callback(
+                    25, f"发送请求给 Gemini ({self.configured_model_name})..."
+                )
+            async_client = self._get_async_genai_client()
+
+            async def _attempt():
+                request_start = time.perf_counter()
+                with trace_span(tracer, "provider.http", "provider", provider="gemini"):
+                    response = await async_client.models.generate_content(
+                        model=self.configured_model_name,
+                        contents=request_contents,
+                        config=current_generation_config,
+                    )
+                return response, request_start
+
+            attempt_result = await call_with_retries_async(
+                self._get_rate_limiter(),
+                _attempt,
+                self._estimate_request_tokens(prompt_text, encoded_image),
+                deadline,
+                cancellation_event,
+                tracer,
+            )
+            if attempt_result is None:
+                return None, None
+            response, request_start = attempt_result
+            return self._handle_response(
+                response, cassette, fingerprint, request_start, tracer
+            )
         except Exception as e:
-            self.last_error = f"Gemini API 调用/处理时发生错误: {e}"
             import traceback
 
             traceback.print_exc()
-            return None
+            return None, f"Gemini API 调用/处理时发生错误: {e}"
+
+    async def process_image_async(
+        self,
+        pil_image: Image.Image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        blocks, self.last_error = await self.request_blocks_async(
+            pil_image,
+            progress_callback=progress_callback,
+            cancellation_event=cancellation_event,
+        )
+        return blocks
 
-    def _parse_json_response(self, raw_text: str) -> Optional[List[Dict[str, Any]]]:
+    def _parse_json_response(
+        self, raw_text: str
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
         cleaned_json_text = raw_text.strip()
         if cleaned_json_text.startswith("```json"):
             cleaned_json_text = cleaned_json_text[7:]
@@ -157,50 +624,89 @@ IMPORTANT: When translating, strictly adhere to the following glossary (source_t
                 cleaned_json_text = cleaned_json_text[:-3]
         cleaned_json_text = cleaned_json_text.strip()
         if not cleaned_json_text or cleaned_json_text == "[]":
-            return []
+            return [], None
         try:
             data = json.loads(cleaned_json_text)
             if isinstance(data, list):
                 processed_data = []
                 for item_idx, item in enumerate(data):
-                    if not isinstance(item, dict):
-                        continue
-                    if (
-                        "bounding_box" in item
-                        and isinstance(item["bounding_box"], list)
-                        and len(item["bounding_box"]) == 4
-                    ):
-                        try:
-                            y_min, x_min, y_max, x_max = [
-                                int(c) for c in item["bounding_box"]
-                            ]
-                            x_min_n = max(0.0, min(1.0, x_min / 1000.0))
-                            y_min_n = max(0.0, min(1.0, y_min / 1000.0))
-                            x_max_n = max(0.0, min(1.0, x_max / 1000.0))
-                            y_max_n = max(0.0, min(1.0, y_max / 1000.0))
-                            final_x_min = min(x_min_n, x_max_n)
-                            final_y_min = min(y_min_n, y_max_n)
-                            final_x_max = max(x_min_n, x_max_n)
-                            final_y_max = max(y_min_n, y_max_n)
-                            item["bbox_norm"] = [
-                                final_x_min,
-                                final_y_min,
-                                final_x_max,
-                                final_y_max,
-                            ]
-                            item["id"] = f"gemini_multimodal_{item_idx}"
-                            processed_data.append(item)
-                        except (ValueError, TypeError):
-                            print(
-                                f"Warning: Failed to normalize bbox for item {item_idx}"
-                            )
-                            continue
-                    else:
-                        continue
-                return processed_data
+                    normalized_item = self._normalize_block(item, item_idx)
+                    if normalized_item is not None:
+                        processed_data.append(normalized_item)
+                return processed_data, None
             else:
-                self.last_error = f"Gemini 返回非JSON列表: {cleaned_json_text[:100]}..."
-                return None
+                return None, f"Gemini 返回非JSON列表: {cleaned_json_text[:100]}..."
         except json.JSONDecodeError as e:
-            self.last_error = f"解析 Gemini JSON失败: {e}"
+            return None, f"解析 Gemini JSON失败: {e}"
+
+    @staticmethod
+    def _normalize_block(item, item_idx: int) -> Optional[Dict[str, Any]]:
+        """把 0-1000 的 bounding_box 转换为 bbox_norm；无效的块返回 None"""
+        if not isinstance(item, dict):
+            return None
+        if not (
+            "bounding_box" in item
+            and isinstance(item["bounding_box"], list)
+            and len(item["bounding_box"]) == 4
+        ):
             return None
+        try:
+            y_min, x_min, y_max, x_max = [int(c) for c in item["bounding_box"]]
+        except (ValueError, TypeError):
+            print(f"Warning: Failed to normalize bbox for item {item_idx}")
+            return None
+        x_min_n = max(0.0, min(1.0, x_min / 1000.0))
+        y_min_n = max(0.0, min(1.0, y_min / 1000.0))
+        x_max_n = max(0.0, min(1.0, x_max / 1000.0))
+        y_max_n = max(0.0, min(1.0, y_max / 1000.0))
+        item["bbox_norm"] = [
+            min(x_min_n, x_max_n),
+            min(y_min_n, y_max_n),
+            max(x_min_n, x_max_n),
+            max(y_min_n, y_max_n),
+        ]
+        item["id"] = f"gemini_multimodal_{item_idx}"
+        return item
+
+
+class GeminiTextModel:
+    """
+    为 services/translation 中的文本翻译 Provider 提供 generate_content(prompt, ...) 接口，
+    复用多模态 Provider 的客户端、限流器与重试策略。
+    """
+
+    def __init__(self, provider: GeminiMultimodalProvider, model_name: str):
+        self.provider = provider
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, safety_settings=None, request_options=None):
+        """request_options["timeout"] 作为包括重试在内的截止时间；超时抛出 TimeoutError"""
+        provider = self.provider
+        if not GENAI_LIB_AVAILABLE or not provider.genai_client:
+            raise RuntimeError(provider.client_error or "Gemini 客户端未初始化。")
+        generation_config = google_genai_types.GenerateContentConfig(
+            temperature=0.3,
+            safety_settings=[
+                google_genai_types.SafetySetting(
+                    category=setting["category"], threshold=setting["threshold"]
+                )
+                for setting in safety_settings or []
+            ],
+        )
+        timeout = (request_options or {}).get("timeout")
+        deadline = time.monotonic() + timeout if timeout else None
+
+        def _attempt():
+            return provider.generate_content(
+                self.model_name, [prompt], generation_config
+            )
+
+        try:
+            return call_with_retries(
+                provider._get_rate_limiter(),
+                _attempt,
+                estimate_request_tokens(prompt, 0, output_tokens=len(prompt) // 3),
+                deadline,
+            )
+        except RequestDeadlineExceeded as e:
+            raise TimeoutError(str(e)) from e
@@ -0,0 +1,341 @@
+"""
+对冲请求 (hedged requests)
+单次请求在最近观测延迟的指定分位数内仍未返回时，再发送一份相同的请求（可发往另一个 Provider），
+采用先成功返回的结果并中止另一个的在途连接，用少量额外请求削减长尾延迟。
+对冲次数不超过总请求数的 Hedging.max_hedge_ratio，避免在服务整体变慢时成倍放大负载。
+缓存键按主 Provider 计算，因此缓存标识不同的对冲 Provider 返回的块与路由后备层一样带有
+ROUTED_ENDPOINT_KEY 标记，不写入缓存。
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import ConfigManager
+from services.router import ROUTED_ENDPOINT_KEY
+from utils.cancellation import cancellation_callback
+
+HEDGE_MAX_WORKERS = 16
+# 同步请求的各次尝试在共享的有界线程池中执行，落选的尝试被中止后线程即归还线程池
+_attempt_executor = ThreadPoolExecutor(
+    max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="Hedged"
+)
+
+
+class LatencyTracker:
+    """保存最近 window_size 次成功请求的耗时（秒），线程安全"""
+
+    def __init__(self, window_size: int = 200):
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = math.ceil(len(samples) * min(max(percentile, 0.0), 100.0) / 100.0)
+        return samples[min(max(rank, 1), len(samples)) - 1]
+
+
+class HedgedProvider:
+    """
+    包装主 Provider，提供与之相同的 request_blocks / request_blocks_async 接口。
+    样本数不足 min_samples 前不发送对冲请求，只记录延迟。
+    """
+
+    def __init__(self, primary_provider, hedge_provider, hedge_name: str):
+        self.primary_provider = primary_provider
+        self.hedge_provider = hedge_provider
+        self.hedge_name = hedge_name
+        self.latency_tracker = LatencyTracker()
+        self.latency_percentile = 95.0
+        self.min_samples = 20
+        self.max_hedge_ratio = 0.1
+        self.min_hedge_delay = 1.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+            "hedges_skipped": 0,
+        }
+
+    def configure(self, config_manager: ConfigManager):
+        self.latency_percentile = config_manager.getfloat(
+            "Hedging", "latency_percentile", fallback=95.0
+        )
+        self.min_samples = max(
+            1, config_manager.getint("Hedging", "min_samples", fallback=20)
+        )
+        self.max_hedge_ratio = max(
+            0.0, config_manager.getfloat("Hedging", "max_hedge_ratio", fallback=0.1)
+        )
+        self.min_hedge_delay = max(
+            0.0,
+            config_manager.getfloat(
+                "Hedging", "min_hedge_delay_seconds", fallback=1.0
+            ),
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hedge_provider"] = self.hedge_name
+        stats["latency_samples"] = len(self.latency_tracker)
+        hedge_delay = self._get_hedge_delay()
+        stats["hedge_delay_seconds"] = (
+            round(hedge_delay, 3) if hedge_delay is not None else None
+        )
+        return stats
+
+    def _get_hedge_delay(self) -> Optional[float]:
+        if len(self.latency_tracker) < self.min_samples:
+            return None
+        return max(
+            self.min_hedge_delay,
+            self.latency_tracker.percentile(self.latency_percentile),
+        )
+
+    def _begin_request(self) -> Optional[float]:
+        with self._lock:
+            self.stats["requests"] += 1
+        return self._get_hedge_delay()
+
+    def _try_reserve_hedge(self) -> bool:
+        with self._lock:
+            if self.stats["hedges_sent"] + 1 > (
+                self.max_hedge_ratio * self.stats["requests"]
+            ):
+                self.stats["hedges_skipped"] += 1
+                return False
+            self.stats["hedges_sent"] += 1
+            return True
+
+    def _mark_hedge_blocks(self, label: str, outcome: Tuple) -> Tuple:
+        """对冲 Provider 的缓存标识与主 Provider 不同时标记其返回的块，见 is_routed_result"""
+        blocks = outcome[0]
+        if (
+            label == "hedge"
+            and blocks
+            and self.hedge_provider.get_cache_identity()
+            != self.primary_provider.get_cache_identity()
+        ):
+            for block in blocks:
+                block[ROUTED_ENDPOINT_KEY] = self.hedge_name
+        return outcome
+
+    def _record_outcome(self, label: str, outcome: Tuple, elapsed: float) -> bool:
+        """记录成功结果的延迟，返回该结果是否可以直接采用"""
+        blocks, error = outcome
+        if blocks is None or error is not None:
+            return False
+        self.latency_tracker.record(elapsed)
+        if label == "hedge":
+            with self._lock:
+                self.stats["hedges_won"] += 1
+        return True
+
+    def request_blocks(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+        block_callback=None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        hedge_delay = self._begin_request()
+        if hedge_delay is None:
+            request_start = time.perf_counter()
+            outcome = self.primary_provider.request_blocks(
+                pil_image,
+                progress_callback=progress_callback,
+                cancellation_event=cancellation_event,
+                tracer=tracer,
+                deadline=deadline,
+                block_callback=block_callback,
+            )
+            self._record_outcome(
+                "primary", outcome, time.perf_counter() - request_start
+            )
+            return outcome
+        finished_attempts: List[Tuple] = []
+        attempt_done = threading.Condition()
+        attempt_events: Dict[str, threading.Event] = {}
+        attempt_futures = []
+        streaming_leader: List[str] = []
+
+        def _make_block_callback(label):
+            """只转发最先开始流式返回的请求的文本块，避免两份结果在预览中交错"""
+            if block_callback is None:
+                return None
+
+            def _forward(block):
+                with self._lock:
+                    if not streaming_leader:
+                        streaming_leader.append(label)
+                    is_leader = streaming_leader[0] == label
+                if is_leader:
+                    block_callback(block)
+
+            return _forward
+
+        def _run_attempt(label, provider, attempt_progress, attempt_event):
+            request_start = time.perf_counter()
+            try:
+                outcome = provider.request_blocks(
+                    pil_image,
+                    progress_callback=attempt_progress,
+                    cancellation_event=attempt_event,
+                    tracer=tracer,
+                    deadline=deadline,
+                    block_callback=_make_block_callback(label),
+                )
+            except Exception as e:
+                outcome = None, f"{label} 请求异常: {e}"
+            with attempt_done:
+                finished_attempts.append(
+                    (label, outcome, time.perf_counter() - request_start)
+                )
+                attempt_done.notify_all()
+
+        def _start_attempt(label, provider, attempt_progress):
+            # 落选的请求通过 attempt_event 取消：Provider 的 call_with_retries 随即关闭其在途连接
+            attempt_event = threading.Event()
+            attempt_events[label] = attempt_event
+            attempt_futures.append(
+                _attempt_executor.submit(
+                    _run_attempt, label, provider, attempt_progress, attempt_event
+                )
+            )
+
+        def _cancel_attempts():
+            for attempt_event in attempt_events.values():
+                attempt_event.set()
+            for future in attempt_futures:
+                future.cancel()
+
+        def _wake_on_cancel():
+            with attempt_done:
+                attempt_done.notify_all()
+
+        def _is_cancelled() -> bool:
+            return cancellation_event is not None and cancellation_event.is_set()
+
+        _start_attempt("primary", self.primary_provider, progress_callback)
+        hedge_at = time.monotonic() + hedge_delay
+        pending_attempts = 1
+        fallback_outcome = (None, None)
+        with cancellation_callback(cancellation_event, _wake_on_cancel):
+            while pending_attempts:
+                with attempt_done:
+                    while not finished_attempts and not _is_cancelled():
+                        wait_time = hedge_at - time.monotonic()
+                        if wait_time <= 0:
+                            break
+                        attempt_done.wait(None if math.isinf(wait_time) else wait_time)
+                    completed_attempts = list(finished_attempts)
+                    finished_attempts.clear()
+                if _is_cancelled():
+                    _cancel_attempts()
+                    return None, None
+                for label, outcome, elapsed in completed_attempts:
+                    pending_attempts -= 1
+                    outcome = self._mark_hedge_blocks(label, outcome)
+                    if self._record_outcome(label, outcome, elapsed):
+                        _cancel_attempts()
+                        return outcome
+                    if fallback_outcome[0] is None:
+                        fallback_outcome = outcome
+                if (
+                    pending_attempts
+                    and "hedge" not in attempt_events
+                    and time.monotonic() >= hedge_at
+                ):
+                    hedge_at = math.inf
+                    if self._try_reserve_hedge():
+                        if progress_callback:
+                            progress_callback(
+                                50,
+                                f"请求超过 {hedge_delay:.1f} 秒未返回，发送对冲请求...",
+                            )
+                        _start_attempt("hedge", self.hedge_provider, None)
+                        pending_attempts += 1
+        return fallback_outcome
+
+    async def request_blocks_async(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """request_blocks 的 asyncio 版本，落选的请求通过取消任务立即中止"""
+
+        async def _attempt(label, provider):
+            request_start = time.perf_counter()
+            request_async = getattr(provider, "request_blocks_async", None)
+            try:
+                if request_async is not None:
+                    outcome = await request_async(
+                        pil_image,
+                        progress_callback=None,
+                        cancellation_event=cancellation_event,
+                        tracer=tracer,
+                        deadline=deadline,
+                    )
+                else:
+                    outcome = await asyncio.to_thread(
+                        provider.request_blocks,
+                        pil_image,
+                        progress_callback=None,
+                        cancellation_event=cancellation_event,
+                        tracer=tracer,
+                        deadline=deadline,
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                outcome = None, f"{label} 请求异常: {e}"
+            return label, outcome, time.perf_counter() - request_start
+
+        hedge_delay = self._begin_request()
+        pending_tasks = {
+            asyncio.ensure_future(_attempt("primary", self.primary_provider))
+        }
+        if hedge_delay is not None:
+            done_tasks, _ = await asyncio.wait(pending_tasks, timeout=hedge_delay)
+            if not done_tasks and self._try_reserve_hedge():
+                pending_tasks.add(
+                    asyncio.ensure_future(_attempt("hedge", self.hedge_provider))
+                )
+        fallback_outcome = (None, None)
+        try:
+            while pending_tasks:
+                done_tasks, pending_tasks = await asyncio.wait(
+                    pending_tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done_tasks:
+                    label, outcome, elapsed = task.result()
+                    outcome = self._mark_hedge_blocks(label, outcome)
+                    if self._record_outcome(label, outcome, elapsed):
+                        return outcome
+                    if fallback_outcome[0] is None:
+                        fallback_outcome = outcome
+            return fallback_outcome
+        finally:
+            for task in pending_tasks:
+                task.cancel()
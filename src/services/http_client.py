@@ -0,0 +1,288 @@
+"""
+Provider 共享的 HTTP 连接池
+每个 Provider 持有一个长期存在的客户端，复用 TCP/TLS 连接（以及经代理时的 CONNECT 隧道），
+启用 Proxy 配置时显式使用该代理，否则与 requests/httpx 的默认行为一致，
+沿用环境中的代理 (HTTP(S)_PROXY/NO_PROXY)、CA 证书 (REQUESTS_CA_BUNDLE/SSL_CERT_FILE) 与 .netrc。
+只有连接相关的设置发生变化时才重建客户端。
+在途请求可以被当前线程的 AbortHandle 中止：HTTP/1.1 连接池把取出的连接登记到句柄上，
+中止时关闭其套接字；HTTP/2 请求在后台事件循环中执行，中止时取消任务并重置该流。
+"""
+
+import importlib.util
+import threading
+from dataclasses import dataclass
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from core.config import ConfigManager
+from utils.async_tasks import iter_async_abortable, run_coroutine_abortable
+from utils.cancellation import get_current_abort_handle, shutdown_socket
+
+try:
+    import httpx
+
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def get_proxy_url(config_manager: ConfigManager) -> Optional[str]:
+    """按 Proxy 配置返回代理 URL，未启用或未填写时返回 None"""
+    if not config_manager.getboolean("Proxy", "enabled", fallback=False):
+        return None
+    host = config_manager.get("Proxy", "host", "").strip()
+    port = config_manager.get("Proxy", "port", "").strip()
+    if not host or not port:
+        return None
+    return f"http://{host}:{port}"
+
+
+@dataclass(frozen=True)
+class HttpClientSettings:
+    """决定连接行为的设置；相等时可以复用已有的客户端"""
+
+    pool_size: int = 8
+    keep_alive: bool = True
+    http2: bool = False
+    proxy_url: Optional[str] = None
+
+
+def build_http_client_settings(config_manager: ConfigManager) -> HttpClientSettings:
+    return HttpClientSettings(
+        pool_size=max(1, config_manager.getint("HttpClient", "pool_size", fallback=8)),
+        keep_alive=config_manager.getboolean(
+            "HttpClient", "keep_alive", fallback=True
+        ),
+        http2=config_manager.getboolean("HttpClient", "http2", fallback=False),
+        proxy_url=get_proxy_url(config_manager),
+    )
+
+
+def _iter_response_chunks(response):
+    """
+    产出已到达的响应数据，不等待凑满固定大小。
+    分块传输按块读取；其余情况用 read1 读取当前可用的数据，
+    iter_lines 默认的 512 字节 read() 会把小的 SSE 事件攒在缓冲区里。
+    """
+    raw = response.raw
+    if getattr(raw, "chunked", False) or not hasattr(raw, "read1"):
+        yield from response.iter_content(chunk_size=None)
+        return
+    while True:
+        data = raw.read1(65536, decode_content=True)
+        if not data:
+            return
+        yield data
+
+
+def _iter_byte_lines(chunks):
+    pending = b""
+    for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending
+
+
+class _AbortableConnectionPoolMixin:
+    """取出连接时登记到当前线程的 AbortHandle，归还时移除"""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        handle = get_current_abort_handle()
+        if handle is not None:
+            handle.add_abort_callback(
+                conn, lambda: shutdown_socket(getattr(conn, "sock", None))
+            )
+        return conn
+
+    def _put_conn(self, conn):
+        handle = get_current_abort_handle()
+        if handle is not None and conn is not None:
+            handle.remove_abort_callback(conn)
+        super()._put_conn(conn)
+
+
+class _AbortableHTTPConnectionPool(_AbortableConnectionPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _AbortableHTTPSConnectionPool(
+    _AbortableConnectionPoolMixin, HTTPSConnectionPool
+):
+    pass
+
+
+_ABORTABLE_POOL_CLASSES = {
+    "http": _AbortableHTTPConnectionPool,
+    "https": _AbortableHTTPSConnectionPool,
+}
+
+
+class _AbortableHTTPAdapter(HTTPAdapter):
+    """使用可中止连接池的 HTTPAdapter；SOCKS 代理有自己的连接池类型，保持不变"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _ABORTABLE_POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = _ABORTABLE_POOL_CLASSES
+        return manager
+
+
+class PooledHttpClient:
+    """
+    线程安全的 POST 客户端。
+    启用 HTTP/2 且安装了 httpx[http2] 时使用在后台事件循环中运行的 httpx.AsyncClient，
+    否则使用带连接池的 requests.Session。
+    两者返回的响应对象都提供 status_code / json() / text / raise_for_status()。
+    """
+
+    def __init__(self, settings: HttpClientSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        if settings.http2 and not (HTTPX_AVAILABLE and H2_AVAILABLE):
+            print("警告: 未安装 httpx[http2]，HTTP/2 不可用，使用 HTTP/1.1 连接池。")
+        self.uses_http2 = settings.http2 and HTTPX_AVAILABLE and H2_AVAILABLE
+        # requests 的会话级 proxies 会被环境变量中的代理覆盖，因此按请求传入显式代理
+        self._proxies = (
+            {"http": settings.proxy_url, "https": settings.proxy_url}
+            if settings.proxy_url
+            else None
+        )
+        if self.uses_http2:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                proxy=settings.proxy_url,
+                limits=httpx.Limits(
+                    max_connections=settings.pool_size,
+                    max_keepalive_connections=(
+                        settings.pool_size if settings.keep_alive else 0
+                    ),
+                ),
+            )
+        else:
+            session = requests.Session()
+            adapter = _AbortableHTTPAdapter(
+                pool_connections=settings.pool_size,
+                pool_maxsize=settings.pool_size,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if not settings.keep_alive:
+                session.headers["Connection"] = "close"
+            self._client = session
+
+    def post(self, url: str, headers: dict, json_payload: dict, timeout: float):
+        with self._lock:
+            self.requests_sent += 1
+        if self.uses_http2:
+            return run_coroutine_abortable(
+                self._client.post(
+                    url, headers=headers, json=json_payload, timeout=timeout
+                )
+            )
+        return self._client.post(
+            url,
+            headers=headers,
+            json=json_payload,
+            timeout=timeout,
+            proxies=self._proxies,
+        )
+
+    async def _aiter_post_lines_http2(
+        self, url: str, headers: dict, json_payload: dict, timeout: float
+    ):
+        async with self._client.stream(
+            "POST", url, headers=headers, json=json_payload, timeout=timeout
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                yield line
+
+    def iter_post_lines(
+        self, url: str, headers: dict, json_payload: dict, timeout: float
+    ):
+        """
+        以流式方式 POST 并逐行产出响应文本（用于 SSE），每行到达后立即产出。
+        非 2xx 响应在读取响应体后抛出 HTTP 错误，提前结束迭代时自动关闭连接。
+        """
+        with self._lock:
+            self.requests_sent += 1
+        if self.uses_http2:
+            yield from iter_async_abortable(
+                self._aiter_post_lines_http2(url, headers, json_payload, timeout)
+            )
+            return
+        response = self._client.post(
+            url,
+            headers=headers,
+            json=json_payload,
+            timeout=timeout,
+            proxies=self._proxies,
+            stream=True,
+        )
+        try:
+            response.raise_for_status()
+            # SSE 固定为 UTF-8；按字节分行，避免 str.splitlines 在 U+2028 等字符处断行
+            for line in _iter_byte_lines(_iter_response_chunks(response)):
+                yield line.decode("utf-8")
+        finally:
+            response.close()
+
+    def close(self):
+        try:
+            if self.uses_http2:
+                run_coroutine_abortable(self._client.aclose())
+            else:
+                self._client.close()
+        except Exception as e:
+            print(f"警告: 关闭 HTTP 客户端时出错: {e}")
+
+
+class AsyncPooledHttpClient:
+    """
+    httpx.AsyncClient 的封装，供 asyncio 批处理在单线程中保持大量并发请求。
+    AsyncClient 绑定创建它的事件循环，因此由调用方在同一个循环内创建和关闭。
+    """
+
+    def __init__(
+        self, settings: HttpClientSettings, max_connections: Optional[int] = None
+    ):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("httpx 未安装，无法使用异步 HTTP 客户端。")
+        self.settings = settings
+        self.requests_sent = 0
+        self.uses_http2 = settings.http2 and H2_AVAILABLE
+        pool_size = max(settings.pool_size, max_connections or 0)
+        self._client = httpx.AsyncClient(
+            http2=self.uses_http2,
+            proxy=settings.proxy_url,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size if settings.keep_alive else 0,
+            ),
+        )
+
+    async def post(self, url: str, headers: dict, json_payload: dict, timeout: float):
+        self.requests_sent += 1
+        return await self._client.post(
+            url, headers=headers, json=json_payload, timeout=timeout
+        )
+
+    async def aclose(self):
+        try:
+            await self._client.aclose()
+        except Exception as e:
+            print(f"警告: 关闭异步 HTTP 客户端时出错: {e}")
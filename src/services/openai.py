@@ -1,140 +1,583 @@
-import requests
+import asyncio
 import json
-import base64
-import os
-from io import BytesIO
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from PIL import Image
 from core.config import ConfigManager
-from utils.prompts import get_gemini_ocr_translation_prompt
+from services.cassette import (
+    compute_request_fingerprint,
+    get_cassette,
+    replay_response,
+)
+from services.http_client import (
+    HTTPX_AVAILABLE,
+    AsyncPooledHttpClient,
+    PooledHttpClient,
+    build_http_client_settings,
+)
+from services.rate_limit import (
+    call_with_retries,
+    call_with_retries_async,
+    estimate_image_tokens,
+    estimate_request_tokens,
+    get_rate_limiter,
+)
+from services.packing import split_packed_response
+from services.upload_encoding import EncodedImage, encode_image_for_upload
+from utils.cancellation import get_abort_error
+from utils.json_stream import StreamingBlockCollector
+from utils.tracing import trace_span
+from utils.prompts import (
+    build_ocr_glossary_section,
+    get_gemini_ocr_translation_prompt,
+    get_multi_image_prompt,
+    get_ocr_only_prompt,
+    is_two_stage_enabled,
+)
 
 
 class OpenAIProvider:
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(
+        self,
+        config_manager: ConfigManager,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        endpoint_name: str = "OpenAIAPI",
+    ):
+        """base_url / api_key 用于在同一配置下创建额外的端点，未指定时读取 OpenAIAPI 配置"""
         self.config_manager = config_manager
+        self.endpoint_name = endpoint_name
+        self._base_url_override = base_url
+        self._api_key_override = api_key
         self.last_error = None
         self.api_key = None
         self.base_url = None
         self.model_name = None
+        self.http_client: Optional[PooledHttpClient] = None
+        self._async_http_clients: Dict[Any, AsyncPooledHttpClient] = {}
         self._initialize_client()
 
     def reload_client(self):
         self._initialize_client()
 
     def _initialize_client(self):
-        self.api_key = self.config_manager.get("OpenAIAPI", "api_key")
-        self.base_url = self.config_manager.get(
-            "OpenAIAPI", "base_url", "https://api.openai.com/v1"
+        self.api_key = self._api_key_override or self.config_manager.get(
+            "OpenAIAPI", "api_key"
+        )
+        self.base_url = (
+            self._base_url_override
+            or self.config_manager.get(
+                "OpenAIAPI", "base_url", "https://api.openai.com/v1"
+            )
         ).rstrip("/")
         self.model_name = self.config_manager.get("OpenAIAPI", "model_name", "gpt-4o")
+        http_settings = build_http_client_settings(self.config_manager)
+        if self.http_client is None or self.http_client.settings != http_settings:
+            previous_client = self.http_client
+            self.http_client = PooledHttpClient(http_settings)
+            if previous_client:
+                previous_client.close()
+
+    def close(self):
+        if self.http_client:
+            self.http_client.close()
+            self.http_client = None
+
+    def _get_rate_limiter(self):
+        return get_rate_limiter(self.config_manager, "OpenAIAPI", self.endpoint_name)
 
     def get_last_error(self) -> Optional[str]:
         return self.last_error
 
-    def _encode_image_to_base64(self, pil_image: Image.Image) -> str:
-        buffered = BytesIO()
-        pil_image.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-    def process_image(
-        self, pil_image: Image.Image, progress_callback=None, cancellation_event=None
-    ) -> Optional[List[Dict[str, Any]]]:
-        self.last_error = None
-        if not self.api_key:
-            self.last_error = "OpenAI API Key 未配置。"
-            return None
-        target_language = self.config_manager.get(
-            "OpenAIAPI", "target_language", "Chinese"
-        )
+    def get_language_pair(self) -> Tuple[str, str]:
         source_language = (
             self.config_manager.get(
                 "OpenAIAPI", "source_language", fallback="Japanese"
             ).strip()
             or "Japanese"
         )
-        raw_glossary_text = self.config_manager.get(
-            "GeminiAPI", "glossary_text", fallback=""
-        ).strip()
-        glossary_section = ""
-        if raw_glossary_text:
-            glossary_lines = [
-                line.strip()
-                for line in raw_glossary_text.splitlines()
-                if line.strip() and "->" in line.strip()
-            ]
-            if glossary_lines:
-                actual_glossary_content = "\n".join(glossary_lines)
-                glossary_section = f"""
-IMPORTANT: When translating, strictly adhere to the following glossary (source_term->target_term format). Apply these translations wherever applicable:
-<glossary>
-{actual_glossary_content}
-</glossary>
-"""
-        prompt_text = get_gemini_ocr_translation_prompt(
-            source_language, target_language, glossary_section, self.config_manager
+        target_language = self.config_manager.get(
+            "OpenAIAPI", "target_language", "Chinese"
         )
-        if cancellation_event and cancellation_event.is_set():
-            return None
-        base64_image = self._encode_image_to_base64(pil_image)
+        return source_language, target_language
+
+    def build_prompt(self) -> str:
+        source_language, target_language = self.get_language_pair()
+        if is_two_stage_enabled(self.config_manager):
+            return get_ocr_only_prompt(source_language)
+        return get_gemini_ocr_translation_prompt(
+            source_language,
+            target_language,
+            build_ocr_glossary_section(self.config_manager),
+            self.config_manager,
+        )
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        """
+        返回影响识别/翻译结果的全部请求参数，用于结果缓存的键。
+        两阶段模式下视觉请求只做 OCR，目标语言与术语表不计入键，更换后仍可复用缓存。
+        """
+        source_language, target_language = self.get_language_pair()
+        if is_two_stage_enabled(self.config_manager):
+            return {
+                "provider": "openai",
+                "model": self.model_name,
+                "prompt": self.build_prompt(),
+                "source_language": source_language,
+            }
+        return {
+            "provider": "openai",
+            "model": self.model_name,
+            "prompt": self.build_prompt(),
+            "glossary": self.config_manager.get(
+                "GeminiAPI", "glossary_text", fallback=""
+            ).strip(),
+            "source_language": source_language,
+            "target_language": target_language,
+        }
+
+    def process_image(
+        self, pil_image: Image.Image, progress_callback=None, cancellation_event=None
+    ) -> Optional[List[Dict[str, Any]]]:
+        blocks, self.last_error = self.request_blocks(
+            pil_image,
+            progress_callback=progress_callback,
+            cancellation_event=cancellation_event,
+        )
+        return blocks
+
+    def _prepare_request(self, pil_image, tracer=None):
+        """构建 Prompt、编码上传图像并计算录制指纹（同步与异步请求共用）"""
+        prompt_text = self.build_prompt()
+        if isinstance(pil_image, EncodedImage):
+            encoded_image = pil_image
+        else:
+            with trace_span(tracer, "upload_encode", "provider") as span_args:
+                encoded_image = encode_image_for_upload(pil_image, self.config_manager)
+                span_args["format"] = encoded_image.format
+                span_args["bytes"] = encoded_image.size_bytes
+        cassette = get_cassette(self.config_manager)
+        fingerprint = None
+        if cassette:
+            fingerprint = compute_request_fingerprint(
+                "openai",
+                self.model_name,
+                prompt_text,
+                encoded_image.data,
+                {"response_format": "json_object", "max_tokens": 4096},
+            )
+        return prompt_text, encoded_image, cassette, fingerprint
+
+    def _build_request(
+        self, prompt_text: str, *encoded_images: EncodedImage
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any], int]:
+        """传入多张图片时（多页打包）在每张图片前加 "Image i" 标记"""
+        content: List[Dict[str, Any]] = [{"type": "text", "text": prompt_text}]
+        for image_index, encoded_image in enumerate(encoded_images):
+            if len(encoded_images) > 1:
+                content.append({"type": "text", "text": f"Image {image_index}:"})
+            content.append(
+                {
+                    "type": "image_url",
+                    "image_url": {"url": encoded_image.to_data_url()},
+                }
+            )
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
         payload = {
             "model": self.model_name,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt_text},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            },
-                        },
-                    ],
-                }
-            ],
+            "messages": [{"role": "user", "content": content}],
             "response_format": {"type": "json_object"},
             "max_tokens": 4096,
         }
+        timeout = int(self.config_manager.get("OpenAIAPI", "request_timeout", "60"))
+        return f"{self.base_url}/chat/completions", headers, payload, timeout
+
+    def _handle_response_content(
+        self, result: dict, cassette, fingerprint, request_start: float, tracer=None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        return self._handle_raw_text(
+            result["choices"][0]["message"]["content"],
+            cassette,
+            fingerprint,
+            request_start,
+            tracer,
+        )
+
+    def _handle_raw_text(
+        self, content: str, cassette, fingerprint, request_start: float, tracer=None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        if not content:
+            return None, "OpenAI API 返回内容为空。"
+        if cassette and cassette.mode == "record":
+            cassette.record(
+                fingerprint,
+                content,
+                time.perf_counter() - request_start,
+                {"provider": "openai", "model": self.model_name},
+            )
+        with trace_span(tracer, "provider.parse", "provider", provider="openai"):
+            return self._parse_json_response(content)
+
+    @staticmethod
+    def _format_request_error(e: Exception) -> str:
+        error_message = f"OpenAI API 请求失败: {e}"
+        if hasattr(e, "response") and e.response is not None:
+            error_message += f" Response: {e.response.text}"
+        return error_message
+
+    def _estimate_request_tokens(
+        self, prompt_text: str, *encoded_images: EncodedImage
+    ) -> int:
+        image_tokens = sum(
+            estimate_image_tokens(
+                encoded_image.image_size,
+                tile_px=512,
+                tokens_per_tile=170,
+                base_tokens=85,
+            )
+            for encoded_image in encoded_images
+        )
+        return estimate_request_tokens(prompt_text, image_tokens)
+
+    def request_blocks(
+        self,
+        pil_image: Image.Image,
+        progress_callback=None,
+        cancellation_event=None,
+        tracer=None,
+        deadline: Optional[float] = None,
+        block_callback=None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        可重入的请求接口，不修改实例状态，可被多个线程同时调用。
+        429/5xx/网络错误在 deadline（time.monotonic() 时间）之前按重试策略重试。
+        传入 block_callback 且启用流式响应时，每解析出一个文本块就回调一次；
+        流中途中断时返回已收到的块和错误信息（这种不完整的结果不会被缓存）。
+        Returns:
+            (中间块列表或 None, 错误信息或 None)
+        """
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        prompt_text, encoded_image, cassette, fingerprint = self._prepare_request(
+            pil_image, tracer
+        )
+        if cassette and cassette.mode == "replay":
+            with trace_span(tracer, "provider.replay", "provider", provider="openai"):
+                return replay_response(
+                    cassette,
+                    fingerprint,
+                    self._parse_json_response,
+                    cancellation_event,
+                )
+        if not self.api_key:
+            return None, "OpenAI API Key 未配置。"
+        url, headers, payload, timeout = self._build_request(prompt_text, encoded_image)
+        try:
+            if progress_callback:
+                progress_callback(
+                    25, f"发送请求给 OpenAI Compatible API ({self.model_name})..."
+                )
+            http_client = self.http_client
+            if block_callback is not None and self.config_manager.getboolean(
+                "Streaming", "enabled", fallback=True
+            ):
+                return self._request_blocks_streaming(
+                    http_client,
+                    url,
+                    headers,
+                    payload,
+                    timeout,
+                    self._estimate_request_tokens(prompt_text, encoded_image),
+                    cassette,
+                    fingerprint,
+                    block_callback,
+                    cancellation_event,
+                    tracer,
+                    deadline,
+                )
+
+            def _attempt():
+                request_start = time.perf_counter()
+                with trace_span(
+                    tracer, "provider.http", "provider", provider="openai"
+                ) as span_args:
+                    response = http_client.post(
+                        url, headers=headers, json_payload=payload, timeout=timeout
+                    )
+                    span_args["status"] = response.status_code
+                response.raise_for_status()
+                return response.json(), request_start
+
+            attempt_result = call_with_retries(
+                self._get_rate_limiter(),
+                _attempt,
+                self._estimate_request_tokens(prompt_text, encoded_image),
+                deadline,
+                cancellation_event,
+                tracer,
+            )
+            if attempt_result is None or (
+                cancellation_event and cancellation_event.is_set()
+            ):
+                return None, None
+            result, request_start = attempt_result
+            return self._handle_response_content(
+                result, cassette, fingerprint, request_start, tracer
+            )
+        except Exception as e:
+            return None, self._format_request_error(e)
+
+    def request_blocks_packed(
+        self,
+        pil_images: List[Image.Image],
+        cancellation_event=None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Optional[List[Dict[str, Any]]]]], Optional[str]]:
+        """
+        多页打包：在一次请求中发送多张图片，按 image_index 拆分回各页。
+        Returns:
+            (每张图片的中间块列表，解析失败或缺失的图片为 None；整体失败时为 None, 错误信息或 None)
+        """
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        if not self.api_key:
+            return None, "OpenAI API Key 未配置。"
+        prompt_text = get_multi_image_prompt(self.build_prompt(), len(pil_images))
+        with trace_span(
+            tracer, "upload_encode", "provider", images=len(pil_images)
+        ) as span_args:
+            encoded_images = [
+                encode_image_for_upload(pil_image, self.config_manager)
+                for pil_image in pil_images
+            ]
+            span_args["bytes"] = sum(image.size_bytes for image in encoded_images)
+        url, headers, payload, timeout = self._build_request(
+            prompt_text, *encoded_images
+        )
+        try:
+            http_client = self.http_client
+
+            def _attempt():
+                with trace_span(
+                    tracer, "provider.http", "provider", provider="openai", packed=True
+                ) as span_args:
+                    response = http_client.post(
+                        url, headers=headers, json_payload=payload, timeout=timeout
+                    )
+                    span_args["status"] = response.status_code
+                response.raise_for_status()
+                return response.json()
+
+            result = call_with_retries(
+                self._get_rate_limiter(),
+                _attempt,
+                self._estimate_request_tokens(prompt_text, *encoded_images),
+                deadline,
+                cancellation_event,
+                tracer,
+            )
+            if result is None or (cancellation_event and cancellation_event.is_set()):
+                return None, None
+            with trace_span(tracer, "provider.parse", "provider", provider="openai"):
+                return split_packed_response(
+                    result["choices"][0]["message"]["content"] or "",
+                    len(pil_images),
+                    self._normalize_block,
+                )
+        except Exception as e:
+            return None, self._format_request_error(e)
+
+    @staticmethod
+    def _parse_sse_line(line: str) -> Tuple[str, bool]:
+        """解析一行 SSE，返回 (增量文本, 是否为结束标记)"""
+        if not line or not line.startswith("data:"):
+            return "", False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return "", True
+        choices = json.loads(data).get("choices") or []
+        if not choices:
+            return "", False
+        return (choices[0].get("delta") or {}).get("content") or "", False
+
+    def _request_blocks_streaming(
+        self,
+        http_client: PooledHttpClient,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        timeout: int,
+        estimated_tokens: int,
+        cassette,
+        fingerprint,
+        block_callback,
+        cancellation_event=None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        stream_payload = dict(payload, stream=True)
+
+        def _attempt():
+            collector = StreamingBlockCollector(self._normalize_block, block_callback)
+            request_start = time.perf_counter()
+            try:
+                with trace_span(
+                    tracer, "provider.http", "provider", provider="openai", stream=True
+                ):
+                    stream_finished = False
+                    for line in http_client.iter_post_lines(
+                        url, headers, stream_payload, timeout
+                    ):
+                        text_chunk, stream_finished = self._parse_sse_line(line)
+                        if stream_finished:
+                            break
+                        collector.feed(text_chunk)
+                    if not stream_finished:
+                        raise ConnectionError("流式响应在结束标记之前中断")
+            except Exception as e:
+                # 取消或超过截止时间时连接被看门狗关闭，保留已收到的块作为部分结果
+                if not collector.blocks:
+                    raise
+                return collector, request_start, get_abort_error(e)
+            return collector, request_start, None
+
+        attempt_result = call_with_retries(
+            self._get_rate_limiter(),
+            _attempt,
+            estimated_tokens,
+            deadline,
+            cancellation_event,
+            tracer,
+        )
+        if attempt_result is None or (
+            cancellation_event and cancellation_event.is_set()
+        ):
+            return None, None
+        collector, request_start, stream_error = attempt_result
+        if stream_error is not None:
+            print(
+                f"警告: OpenAI 流式响应中断，保留已收到的 {len(collector.blocks)} 个文本块: {stream_error}"
+            )
+            return collector.blocks, f"流式响应中断: {stream_error}"
+        blocks, error = self._handle_raw_text(
+            collector.text, cassette, fingerprint, request_start, tracer
+        )
+        if blocks is None and collector.blocks:
+            return collector.blocks, error
+        return blocks, error
+
+    def _get_async_http_client(self) -> AsyncPooledHttpClient:
+        """返回绑定当前事件循环的异步客户端，连接设置变化或循环更换时重建"""
+        loop = asyncio.get_running_loop()
+        http_settings = build_http_client_settings(self.config_manager)
+        cached = self._async_http_clients.get(loop)
+        if cached is not None and cached.settings == http_settings:
+            return cached
+        async_client = AsyncPooledHttpClient(
+            http_settings,
+            max_connections=self.config_manager.getint(
+                "Batch", "async_max_in_flight", fallback=32
+            ),
+        )
+        self._async_http_clients[loop] = async_client
+        if cached is not None:
+            loop.create_task(cached.aclose())
+        return async_client
+
+    async def aclose_async_client(self):
+        """关闭当前事件循环的异步客户端，应在事件循环结束前调用"""
+        async_client = self._async_http_clients.pop(asyncio.get_running_loop(), None)
+        if async_client is not None:
+            await async_client.aclose()
+
+    async def request_blocks_async(
+        self,
+        pil_image: Image.Image,
+        progress_callback=None,
+        cancellation_event=None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """request_blocks 的 asyncio 版本，多个页面可在同一线程中并发等待"""
+        if not HTTPX_AVAILABLE:
+            return await asyncio.to_thread(
+                self.request_blocks,
+                pil_image,
+                progress_callback,
+                cancellation_event,
+                tracer,
+                deadline,
+            )
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        prompt_text, encoded_image, cassette, fingerprint = await asyncio.to_thread(
+            self._prepare_request, pil_image, tracer
+        )
+        if cassette and cassette.mode == "replay":
+            with trace_span(tracer, "provider.replay", "provider", provider="openai"):
+                return await asyncio.to_thread(
+                    replay_response,
+                    cassette,
+                    fingerprint,
+                    self._parse_json_response,
+                    cancellation_event,
+                )
+        if not self.api_key:
+            return None, "OpenAI API Key 未配置。"
+        url, headers, payload, timeout = self._build_request(prompt_text, encoded_image)
         try:
             if progress_callback:
                 progress_callback(
                     25, f"发送请求给 OpenAI Compatible API ({self.model_name})..."
                 )
-            timeout = int(self.config_manager.get("OpenAIAPI", "request_timeout", "60"))
-            proxies = {}
-            if self.config_manager.getboolean("Proxy", "enabled", fallback=False):
-                host = self.config_manager.get("Proxy", "host")
-                port = self.config_manager.get("Proxy", "port")
-                if host and port:
-                    proxy_url = f"http://{host}:{port}"
-                    proxies = {"http": proxy_url, "https": proxy_url}
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=timeout,
-                proxies=proxies,
+            http_client = self._get_async_http_client()
+
+            async def _attempt():
+                request_start = time.perf_counter()
+                with trace_span(
+                    tracer, "provider.http", "provider", provider="openai"
+                ) as span_args:
+                    response = await http_client.post(
+                        url, headers=headers, json_payload=payload, timeout=timeout
+                    )
+                    span_args["status"] = response.status_code
+                response.raise_for_status()
+                return response.json(), request_start
+
+            attempt_result = await call_with_retries_async(
+                self._get_rate_limiter(),
+                _attempt,
+                self._estimate_request_tokens(prompt_text, encoded_image),
+                deadline,
+                cancellation_event,
+                tracer,
+            )
+            if attempt_result is None:
+                return None, None
+            result, request_start = attempt_result
+            return self._handle_response_content(
+                result, cassette, fingerprint, request_start, tracer
             )
-            if cancellation_event and cancellation_event.is_set():
-                return None
-            response.raise_for_status()
-            result = response.json()
-            content = result["choices"][0]["message"]["content"]
-            if not content:
-                self.last_error = "OpenAI API 返回内容为空。"
-                return None
-            return self._parse_json_response(content)
         except Exception as e:
-            self.last_error = f"OpenAI API 请求失败: {e}"
-            if hasattr(e, "response") and e.response is not None:
-                self.last_error += f" Response: {e.response.text}"
-            return None
+            return None, self._format_request_error(e)
+
+    async def process_image_async(
+        self, pil_image: Image.Image, progress_callback=None, cancellation_event=None
+    ) -> Optional[List[Dict[str, Any]]]:
+        blocks, self.last_error = await self.request_blocks_async(
+            pil_image,
+            progress_callback=progress_callback,
+            cancellation_event=cancellation_event,
+        )
+        return blocks
 
-    def _parse_json_response(self, raw_text: str) -> Optional[List[Dict[str, Any]]]:
+    def _parse_json_response(
+        self, raw_text: str
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
         cleaned_json_text = raw_text.strip()
         if cleaned_json_text.startswith("```json"):
             cleaned_json_text = cleaned_json_text[7:]
@@ -162,38 +605,37 @@ IMPORTANT: When translating, strictly adhere to the following glossary (source_t
                             break
             processed_data = []
             for item_idx, item in enumerate(items):
-                if not isinstance(item, dict):
-                    continue
-                if (
-                    "bounding_box" in item
-                    and isinstance(item["bounding_box"], list)
-                    and len(item["bounding_box"]) == 4
-                ):
-                    try:
-                        y_min, x_min, y_max, x_max = [
-                            int(c) for c in item["bounding_box"]
-                        ]
-                        x_min_n = max(0.0, min(1.0, x_min / 1000.0))
-                        y_min_n = max(0.0, min(1.0, y_min / 1000.0))
-                        x_max_n = max(0.0, min(1.0, x_max / 1000.0))
-                        y_max_n = max(0.0, min(1.0, y_max / 1000.0))
-                        final_x_min = min(x_min_n, x_max_n)
-                        final_y_min = min(y_min_n, y_max_n)
-                        final_x_max = max(x_min_n, x_max_n)
-                        final_y_max = max(y_min_n, y_max_n)
-                        item["bbox_norm"] = [
-                            final_x_min,
-                            final_y_min,
-                            final_x_max,
-                            final_y_max,
-                        ]
-                        item["id"] = f"openai_multimodal_{item_idx}"
-                        processed_data.append(item)
-                    except (ValueError, TypeError):
-                        continue
-                else:
-                    continue
-            return processed_data
+                normalized_item = self._normalize_block(item, item_idx)
+                if normalized_item is not None:
+                    processed_data.append(normalized_item)
+            return processed_data, None
         except json.JSONDecodeError as e:
-            self.last_error = f"解析 JSON 失败: {e}"
+            return None, f"解析 JSON 失败: {e}"
+
+    @staticmethod
+    def _normalize_block(item, item_idx: int) -> Optional[Dict[str, Any]]:
+        """把 0-1000 的 bounding_box 转换为 bbox_norm；无效的块返回 None"""
+        if not isinstance(item, dict):
+            return None
+        if not (
+            "bounding_box" in item
+            and isinstance(item["bounding_box"], list)
+            and len(item["bounding_box"]) == 4
+        ):
+            return None
+        try:
+            y_min, x_min, y_max, x_max = [int(c) for c in item["bounding_box"]]
+        except (ValueError, TypeError):
             return None
+        x_min_n = max(0.0, min(1.0, x_min / 1000.0))
+        y_min_n = max(0.0, min(1.0, y_min / 1000.0))
+        x_max_n = max(0.0, min(1.0, x_max / 1000.0))
+        y_max_n = max(0.0, min(1.0, y_max / 1000.0))
+        item["bbox_norm"] = [
+            min(x_min_n, x_max_n),
+            min(y_min_n, y_max_n),
+            max(x_min_n, x_max_n),
+            max(y_min_n, y_max_n),
+        ]
+        item["id"] = f"openai_multimodal_{item_idx}"
+        return item
@@ -0,0 +1,298 @@
+"""
+多页打包
+四格漫画、表情包、界面截图这类小图片的单次请求开销远大于图片本身，
+打包模式把同时在途的多个小页面合并为一次多图请求（每个文本块带 image_index），再按页拆分结果。
+每个包的页数按像素预算自适应；某一页的结果缺失或解析失败时，该页单独重新请求。
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import ConfigManager
+from utils.async_tasks import CompletionEvent
+
+
+def split_packed_response(
+    raw_text: str, image_count: int, normalize_block
+) -> Tuple[Optional[List[Optional[List[Dict[str, Any]]]]], Optional[str]]:
+    """
+    把多图请求的 JSON 响应按 image_index 拆分为每张图片的中间块列表。
+    没有任何块的图片视为没有文本，对应空列表；但响应中有缺少或超出范围的 image_index 时，
+    这些块可能属于没有块的图片，此时它们对应 None。
+    某张图片有块无法规范化时也对应 None。对应 None 的图片需要单独重新请求。
+    """
+    cleaned_json_text = raw_text.strip()
+    if cleaned_json_text.startswith("```json"):
+        cleaned_json_text = cleaned_json_text[7:]
+    elif cleaned_json_text.startswith("```"):
+        cleaned_json_text = cleaned_json_text[3:]
+    if cleaned_json_text.endswith("```"):
+        cleaned_json_text = cleaned_json_text[:-3]
+    try:
+        data = json.loads(cleaned_json_text.strip())
+    except json.JSONDecodeError as e:
+        return None, f"解析多图打包响应 JSON 失败: {e}"
+    items = data
+    if isinstance(data, dict):
+        items = data.get("blocks") or data.get("text_blocks") or []
+    if not isinstance(items, list):
+        return None, "多图打包响应不是 JSON 列表。"
+    page_blocks: List[Optional[List[Dict[str, Any]]]] = [[] for _ in range(image_count)]
+    failed_pages = set()
+    has_unassigned_items = False
+    for item in items:
+        if not isinstance(item, dict):
+            has_unassigned_items = True
+            continue
+        try:
+            image_index = int(item.pop("image_index"))
+        except (KeyError, TypeError, ValueError):
+            has_unassigned_items = True
+            continue
+        if not 0 <= image_index < image_count:
+            has_unassigned_items = True
+            continue
+        if image_index in failed_pages:
+            continue
+        normalized_block = normalize_block(item, len(page_blocks[image_index]))
+        if normalized_block is None:
+            failed_pages.add(image_index)
+            continue
+        page_blocks[image_index].append(normalized_block)
+    for image_index in range(image_count):
+        if image_index in failed_pages or (
+            has_unassigned_items and not page_blocks[image_index]
+        ):
+            page_blocks[image_index] = None
+    return page_blocks, None
+
+
+class _PackSlot:
+    def __init__(self, pil_image, deadline: Optional[float]):
+        self.pil_image = pil_image
+        self.pixels = pil_image.size[0] * pil_image.size[1]
+        self.deadline = deadline
+        self.done = CompletionEvent()
+        self.outcome: Optional[Tuple] = None
+        self.needs_solo_request = False
+
+
+class _PackGroup:
+    def __init__(self):
+        self.slots: List[_PackSlot] = []
+        self.pixels = 0
+        self.closed = False
+        self.full = CompletionEvent()
+
+
+class PagePacker:
+    """
+    包装主 Provider，提供与之相同的 request_blocks / request_blocks_async 接口。
+    第一个到达的小页面成为包的发起者，等待 Packing.wait_ms 或包满后发送；其余页面等待拆分后的结果。
+    Provider 没有 request_blocks_packed 接口、页面过大或需要流式预览时直接单独请求。
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.max_images = 4
+        self.max_page_pixels = 1500000
+        self.max_total_pixels = 6000000
+        self.wait_seconds = 0.15
+        self._lock = threading.Lock()
+        self._open_group: Optional[_PackGroup] = None
+        self.stats = {
+            "packed_requests": 0,
+            "pages_packed": 0,
+            "solo_requests": 0,
+            "solo_retries": 0,
+        }
+
+    def configure(self, config_manager: ConfigManager):
+        self.max_images = max(
+            1, config_manager.getint("Packing", "max_images", fallback=4)
+        )
+        self.max_page_pixels = config_manager.getint(
+            "Packing", "max_page_pixels", fallback=1500000
+        )
+        self.max_total_pixels = config_manager.getint(
+            "Packing", "max_total_pixels", fallback=6000000
+        )
+        self.wait_seconds = max(
+            0.0, config_manager.getfloat("Packing", "wait_ms", fallback=150) / 1000.0
+        )
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        return self.provider.get_cache_identity()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+    def _increment_stat(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _is_packable(self, pil_image, block_callback=None) -> bool:
+        return (
+            block_callback is None
+            and self.max_images > 1
+            and hasattr(self.provider, "request_blocks_packed")
+            and pil_image.size[0] * pil_image.size[1] <= self.max_page_pixels
+        )
+
+    def _join_group(self, slot: _PackSlot) -> Tuple[_PackGroup, bool]:
+        """把页面加入当前打开的包，包已满或超出像素预算时新开一个包；返回 (包, 是否为发起者)"""
+        with self._lock:
+            group = self._open_group
+            is_leader = (
+                group is None
+                or group.closed
+                or group.pixels + slot.pixels > self.max_total_pixels
+            )
+            if is_leader:
+                group = _PackGroup()
+                self._open_group = group
+            group.slots.append(slot)
+            group.pixels += slot.pixels
+            if len(group.slots) >= self.max_images:
+                self._close_group_locked(group)
+            return group, is_leader
+
+    def _close_group_locked(self, group: _PackGroup):
+        group.closed = True
+        group.full.set()
+        if self._open_group is group:
+            self._open_group = None
+
+    def _close_group(self, group: _PackGroup):
+        with self._lock:
+            self._close_group_locked(group)
+
+    def _apply_packed_outcome(self, group: _PackGroup, packed_outcome: Tuple):
+        page_results, error = packed_outcome
+        self._increment_stat("packed_requests")
+        self._increment_stat("pages_packed", len(group.slots))
+        if page_results is None and error:
+            print(f"警告: 多页打包请求失败，各页将单独重新请求: {error}")
+        for slot_index, slot in enumerate(group.slots):
+            page_blocks = page_results[slot_index] if page_results else None
+            if page_blocks is not None:
+                slot.outcome = (page_blocks, None)
+            else:
+                slot.needs_solo_request = True
+
+    def _get_group_deadline(self, group: _PackGroup) -> Optional[float]:
+        deadlines = [slot.deadline for slot in group.slots if slot.deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def _send_group(self, group: _PackGroup, cancellation_event, tracer):
+        try:
+            if len(group.slots) == 1:
+                group.slots[0].needs_solo_request = True
+                return
+            self._apply_packed_outcome(
+                group,
+                self.provider.request_blocks_packed(
+                    [slot.pil_image for slot in group.slots],
+                    cancellation_event=cancellation_event,
+                    tracer=tracer,
+                    deadline=self._get_group_deadline(group),
+                ),
+            )
+        finally:
+            for slot in group.slots:
+                slot.done.set()
+
+    def request_blocks(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+        block_callback=None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        if not self._is_packable(pil_image, block_callback):
+            return self.provider.request_blocks(
+                pil_image,
+                progress_callback=progress_callback,
+                cancellation_event=cancellation_event,
+                tracer=tracer,
+                deadline=deadline,
+                block_callback=block_callback,
+            )
+        slot = _PackSlot(pil_image, deadline)
+        group, is_leader = self._join_group(slot)
+        if is_leader:
+            group.full.wait(timeout=self.wait_seconds)
+            self._close_group(group)
+            self._send_group(group, cancellation_event, tracer)
+        elif not slot.done.wait(cancellation_event):
+            return None, None
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        if slot.outcome is not None:
+            return slot.outcome
+        self._increment_stat(
+            "solo_requests" if len(group.slots) == 1 else "solo_retries"
+        )
+        return self.provider.request_blocks(
+            pil_image,
+            progress_callback=progress_callback,
+            cancellation_event=cancellation_event,
+            tracer=tracer,
+            deadline=deadline,
+        )
+
+    async def request_blocks_async(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        request_blocks 的 asyncio 版本。打包请求本身在线程中执行（每个包只占一个线程），
+        单独请求优先使用 Provider 的异步接口。
+        """
+        request_async = getattr(self.provider, "request_blocks_async", None)
+
+        async def _request_solo():
+            if request_async is not None:
+                return await request_async(
+                    pil_image,
+                    progress_callback=progress_callback,
+                    cancellation_event=cancellation_event,
+                    tracer=tracer,
+                    deadline=deadline,
+                )
+            return await asyncio.to_thread(
+                self.provider.request_blocks,
+                pil_image,
+                progress_callback=progress_callback,
+                cancellation_event=cancellation_event,
+                tracer=tracer,
+                deadline=deadline,
+            )
+
+        if not self._is_packable(pil_image):
+            return await _request_solo()
+        slot = _PackSlot(pil_image, deadline)
+        group, is_leader = self._join_group(slot)
+        if is_leader:
+            await group.full.wait_async(deadline=time.monotonic() + self.wait_seconds)
+            self._close_group(group)
+            await asyncio.to_thread(self._send_group, group, cancellation_event, tracer)
+        elif not await slot.done.wait_async(cancellation_event):
+            return None, None
+        if cancellation_event and cancellation_event.is_set():
+            return None, None
+        if slot.outcome is not None:
+            return slot.outcome
+        self._increment_stat(
+            "solo_requests" if len(group.slots) == 1 else "solo_retries"
+        )
+        return await _request_solo()
@@ -0,0 +1,446 @@
+"""
+Provider 级别的限流与重试
+每个 Provider 共享一个令牌桶（每分钟请求数 / 每分钟 token 数），所有批处理线程与协程都从同一个桶取令牌。
+429 与临时性的 5xx / 网络错误按去相关抖动 (decorrelated jitter) 退避重试，并遵守 Retry-After；
+收到 429 时整个 Provider 暂停到 Retry-After 指定的时间，避免其余请求继续撞上限额。
+重试只在单页的截止时间内进行，超出后返回最后一次的错误。
+"""
+
+import asyncio
+import email.utils
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import requests
+from core.config import ConfigManager
+from utils.async_tasks import wait_cancellable
+from utils.cancellation import AbortHandle, RequestAborted, abort_scope
+from utils.tracing import trace_span
+
+try:
+    import httpx
+
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+try:
+    from google.genai import errors as google_genai_errors
+except ImportError:
+    google_genai_errors = None
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+_RETRY_DELAY_PATTERN = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?([\d.]+)s")
+_rate_limiters: Dict[str, "RateLimiter"] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class RequestDeadlineExceeded(Exception):
+    pass
+
+
+class _TokenBucket:
+    """按分钟速率连续补充的令牌桶；rate_per_minute <= 0 表示不限制"""
+
+    def __init__(self, rate_per_minute: float):
+        self.configure(rate_per_minute)
+
+    def configure(self, rate_per_minute: float):
+        self.rate_per_minute = max(0.0, float(rate_per_minute))
+        self.capacity = self.rate_per_minute
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate_per_minute <= 0:
+            return
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.available = min(
+            self.capacity, self.available + elapsed * self.rate_per_minute / 60.0
+        )
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """需要等待的秒数，为 0 时表示现在可以取走 amount 个令牌"""
+        if self.rate_per_minute <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60.0 / self.rate_per_minute
+
+    def take(self, amount: float):
+        if self.rate_per_minute > 0:
+            self.available -= min(amount, self.capacity)
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        page_deadline: float = 180.0,
+    ):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = max(0.01, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.page_deadline = page_deadline
+
+    def next_delay(self, previous_delay: float, retry_after: Optional[float]) -> float:
+        """去相关抖动: sleep = min(cap, uniform(base, previous * 3))，且不短于 Retry-After"""
+        delay = min(
+            self.max_delay,
+            random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)),
+        )
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def get_deadline(self, start: Optional[float] = None) -> Optional[float]:
+        if self.page_deadline <= 0:
+            return None
+        return (start if start is not None else time.monotonic()) + self.page_deadline
+
+
+class RateLimiter:
+    """线程安全的共享限流器，同时提供阻塞与 asyncio 两种等待方式"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.name = name
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._lock = threading.Lock()
+        self._request_bucket = _TokenBucket(requests_per_minute)
+        self._token_bucket = _TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failed_after_retries = 0
+        self.throttled_seconds = 0.0
+
+    def configure(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        retry_policy: RetryPolicy,
+    ):
+        with self._lock:
+            if requests_per_minute != self._request_bucket.rate_per_minute:
+                self._request_bucket.configure(requests_per_minute)
+            if tokens_per_minute != self._token_bucket.rate_per_minute:
+                self._token_bucket.configure(tokens_per_minute)
+            self.retry_policy = retry_policy
+
+    def _reserve(self, estimated_tokens: float) -> float:
+        """尝试取令牌；成功返回 0，否则返回建议的等待秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self._request_bucket.wait_time(1, now),
+                self._token_bucket.wait_time(estimated_tokens, now),
+            )
+            if wait <= 0:
+                self._request_bucket.take(1)
+                self._token_bucket.take(estimated_tokens)
+                self.requests += 1
+            return max(0.0, wait)
+
+    def _record_throttled(self, seconds: float):
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def acquire(
+        self,
+        estimated_tokens: float = 0,
+        deadline: Optional[float] = None,
+        cancellation_event: Optional[threading.Event] = None,
+    ) -> bool:
+        """阻塞直到取得令牌；被取消时返回 False，超过截止时间时抛出 RequestDeadlineExceeded"""
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RequestDeadlineExceeded(f"{self.name} 限流等待将超出本页截止时间")
+            wait = min(wait, 1.0)
+            self._record_throttled(wait)
+            if cancellation_event:
+                if cancellation_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    async def acquire_async(
+        self,
+        estimated_tokens: float = 0,
+        deadline: Optional[float] = None,
+        cancellation_event: Optional[threading.Event] = None,
+    ) -> bool:
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RequestDeadlineExceeded(f"{self.name} 限流等待将超出本页截止时间")
+            if cancellation_event and cancellation_event.is_set():
+                return False
+            wait = min(wait, 0.25)
+            self._record_throttled(wait)
+            await asyncio.sleep(wait)
+
+    def pause_for(self, seconds: float):
+        """收到 429 时暂停整个 Provider 的新请求"""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failed_after_retries += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failed_after_retries": self.failed_after_retries,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+            }
+
+
+def build_retry_policy(config_manager: ConfigManager) -> RetryPolicy:
+    return RetryPolicy(
+        max_retries=config_manager.getint("Retry", "max_retries", fallback=4),
+        base_delay=config_manager.getfloat("Retry", "base_delay_seconds", fallback=1.0),
+        max_delay=config_manager.getfloat("Retry", "max_delay_seconds", fallback=30.0),
+        page_deadline=config_manager.getfloat(
+            "Retry", "page_deadline_seconds", fallback=180.0
+        ),
+    )
+
+
+def get_rate_limiter(
+    config_manager: ConfigManager, section: str, limiter_name: Optional[str] = None
+) -> RateLimiter:
+    """
+    返回 section（如 GeminiAPI）对应的共享限流器，并按当前配置更新速率。
+    同一 section 下的多个端点（不同 API Key）各自独立限流，用 limiter_name 区分。
+    """
+    limiter_name = limiter_name or section
+    requests_per_minute = config_manager.getfloat(
+        section, "requests_per_minute", fallback=0
+    )
+    tokens_per_minute = config_manager.getfloat(
+        section, "tokens_per_minute", fallback=0
+    )
+    retry_policy = build_retry_policy(config_manager)
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(limiter_name)
+        if limiter is None:
+            limiter = RateLimiter(
+                limiter_name, requests_per_minute, tokens_per_minute, retry_policy
+            )
+            _rate_limiters[limiter_name] = limiter
+        else:
+            limiter.configure(requests_per_minute, tokens_per_minute, retry_policy)
+        return limiter
+
+
+def get_all_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    with _rate_limiters_lock:
+        limiters = list(_rate_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
+
+
+def estimate_image_tokens(
+    image_size: Optional[Tuple[int, int]],
+    tile_px: int,
+    tokens_per_tile: int,
+    base_tokens: int = 0,
+) -> int:
+    if not image_size:
+        return base_tokens + tokens_per_tile
+    tiles = math.ceil(image_size[0] / tile_px) * math.ceil(image_size[1] / tile_px)
+    return base_tokens + tokens_per_tile * max(1, tiles)
+
+
+def estimate_request_tokens(
+    prompt_text: str, image_tokens: int, output_tokens: int = 1024
+) -> int:
+    """粗略估计一次请求消耗的 token 数（Prompt 按约 3 字符/token 计）"""
+    return len(prompt_text) // 3 + image_tokens + output_tokens
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期）"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def classify_error(error: Exception) -> Tuple[bool, Optional[int], Optional[float]]:
+    """
+    判断异常是否值得重试。
+    Returns:
+        (是否可重试, HTTP 状态码或 None, Retry-After 秒数或 None)
+    """
+    if google_genai_errors and isinstance(error, google_genai_errors.APIError):
+        retry_after = None
+        match = _RETRY_DELAY_PATTERN.search(str(error.details))
+        if match:
+            retry_after = float(match.group(1))
+        return error.code in RETRYABLE_STATUS_CODES, error.code, retry_after
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is not None:
+        headers = getattr(response, "headers", None) or {}
+        return (
+            status_code in RETRYABLE_STATUS_CODES,
+            status_code,
+            parse_retry_after(headers.get("Retry-After")),
+        )
+    if isinstance(error, requests.RequestException):
+        return True, None, None
+    if HTTPX_AVAILABLE and isinstance(error, httpx.TransportError):
+        return True, None, None
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True, None, None
+    return False, None, None
+
+
+def _handle_attempt_error(
+    limiter: RateLimiter,
+    error: Exception,
+    attempt: int,
+    previous_delay: float,
+    deadline: Optional[float],
+) -> Optional[float]:
+    """返回下一次重试前的等待秒数；不应重试时返回 None"""
+    retryable, status_code, retry_after = classify_error(error)
+    policy = limiter.retry_policy
+    if status_code == 429:
+        limiter.pause_for(retry_after if retry_after is not None else policy.base_delay)
+    if not retryable or attempt >= policy.max_retries:
+        if retryable:
+            limiter.record_failure()
+        return None
+    delay = policy.next_delay(previous_delay, retry_after)
+    if deadline is not None and time.monotonic() + delay > deadline:
+        limiter.record_failure()
+        return None
+    limiter.record_retry()
+    return delay
+
+
+def call_with_retries(
+    limiter: RateLimiter,
+    attempt_fn: Callable[[], Any],
+    estimated_tokens: float = 0,
+    deadline: Optional[float] = None,
+    cancellation_event: Optional[threading.Event] = None,
+    tracer=None,
+):
+    """
+    先从限流器取令牌再调用 attempt_fn()，可重试的异常按策略退避后重试。
+    attempt_fn 在 abort_scope 内执行：取消或超过截止时间时看门狗中止在途请求（关闭连接或取消任务），
+    attempt_fn 可以捕获中止引起的异常并返回已收到的部分结果。
+    被取消时返回 None；超时抛出 RequestDeadlineExceeded；不可重试或重试耗尽时重新抛出最后一次的异常。
+    """
+    if deadline is None:
+        deadline = limiter.retry_policy.get_deadline()
+    attempt, delay = 0, 0.0
+    while True:
+        with trace_span(tracer, "rate_limit.wait", "provider"):
+            if not limiter.acquire(estimated_tokens, deadline, cancellation_event):
+                return None
+        handle = AbortHandle(cancellation_event, deadline)
+        try:
+            with abort_scope(handle):
+                return attempt_fn()
+        except Exception as e:
+            if handle.aborted or isinstance(e, RequestAborted):
+                if cancellation_event and cancellation_event.is_set():
+                    return None
+                raise RequestDeadlineExceeded(
+                    f"{limiter.name} 请求超出本页截止时间，已中止"
+                ) from e
+            delay = _handle_attempt_error(limiter, e, attempt, delay, deadline)
+            if delay is None:
+                raise
+            print(f"警告: {limiter.name} 请求失败 ({e})，{delay:.1f} 秒后重试...")
+        attempt += 1
+        with trace_span(tracer, "provider.retry_wait", "provider", attempt=attempt):
+            if cancellation_event:
+                if cancellation_event.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
+
+
+async def call_with_retries_async(
+    limiter: RateLimiter,
+    attempt_fn,
+    estimated_tokens: float = 0,
+    deadline: Optional[float] = None,
+    cancellation_event: Optional[threading.Event] = None,
+    tracer=None,
+):
+    """call_with_retries 的 asyncio 版本，attempt_fn 返回协程"""
+    if deadline is None:
+        deadline = limiter.retry_policy.get_deadline()
+    attempt, delay = 0, 0.0
+    while True:
+        with trace_span(tracer, "rate_limit.wait", "provider"):
+            if not await limiter.acquire_async(
+                estimated_tokens, deadline, cancellation_event
+            ):
+                return None
+        try:
+            completed, attempt_result = await wait_cancellable(
+                attempt_fn(), cancellation_event, deadline=deadline
+            )
+            if completed:
+                return attempt_result
+            if cancellation_event and cancellation_event.is_set():
+                return None
+            raise RequestDeadlineExceeded(f"{limiter.name} 请求超出本页截止时间，已中止")
+        except Exception as e:
+            delay = _handle_attempt_error(limiter, e, attempt, delay, deadline)
+            if delay is None:
+                raise
+            print(f"警告: {limiter.name} 请求失败 ({e})，{delay:.1f} 秒后重试...")
+        attempt += 1
+        with trace_span(tracer, "provider.retry_wait", "provider", attempt=attempt):
+            completed, _ = await wait_cancellable(
+                asyncio.sleep(delay), cancellation_event
+            )
+            if not completed:
+                return None
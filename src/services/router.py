@@ -0,0 +1,409 @@
+"""
+多端点路由与故障转移
+把请求分散到多个已配置的端点（多个 Gemini API Key、多个 OpenAI 兼容 base_url），
+按观测到的延迟与错误率加权选择；连续失败的端点被熔断一段时间，请求自动转移到下一个端点。
+API.fallback_ocr_provider 指定的另一种 Provider 作为后备层，只在主层端点全部不可用或失败时使用。
+缓存键按主层计算，因此缓存标识与主层不同的端点返回的块带有 ROUTED_ENDPOINT_KEY 标记，不写入缓存。
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import ConfigManager
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+ROUTED_ENDPOINT_KEY = "_routed_endpoint"
+
+
+def parse_config_list(value: Optional[str]) -> List[str]:
+    """解析逗号或换行分隔的配置列表，忽略空项"""
+    if not value:
+        return []
+    items = value.replace("\n", ",").split(",")
+    return [item.strip() for item in items if item.strip()]
+
+
+def is_routed_result(blocks: Optional[List[Dict[str, Any]]]) -> bool:
+    """
+    块是否来自缓存标识与主层不同的端点（路由后备层或对冲 Provider），
+    这类结果不能按主层的缓存键保存
+    """
+    return bool(blocks) and any(
+        isinstance(block, dict) and ROUTED_ENDPOINT_KEY in block for block in blocks
+    )
+
+
+class CircuitBreaker:
+    """
+    连续失败 failure_threshold 次后断开 open_seconds 秒；
+    到期后放行一个探测请求（半开），成功则恢复，失败则重新断开。
+    """
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CIRCUIT_CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if (
+                self.state == CIRCUIT_HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != CIRCUIT_OPEN:
+                    self.times_opened += 1
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """探测请求被取消、没有得出结论时调用"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class ProviderEndpoint:
+    """一个可路由的端点：Provider 实例、所属层级、熔断器与健康统计"""
+
+    def __init__(
+        self,
+        name: str,
+        provider,
+        tier: int = 0,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        smoothing: float = 0.2,
+    ):
+        self.name = name
+        self.provider = provider
+        self.tier = tier
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.smoothing = smoothing
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def begin_request(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def finish_request(self, success: Optional[bool], elapsed: float):
+        """success 为 None 表示请求被取消，不计入健康统计"""
+        with self._lock:
+            self.in_flight -= 1
+            if success is None:
+                return
+            if success:
+                self.latency_ewma = (
+                    elapsed
+                    if self.latency_ewma is None
+                    else self.latency_ewma
+                    + self.smoothing * (elapsed - self.latency_ewma)
+                )
+            else:
+                self.failures += 1
+            self.error_rate += self.smoothing * (
+                (0.0 if success else 1.0) - self.error_rate
+            )
+        if success is None:
+            self.circuit_breaker.release_probe()
+        elif success:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+
+    def get_weight(self, default_latency: float) -> float:
+        """延迟越低、错误率越低、在途请求越少，权重越高"""
+        with self._lock:
+            latency = (
+                self.latency_ewma if self.latency_ewma is not None else default_latency
+            )
+            return (1.0 - self.error_rate) ** 2 / (
+                max(latency, 1e-3) * (1 + self.in_flight)
+            ) + 1e-6
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tier": self.tier,
+                "state": self.circuit_breaker.state,
+                "requests": self.requests,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "latency_ewma_seconds": (
+                    round(self.latency_ewma, 3)
+                    if self.latency_ewma is not None
+                    else None
+                ),
+                "error_rate": round(self.error_rate, 3),
+                "times_opened": self.circuit_breaker.times_opened,
+            }
+
+
+class ProviderRouter:
+    """
+    提供与单个 Provider 相同的 request_blocks / request_blocks_async 接口。
+    每次请求按层级依次尝试：同一层内按权重随机选出首个端点，其余按权重降序作为故障转移顺序。
+    """
+
+    def __init__(
+        self, endpoints: List[ProviderEndpoint], rng: Optional[random.Random] = None
+    ):
+        self.endpoints = endpoints
+        self._rng = rng or random.Random()
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.failovers = 0
+
+    @property
+    def primary_provider(self):
+        return self.endpoints[0].provider
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        """同一层的端点使用相同的模型与 Prompt，缓存键以主层为准"""
+        return self.primary_provider.get_cache_identity()
+
+    def _mark_routed_blocks(
+        self, endpoint: ProviderEndpoint, blocks: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """应答端点的缓存标识与主层不同（如后备层）时标记返回的块，见 is_routed_result"""
+        if endpoint.provider.get_cache_identity() != self.get_cache_identity():
+            for block in blocks:
+                block[ROUTED_ENDPOINT_KEY] = endpoint.name
+        return blocks
+
+    def _order_endpoints(self) -> List[ProviderEndpoint]:
+        ordered: List[ProviderEndpoint] = []
+        for tier in sorted({endpoint.tier for endpoint in self.endpoints}):
+            tier_endpoints = [e for e in self.endpoints if e.tier == tier]
+            known_latencies = [
+                e.latency_ewma for e in tier_endpoints if e.latency_ewma is not None
+            ]
+            default_latency = (
+                sum(known_latencies) / len(known_latencies) if known_latencies else 1.0
+            )
+            weights = [e.get_weight(default_latency) for e in tier_endpoints]
+            with self._rng_lock:
+                first_index = self._rng.choices(range(len(tier_endpoints)), weights)[0]
+            remaining = sorted(
+                (
+                    (weight, index)
+                    for index, weight in enumerate(weights)
+                    if index != first_index
+                ),
+                reverse=True,
+            )
+            ordered.append(tier_endpoints[first_index])
+            ordered.extend(tier_endpoints[index] for _, index in remaining)
+        return ordered
+
+    def _iter_available_endpoints(self):
+        for endpoint in self._order_endpoints():
+            if endpoint.circuit_breaker.allow_request():
+                yield endpoint
+
+    def _record_failover(self, endpoint: ProviderEndpoint, error: Optional[str]):
+        with self._stats_lock:
+            self.failovers += 1
+        print(f"警告: 端点 {endpoint.name} 请求失败，转移到下一个端点: {error}")
+
+    def request_blocks(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+        block_callback=None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        fallback_outcome: Tuple = (None, "所有端点均处于熔断状态，暂时不可用。")
+        failed_endpoint, last_error = None, None
+        blocks_streamed = False
+
+        def _forward_block(block):
+            nonlocal blocks_streamed
+            blocks_streamed = True
+            block_callback(block)
+
+        for endpoint in self._iter_available_endpoints():
+            if failed_endpoint is not None:
+                self._record_failover(failed_endpoint, last_error)
+            endpoint.begin_request()
+            request_start = time.perf_counter()
+            success = None
+            # 失败的端点已经流式返回过块时，后续端点不再预览，避免同一页的块在预览中重复出现；
+            # 最终结果返回后会替换预览
+            attempt_block_callback = (
+                _forward_block
+                if block_callback is not None and not blocks_streamed
+                else None
+            )
+            try:
+                blocks, error = endpoint.provider.request_blocks(
+                    pil_image,
+                    progress_callback=progress_callback,
+                    cancellation_event=cancellation_event,
+                    tracer=tracer,
+                    deadline=deadline,
+                    block_callback=attempt_block_callback,
+                )
+                if cancellation_event and cancellation_event.is_set():
+                    return None, None
+                success = blocks is not None and error is None
+            except Exception:
+                success = False
+                raise
+            finally:
+                endpoint.finish_request(success, time.perf_counter() - request_start)
+            if success:
+                return self._mark_routed_blocks(endpoint, blocks), error
+            failed_endpoint, last_error = endpoint, error
+            if blocks is not None or fallback_outcome[0] is None:
+                fallback_outcome = (blocks, f"[{endpoint.name}] {error}")
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        return fallback_outcome
+
+    async def request_blocks_async(
+        self,
+        pil_image,
+        progress_callback=None,
+        cancellation_event: threading.Event = None,
+        tracer=None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """request_blocks 的 asyncio 版本；端点 Provider 没有异步接口时在线程中调用"""
+        fallback_outcome: Tuple = (None, "所有端点均处于熔断状态，暂时不可用。")
+        failed_endpoint, last_error = None, None
+        for endpoint in self._iter_available_endpoints():
+            if failed_endpoint is not None:
+                self._record_failover(failed_endpoint, last_error)
+            endpoint.begin_request()
+            request_start = time.perf_counter()
+            success = None
+            request_async = getattr(endpoint.provider, "request_blocks_async", None)
+            try:
+                if request_async is not None:
+                    blocks, error = await request_async(
+                        pil_image,
+                        progress_callback=progress_callback,
+                        cancellation_event=cancellation_event,
+                        tracer=tracer,
+                        deadline=deadline,
+                    )
+                else:
+                    blocks, error = await asyncio.to_thread(
+                        endpoint.provider.request_blocks,
+                        pil_image,
+                        progress_callback=progress_callback,
+                        cancellation_event=cancellation_event,
+                        tracer=tracer,
+                        deadline=deadline,
+                    )
+                if cancellation_event and cancellation_event.is_set():
+                    return None, None
+                success = blocks is not None and error is None
+            except Exception:
+                success = False
+                raise
+            finally:
+                endpoint.finish_request(success, time.perf_counter() - request_start)
+            if success:
+                return self._mark_routed_blocks(endpoint, blocks), error
+            failed_endpoint, last_error = endpoint, error
+            if blocks is not None or fallback_outcome[0] is None:
+                fallback_outcome = (blocks, f"[{endpoint.name}] {error}")
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        return fallback_outcome
+
+    async def aclose_async_client(self):
+        for endpoint in self.endpoints:
+            aclose = getattr(endpoint.provider, "aclose_async_client", None)
+            if aclose is not None:
+                await aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            failovers = self.failovers
+        return {
+            "failovers": failovers,
+            "endpoints": {
+                endpoint.name: endpoint.get_stats() for endpoint in self.endpoints
+            },
+        }
+
+
+def build_provider_router(
+    config_manager: ConfigManager,
+    primary_name: str,
+    providers: Dict[str, Any],
+    create_extra_providers,
+) -> ProviderRouter:
+    """
+    providers: {"gemini": 主 Gemini Provider, "openai": 主 OpenAI Provider}
+    create_extra_providers(provider_name) 返回该 Provider 额外端点的 [(名称, Provider)]。
+    """
+    failure_threshold = config_manager.getint(
+        "Routing", "failure_threshold", fallback=3
+    )
+    open_seconds = config_manager.getfloat("Routing", "open_seconds", fallback=30.0)
+    smoothing = min(
+        1.0,
+        max(0.01, config_manager.getfloat("Routing", "health_smoothing", fallback=0.2)),
+    )
+    tier_names = [primary_name]
+    fallback_name = (
+        config_manager.get("API", "fallback_ocr_provider", fallback="").strip().lower()
+    )
+    if fallback_name in providers and fallback_name != primary_name:
+        tier_names.append(fallback_name)
+    endpoints = []
+    for tier, provider_name in enumerate(tier_names):
+        main_provider = providers[provider_name]
+        tier_providers = [(main_provider.endpoint_name, main_provider)]
+        tier_providers.extend(create_extra_providers(provider_name))
+        for endpoint_name, provider in tier_providers:
+            endpoints.append(
+                ProviderEndpoint(
+                    endpoint_name,
+                    provider,
+                    tier=tier,
+                    circuit_breaker=CircuitBreaker(failure_threshold, open_seconds),
+                    smoothing=smoothing,
+                )
+            )
+    return ProviderRouter(endpoints)
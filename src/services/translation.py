@@ -1,7 +1,10 @@
+import json
 import time
 import requests
 import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.translation_memory import compute_glossary_version
 
 try:
     from google import genai
@@ -11,6 +14,14 @@ except ImportError:
     GEMINI_LIB_FOR_TRANSLATION_AVAILABLE = False
     genai = None
 
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+BATCH_ITEM_OVERHEAD_TOKENS = 8
+
 
 class TranslationResult:
     def __init__(
@@ -30,8 +41,9 @@ class TranslationResult:
 
 
 class TranslationProvider(ABC):
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, translation_memory=None):
         self.config_manager = config_manager
+        self.translation_memory = translation_memory
         self.last_error = None
 
     @abstractmethod
@@ -48,10 +60,86 @@ class TranslationProvider(ABC):
     def get_last_error(self) -> str | None:
         return self.last_error
 
+    def _get_glossary_version(self) -> str:
+        return compute_glossary_version(
+            self.config_manager.get("GeminiAPI", "glossary_text", fallback="")
+        )
+
+    def _lookup_translation_memory(
+        self, texts: list[str], source_language: str, target_language: str
+    ) -> list[str | None]:
+        """返回翻译记忆中与 texts 一一对应的已有译文，未启用或未命中为 None"""
+        if not self.translation_memory:
+            return [None] * len(texts)
+        try:
+            return self.translation_memory.find_exact(
+                texts, source_language, target_language, self._get_glossary_version()
+            )
+        except Exception as e:
+            print(f"警告: 查询翻译记忆失败: {e}")
+            return [None] * len(texts)
+
+    def _build_memory_reference_segment(
+        self, texts: list[str], source_language: str, target_language: str
+    ) -> str:
+        """把翻译记忆中相似原文的已有译文作为参考加入 Prompt，保持反复出现的内容译法一致"""
+        if not self.translation_memory:
+            return ""
+        max_references = self.config_manager.getint(
+            "TranslationMemory", "max_fuzzy_references", fallback=20
+        )
+        glossary_version = self._get_glossary_version()
+        references = {}
+        try:
+            for text in texts:
+                if len(references) >= max_references:
+                    break
+                for _, original_text, translated_text in (
+                    self.translation_memory.find_fuzzy(
+                        text, source_language, target_language, glossary_version, 2
+                    )
+                ):
+                    references.setdefault(original_text, translated_text)
+        except Exception as e:
+            print(f"警告: 查询翻译记忆失败: {e}")
+        if not references:
+            return ""
+        reference_lines = "\n".join(
+            f"{original_text} -> {translated_text}"
+            for original_text, translated_text in list(references.items())[
+                :max_references
+            ]
+        )
+        return f"""Earlier translations of similar lines are listed below. Keep the wording consistent with them where the meaning matches:
+<reference_translations>
+{reference_lines}
+</reference_translations>
+"""
+
+    def _store_translation_memory(
+        self,
+        results: list[TranslationResult],
+        source_language: str,
+        target_language: str,
+    ):
+        if not self.translation_memory:
+            return
+        try:
+            self.translation_memory.add_many(
+                [(result.original_text, result.translated_text) for result in results],
+                source_language,
+                target_language,
+                self._get_glossary_version(),
+            )
+        except Exception as e:
+            print(f"警告: 写入翻译记忆失败: {e}")
+
 
 class GeminiTextTranslationProvider(TranslationProvider):
-    def __init__(self, config_manager, gemini_model_instance=None):
-        super().__init__(config_manager)
+    def __init__(
+        self, config_manager, gemini_model_instance=None, translation_memory=None
+    ):
+        super().__init__(config_manager, translation_memory)
         self.gemini_model = gemini_model_instance
         self.request_timeout = self.config_manager.getint(
             "GeminiAPI", "request_timeout", fallback=60
@@ -65,6 +153,64 @@ class GeminiTextTranslationProvider(TranslationProvider):
         elif self.gemini_model is None:
             self.last_error = "Gemini 模型未提供给翻译器。"
 
+    def _build_glossary_segment(self) -> str:
+        raw_glossary_text = self.config_manager.get(
+            "GeminiAPI", "glossary_text", fallback=""
+        ).strip()
+        if not raw_glossary_text:
+            return ""
+        glossary_lines = [
+            line.strip()
+            for line in raw_glossary_text.splitlines()
+            if line.strip() and "->" in line.strip()
+        ]
+        if not glossary_lines:
+            return ""
+        formatted_glossary = "\n".join(glossary_lines)
+        return f"""Strictly adhere to the following glossary if terms are present:
+<glossary>
+{formatted_glossary}
+</glossary>
+"""
+
+    def _generate_text(self, prompt: str) -> str:
+        response = self.gemini_model.generate_content(
+            prompt,
+            safety_settings=SAFETY_SETTINGS,
+            request_options={"timeout": self.request_timeout},
+        )
+        return response.text.strip()
+
+    def _translate_single_text(
+        self,
+        original_text: str,
+        source_language: str,
+        target_language: str,
+        glossary_prompt_segment: str,
+    ) -> TranslationResult:
+        prompt_for_translation = f"""{glossary_prompt_segment}
+Translate the following {source_language} text into fluent and natural {target_language}. Output only the translated text, without any additional explanations, commentary, or quotation marks unless they are part of the translation itself.
+{source_language} Text:
+\"\"\"
+{original_text}
+\"\"\"
+{target_language} Translation:
+"""
+        try:
+            translated_text_content = self._generate_text(prompt_for_translation)
+        except TimeoutError as timeout_error:
+            self.last_error = f"Gemini 文本翻译请求超时 (超过 {self.request_timeout} 秒): {timeout_error}"
+            translated_text_content = "[Gemini翻译超时]"
+        except Exception as e:
+            self.last_error = f"Gemini 文本翻译时发生错误: {e}"
+            translated_text_content = "[Gemini错误]"
+            import traceback
+
+            traceback.print_exc()
+        return TranslationResult(
+            original_text, translated_text_content, source_language, target_language
+        )
+
     def translate_batch(
         self,
         texts: list[str],
@@ -80,30 +226,78 @@ class GeminiTextTranslationProvider(TranslationProvider):
             elif not self.last_error:
                 self.last_error = "Gemini 模型不可用或未配置。"
             return None
-        results = []
-        raw_glossary_text = self.config_manager.get(
-            "GeminiAPI", "glossary_text", fallback=""
-        ).strip()
-        glossary_prompt_segment = ""
-        if raw_glossary_text:
-            glossary_lines = [
-                line.strip()
-                for line in raw_glossary_text.splitlines()
-                if line.strip() and "->" in line.strip()
-            ]
-            if glossary_lines:
-                formatted_glossary = "\n".join(glossary_lines)
-                glossary_prompt_segment = f"""Strictly adhere to the following glossary if terms are present:
-<glossary>
-{formatted_glossary}
-</glossary>
-"""
+        glossary_prompt_segment = self._build_glossary_segment()
         effective_target_language = (
             target_language if target_language else self.target_language_gemini
         )
         print(
             f"    使用 Gemini ({self.gemini_model.model_name if hasattr(self.gemini_model, 'model_name') else '未知模型'}) 翻译 {len(texts)} 个文本块从 {source_language} 到 {effective_target_language}..."
         )
+        memory_translations = self._lookup_translation_memory(
+            texts, source_language, effective_target_language
+        )
+        results: list[TranslationResult | None] = [
+            (
+                TranslationResult(
+                    original_text,
+                    memory_translation,
+                    source_language,
+                    effective_target_language,
+                )
+                if memory_translation is not None
+                else None
+            )
+            for original_text, memory_translation in zip(texts, memory_translations)
+        ]
+        pending_indices = [i for i, result in enumerate(results) if result is None]
+        if len(pending_indices) < len(texts):
+            print(f"    翻译记忆命中 {len(texts) - len(pending_indices)} 个文本块。")
+        if not pending_indices:
+            if item_progress_callback and texts:
+                item_progress_callback(
+                    len(texts), len(texts), "翻译记忆命中全部文本块"
+                )
+            return results
+        pending_texts = [texts[i] for i in pending_indices]
+        pending_results = self._translate_texts(
+            pending_texts,
+            source_language,
+            effective_target_language,
+            glossary_prompt_segment
+            + self._build_memory_reference_segment(
+                pending_texts, source_language, effective_target_language
+            ),
+            cancellation_event,
+            item_progress_callback,
+        )
+        for i, pending_result in zip(pending_indices, pending_results):
+            results[i] = pending_result
+        self._store_translation_memory(
+            pending_results, source_language, effective_target_language
+        )
+        return results
+
+    def _translate_texts(
+        self,
+        texts: list[str],
+        source_language: str,
+        effective_target_language: str,
+        glossary_prompt_segment: str,
+        cancellation_event: threading.Event = None,
+        item_progress_callback=None,
+    ) -> list[TranslationResult]:
+        results = []
+        if self.config_manager.getboolean(
+            "TextTranslation", "batch_enabled", fallback=True
+        ) and sum(1 for text in texts if text.strip()) > 1:
+            return self._translate_batched(
+                texts,
+                source_language,
+                effective_target_language,
+                glossary_prompt_segment,
+                cancellation_event,
+                item_progress_callback,
+            )
         total_translation_time = 0
         total_items = len(texts)
         for i, original_text in enumerate(texts):
@@ -131,68 +325,14 @@ class GeminiTextTranslationProvider(TranslationProvider):
                 )
                 continue
             start_trans_time = time.time()
-            prompt_for_translation = f"""{glossary_prompt_segment}
-Translate the following {source_language} text into fluent and natural {effective_target_language}. Output only the translated text, without any additional explanations, commentary, or quotation marks unless they are part of the translation itself.
-{source_language} Text:
-\"\"\"
-{original_text}
-\"\"\"
-{effective_target_language} Translation:
-"""
-            translated_text_content = f"[Gemini翻译失败]"
-            try:
-                safety_settings_req = [
-                    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                    {
-                        "category": "HARM_CATEGORY_HATE_SPEECH",
-                        "threshold": "BLOCK_NONE",
-                    },
-                    {
-                        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                        "threshold": "BLOCK_NONE",
-                    },
-                    {
-                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                        "threshold": "BLOCK_NONE",
-                    },
-                ]
-                response = self.gemini_model.generate_content(
-                    prompt_for_translation,
-                    safety_settings=safety_settings_req,
-                    request_options={"timeout": self.request_timeout},
-                )
-                translated_text_content = response.text.strip()
-                results.append(
-                    TranslationResult(
-                        original_text,
-                        translated_text_content,
-                        source_language,
-                        effective_target_language,
-                    )
+            results.append(
+                self._translate_single_text(
+                    original_text,
+                    source_language,
+                    effective_target_language,
+                    glossary_prompt_segment,
                 )
-            except TimeoutError as timeout_error:
-                self.last_error = f"Gemini 文本翻译请求超时 (超过 {self.request_timeout} 秒): {timeout_error}"
-                results.append(
-                    TranslationResult(
-                        original_text,
-                        f"[Gemini翻译超时]",
-                        source_language,
-                        effective_target_language,
-                    )
-                )
-            except Exception as e:
-                self.last_error = f"Gemini 文本翻译时发生错误: {e}"
-                results.append(
-                    TranslationResult(
-                        original_text,
-                        f"[Gemini错误]",
-                        source_language,
-                        effective_target_language,
-                    )
-                )
-                import traceback
-
-                traceback.print_exc()
+            )
             end_trans_time = time.time()
             total_translation_time += end_trans_time - start_trans_time
             if cancellation_event and cancellation_event.is_set():
@@ -223,9 +363,191 @@ Translate the following {source_language} text into fluent and natural {effectiv
         print(f"    Gemini 文本翻译完成。总耗时: {total_translation_time:.2f} 秒")
         return results
 
+    def _split_into_chunks(
+        self, items: list[tuple[int, str]]
+    ) -> list[list[tuple[int, str]]]:
+        """按 TextTranslation.max_batch_tokens 的粗略 token 预算把文本分组"""
+        max_batch_tokens = max(
+            1,
+            self.config_manager.getint(
+                "TextTranslation", "max_batch_tokens", fallback=2000
+            ),
+        )
+        chunks, current_chunk, current_tokens = [], [], 0
+        for item_id, text in items:
+            item_tokens = len(text) // 3 + BATCH_ITEM_OVERHEAD_TOKENS
+            if current_chunk and current_tokens + item_tokens > max_batch_tokens:
+                chunks.append(current_chunk)
+                current_chunk, current_tokens = [], 0
+            current_chunk.append((item_id, text))
+            current_tokens += item_tokens
+        if current_chunk:
+            chunks.append(current_chunk)
+        return chunks
+
+    @staticmethod
+    def _build_batch_prompt(
+        chunk: list[tuple[int, str]],
+        source_language: str,
+        target_language: str,
+        glossary_prompt_segment: str,
+    ) -> str:
+        input_items = json.dumps(
+            [{"id": item_id, "text": text} for item_id, text in chunk],
+            ensure_ascii=False,
+        )
+        return f"""{glossary_prompt_segment}
+Translate the "text" of every item in the following JSON array from {source_language} into fluent and natural {target_language}. Translate each item independently and keep its "id" unchanged.
+Output only a JSON array of objects with the keys "id" and "translation", one object for every input item, without any additional explanations, commentary, or markdown.
+Input:
+{input_items}
+"""
+
+    @staticmethod
+    def _parse_batch_response(raw_text: str) -> dict[int, str]:
+        """解析批量翻译响应，返回 {id: 译文}；无法解析的条目被忽略"""
+        cleaned_json_text = raw_text.strip()
+        if cleaned_json_text.startswith("```json"):
+            cleaned_json_text = cleaned_json_text[7:]
+        elif cleaned_json_text.startswith("```"):
+            cleaned_json_text = cleaned_json_text[3:]
+        if cleaned_json_text.endswith("```"):
+            cleaned_json_text = cleaned_json_text[:-3]
+        try:
+            data = json.loads(cleaned_json_text.strip())
+        except ValueError:
+            return {}
+        if isinstance(data, dict):
+            data = next((v for v in data.values() if isinstance(v, list)), [])
+        translations = {}
+        for item in data if isinstance(data, list) else []:
+            if not isinstance(item, dict) or not isinstance(
+                item.get("translation"), str
+            ):
+                continue
+            try:
+                translations[int(item.get("id"))] = item["translation"].strip()
+            except (TypeError, ValueError):
+                continue
+        return translations
+
+    def _translate_chunk(
+        self,
+        chunk: list[tuple[int, str]],
+        source_language: str,
+        target_language: str,
+        glossary_prompt_segment: str,
+        cancellation_event: threading.Event = None,
+    ) -> dict[int, str]:
+        if cancellation_event and cancellation_event.is_set():
+            return {}
+        try:
+            return self._parse_batch_response(
+                self._generate_text(
+                    self._build_batch_prompt(
+                        chunk, source_language, target_language, glossary_prompt_segment
+                    )
+                )
+            )
+        except Exception as e:
+            self.last_error = f"Gemini 批量文本翻译时发生错误: {e}"
+            print(f"    警告: {self.last_error}")
+            return {}
+
+    def _translate_batched(
+        self,
+        texts: list[str],
+        source_language: str,
+        target_language: str,
+        glossary_prompt_segment: str,
+        cancellation_event: threading.Event = None,
+        item_progress_callback=None,
+    ) -> list[TranslationResult]:
+        """
+        把多个文本按 id 打包为 JSON 数组，一次请求翻译一组；超出 token 预算时分为多组并行请求。
+        响应中缺失的 id 单独重新翻译。
+        """
+        start_trans_time = time.time()
+        total_items = len(texts)
+        results: list[TranslationResult | None] = [None] * total_items
+        pending_items = []
+        for item_id, original_text in enumerate(texts):
+            if original_text.strip():
+                pending_items.append((item_id, original_text))
+            else:
+                results[item_id] = TranslationResult(
+                    original_text, "", source_language, target_language
+                )
+        chunks = self._split_into_chunks(pending_items)
+        max_parallel_batches = max(
+            1,
+            self.config_manager.getint(
+                "TextTranslation", "max_parallel_batches", fallback=4
+            ),
+        )
+        completed_items = total_items - len(pending_items)
+        with ThreadPoolExecutor(
+            max_workers=min(max_parallel_batches, len(chunks)),
+            thread_name_prefix="TextTranslation",
+        ) as executor:
+            chunk_futures = {
+                executor.submit(
+                    self._translate_chunk,
+                    chunk,
+                    source_language,
+                    target_language,
+                    glossary_prompt_segment,
+                    cancellation_event,
+                ): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(chunk_futures):
+                translations = future.result()
+                for item_id, original_text in chunk_futures[future]:
+                    if item_id in translations:
+                        results[item_id] = TranslationResult(
+                            original_text,
+                            translations[item_id],
+                            source_language,
+                            target_language,
+                        )
+                completed_items += len(chunk_futures[future])
+                if item_progress_callback:
+                    item_progress_callback(
+                        completed_items,
+                        total_items,
+                        f"Gemini 批量翻译 {completed_items}/{total_items}",
+                    )
+        missing_items = [
+            (item_id, text) for item_id, text in pending_items if results[item_id] is None
+        ]
+        if missing_items and not (cancellation_event and cancellation_event.is_set()):
+            print(f"    {len(missing_items)} 个文本块未在批量响应中返回，单独重新翻译...")
+        for item_id, original_text in missing_items:
+            if cancellation_event and cancellation_event.is_set():
+                self.last_error = "Gemini 文本翻译被取消。"
+                results[item_id] = TranslationResult(
+                    original_text, "[翻译取消]", source_language, target_language
+                )
+                continue
+            results[item_id] = self._translate_single_text(
+                original_text, source_language, target_language, glossary_prompt_segment
+            )
+        if item_progress_callback and total_items > 0:
+            item_progress_callback(
+                total_items, total_items, "Gemini 文本翻译批处理完成"
+            )
+        print(
+            f"    Gemini 批量文本翻译完成 ({len(chunks)} 组请求)。总耗时: {time.time() - start_trans_time:.2f} 秒"
+        )
+        return results
+
 
 def get_translation_provider(
-    config_manager, provider_name: str, gemini_model_instance_for_text_translation=None
+    config_manager,
+    provider_name: str,
+    gemini_model_instance_for_text_translation=None,
+    translation_memory=None,
 ) -> TranslationProvider | None:
     provider_name_lower = provider_name.lower()
     if "gemini" in provider_name_lower:
@@ -235,6 +557,7 @@ def get_translation_provider(
         return GeminiTextTranslationProvider(
             config_manager,
             gemini_model_instance=gemini_model_instance_for_text_translation,
+            translation_memory=translation_memory,
         )
     else:
         print(f"尝试获取非Gemini翻译Provider ('{provider_name}')，但当前仅支持Gemini。")
@@ -243,5 +566,6 @@ def get_translation_provider(
             return GeminiTextTranslationProvider(
                 config_manager,
                 gemini_model_instance=gemini_model_instance_for_text_translation,
+                translation_memory=translation_memory,
             )
         return None
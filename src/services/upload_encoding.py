@@ -0,0 +1,183 @@
+"""
+上传图像编码
+在 PNG / JPEG / WebP 之间选择上传格式，并通过二分查找质量参数使编码结果不超过字节预算。
+编码前会把透明通道合成到纯色背景上。编码结果保存在 EncodedImage 中，重试时直接复用。
+"""
+
+import base64
+from io import BytesIO
+from typing import Any, Dict, Optional
+from core.config import ConfigManager
+
+try:
+    from PIL import Image, features
+
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    Image = None
+    features = None
+UPLOAD_FORMATS = ("auto", "png", "jpeg", "webp")
+_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class EncodedImage:
+    """已编码的上传图像，base64 字符串按需生成并缓存"""
+
+    def __init__(
+        self,
+        data: bytes,
+        image_format: str,
+        quality: Optional[int] = None,
+        image_size: Optional[tuple[int, int]] = None,
+    ):
+        self.data = data
+        self.format = image_format
+        self.mime_type = _MIME_TYPES.get(image_format, "image/png")
+        self.quality = quality
+        self.image_size = image_size
+        self._base64: Optional[str] = None
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.data)
+
+    def to_base64(self) -> str:
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("utf-8")
+        return self._base64
+
+    def to_data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.to_base64()}"
+
+
+def _parse_background_color(color_str: str) -> tuple[int, int, int]:
+    color_str = (color_str or "").strip().lstrip("#")
+    if len(color_str) == 6:
+        try:
+            return tuple(int(color_str[i : i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            pass
+    return (255, 255, 255)
+
+
+def flatten_alpha(pil_image, background_color=(255, 255, 255)):
+    """把透明通道合成到纯色背景上，返回 RGB 或 L 模式图像"""
+    if pil_image.mode in ("RGB", "L"):
+        return pil_image
+    if pil_image.mode == "P" and "transparency" in pil_image.info:
+        pil_image = pil_image.convert("RGBA")
+    if pil_image.mode in ("RGBA", "LA", "PA"):
+        rgba_image = pil_image.convert("RGBA")
+        background = Image.new("RGB", rgba_image.size, background_color)
+        background.paste(rgba_image, mask=rgba_image.getchannel("A"))
+        return background
+    return pil_image.convert("RGB")
+
+
+def _encode(pil_image, image_format: str, quality: Optional[int] = None) -> bytes:
+    buffered = BytesIO()
+    if image_format == "JPEG":
+        pil_image.save(
+            buffered, format="JPEG", quality=quality, optimize=False, subsampling=0
+        )
+    elif image_format == "WEBP":
+        pil_image.save(buffered, format="WEBP", quality=quality, method=4)
+    else:
+        pil_image.save(buffered, format="PNG", compress_level=6)
+    return buffered.getvalue()
+
+
+def _search_quality(
+    pil_image, image_format: str, max_bytes: int, min_quality: int, max_quality: int
+) -> EncodedImage:
+    """二分查找不超过 max_bytes 的最高质量；最低质量仍超出时返回最低质量的结果"""
+    data = _encode(pil_image, image_format, max_quality)
+    if max_bytes <= 0 or len(data) <= max_bytes:
+        return EncodedImage(data, image_format, max_quality)
+    best: Optional[EncodedImage] = None
+    low, high = min_quality, max_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(pil_image, image_format, quality)
+        if len(data) <= max_bytes:
+            best = EncodedImage(data, image_format, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+    if best is None:
+        best = EncodedImage(
+            _encode(pil_image, image_format, min_quality), image_format, min_quality
+        )
+    return best
+
+
+def _has_few_colors(pil_image, max_colors: int = 256) -> bool:
+    try:
+        return pil_image.getcolors(max_colors) is not None
+    except Exception:
+        return False
+
+
+def get_upload_encoding_settings(config_manager: ConfigManager) -> Dict[str, Any]:
+    image_format = config_manager.get("UploadEncoding", "format", "png").lower()
+    if image_format not in UPLOAD_FORMATS:
+        image_format = "png"
+    min_quality = min(
+        max(1, config_manager.getint("UploadEncoding", "min_quality", fallback=60)), 100
+    )
+    max_quality = min(
+        max(
+            min_quality,
+            config_manager.getint("UploadEncoding", "max_quality", fallback=92),
+        ),
+        100,
+    )
+    return {
+        "format": image_format,
+        "max_bytes": int(
+            config_manager.getfloat("UploadEncoding", "max_upload_kb", fallback=1500)
+            * 1024
+        ),
+        "min_quality": min_quality,
+        "max_quality": max_quality,
+        "background_color": config_manager.get(
+            "UploadEncoding", "background_color", "#FFFFFF"
+        ),
+    }
+
+
+def encode_image_for_upload(pil_image, config_manager: ConfigManager) -> EncodedImage:
+    """
+    按 UploadEncoding 配置编码上传图像，默认使用无损 PNG，max_upload_kb 只约束有损格式。
+    auto 模式下色彩较少（如纯黑白线稿）且 PNG 不超过预算时使用无损 PNG，否则使用 JPEG。
+    """
+    encoded_image = _encode_with_settings(
+        pil_image, get_upload_encoding_settings(config_manager)
+    )
+    encoded_image.image_size = pil_image.size
+    return encoded_image
+
+
+def _encode_with_settings(pil_image, settings: Dict[str, Any]) -> EncodedImage:
+    image_format = settings["format"]
+    max_bytes = settings["max_bytes"]
+    flattened = flatten_alpha(
+        pil_image, _parse_background_color(settings["background_color"])
+    )
+    if image_format == "webp" and not features.check("webp"):
+        print("警告: 当前 Pillow 不支持 WebP 编码，改用 JPEG。")
+        image_format = "jpeg"
+    if image_format == "png":
+        return EncodedImage(_encode(flattened, "PNG"), "PNG")
+    if image_format == "auto" and _has_few_colors(flattened):
+        png_data = _encode(flattened, "PNG")
+        if max_bytes <= 0 or len(png_data) <= max_bytes:
+            return EncodedImage(png_data, "PNG")
+    return _search_quality(
+        flattened,
+        "WEBP" if image_format == "webp" else "JPEG",
+        max_bytes,
+        settings["min_quality"],
+        settings["max_quality"],
+    )
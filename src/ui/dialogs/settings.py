@@ -201,9 +201,33 @@ class SettingsDialog(QDialog):
         contrast_layout.addWidget(contrast_label)
         contrast_layout.addWidget(self.llm_contrast_factor_edit, 1)
         llm_preprocess_details_form_layout.addLayout(contrast_layout)
+        sharpen_layout = QHBoxLayout()
+        sharpen_label = QLabel("锐化强度:")
+        self.llm_sharpen_amount_edit = QLineEdit()
+        self.llm_sharpen_amount_edit.setPlaceholderText("0 表示不锐化，推荐不超过1.0")
+        sharpen_layout.addWidget(sharpen_label)
+        sharpen_layout.addWidget(self.llm_sharpen_amount_edit, 1)
+        llm_preprocess_details_form_layout.addLayout(sharpen_layout)
+        self.llm_grayscale_checkbox = QCheckBox("转换为灰度图（可减小上传体积）")
+        llm_preprocess_details_form_layout.addWidget(self.llm_grayscale_checkbox)
         llm_preprocess_layout.addWidget(self.llm_preprocess_details_widget)
         main_layout.addWidget(self.gemini_group)
         main_layout.addWidget(self.llm_preprocess_group)
+        batch_group = QGroupBox("批量处理设置")
+        batch_layout = QVBoxLayout(batch_group)
+        batch_group.setSizePolicy(
+            QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed
+        )
+        batch_concurrency_layout = QHBoxLayout()
+        batch_concurrency_label = QLabel("同时处理的页数:")
+        self.batch_concurrency_edit = QLineEdit()
+        self.batch_concurrency_edit.setPlaceholderText(
+            "例如: 3，受 API 速率限制影响，不宜过大"
+        )
+        batch_concurrency_layout.addWidget(batch_concurrency_label)
+        batch_concurrency_layout.addWidget(self.batch_concurrency_edit, 1)
+        batch_layout.addLayout(batch_concurrency_layout)
+        main_layout.addWidget(batch_group)
         proxy_group = QGroupBox("代理设置")
         proxy_layout = QVBoxLayout()
         proxy_group.setSizePolicy(
@@ -313,6 +337,19 @@ class SettingsDialog(QDialog):
                 "LLMImagePreprocessing", "contrast_factor", fallback="1.0"
             )
         )
+        self.llm_sharpen_amount_edit.setText(
+            self.config_manager.get(
+                "LLMImagePreprocessing", "sharpen_amount", fallback="0.0"
+            )
+        )
+        self.llm_grayscale_checkbox.setChecked(
+            self.config_manager.getboolean(
+                "LLMImagePreprocessing", "grayscale", fallback=False
+            )
+        )
+        self.batch_concurrency_edit.setText(
+            self.config_manager.get("Batch", "max_concurrent_pages", fallback="3")
+        )
         current_resample_method = self.config_manager.get(
             "LLMImagePreprocessing", "upscale_resample_method", fallback="LANCZOS"
         ).upper()
@@ -414,6 +451,21 @@ class SettingsDialog(QDialog):
             "upscale_resample_method",
             self.llm_resample_method_combo.currentText(),
         )
+        self.config_manager.set(
+            "LLMImagePreprocessing",
+            "sharpen_amount",
+            self.llm_sharpen_amount_edit.text().strip() or "0.0",
+        )
+        self.config_manager.set(
+            "LLMImagePreprocessing",
+            "grayscale",
+            str(self.llm_grayscale_checkbox.isChecked()),
+        )
+        self.config_manager.set(
+            "Batch",
+            "max_concurrent_pages",
+            self.batch_concurrency_edit.text().strip() or "3",
+        )
         self.config_manager.save()
         return True
 
@@ -570,6 +622,13 @@ class SettingsDialog(QDialog):
             QMessageBox.warning(self, "输入错误", "Gemini 请求超时必须是一个正整数。")
             self.gemini_timeout_edit.setFocus()
             return
+        batch_concurrency_str = self.batch_concurrency_edit.text().strip()
+        if batch_concurrency_str and (
+            not batch_concurrency_str.isdigit() or int(batch_concurrency_str) <= 0
+        ):
+            QMessageBox.warning(self, "输入错误", "同时处理的页数必须是一个正整数。")
+            self.batch_concurrency_edit.setFocus()
+            return
         if self.llm_preprocess_enabled_checkbox.isChecked():
             try:
                 upscale_f = float(self.llm_upscale_factor_edit.text().strip())
@@ -595,6 +654,20 @@ class SettingsDialog(QDialog):
                 )
                 self.llm_contrast_factor_edit.setFocus()
                 return
+            try:
+                sharpen_amount = float(
+                    self.llm_sharpen_amount_edit.text().strip() or "0.0"
+                )
+                if sharpen_amount < 0.0:
+                    raise ValueError("Sharpen amount negative")
+            except ValueError:
+                QMessageBox.warning(
+                    self,
+                    "输入错误",
+                    "LLM 图像锐化强度必须是一个非负数 (例如 0, 0.5)。",
+                )
+                self.llm_sharpen_amount_edit.setFocus()
+                return
         if self._save_settings():
             if self.proxy_checkbox.isChecked():
                 proxy_host = self.proxy_host_edit.text().strip()
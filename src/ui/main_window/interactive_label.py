@@ -26,6 +26,7 @@ from PyQt6.QtCore import (
     QEvent,
 )
 from core.config import ConfigManager
+from core.settings import get_render_settings, parse_rgba_color
 from core.processor import ProcessedBlock
 from utils.image import (
     PILLOW_AVAILABLE,
@@ -132,74 +133,27 @@ class InteractiveLabel(QWidget):
         self.update()
 
     def _parse_color_str(self, color_str: str, default_color_tuple: tuple) -> tuple:
-        try:
-            parts = list(map(int, color_str.split(",")))
-            if len(parts) == 3:
-                return (parts[0], parts[1], parts[2], 255)
-            if len(parts) == 4:
-                return (parts[0], parts[1], parts[2], parts[3])
-        except:
-            pass
-        return default_color_tuple
+        return parse_rgba_color(color_str, default_color_tuple)
 
     def reload_style_configs(self):
-        self._font_name_config = self.config_manager.get("UI", "font_name", "msyh.ttc")
-        self._text_main_color_pil = self._parse_color_str(
-            self.config_manager.get("UI", "text_main_color", "255,255,255,255"),
-            (255, 255, 255, 255),
-        )
-        self._text_outline_color_pil = self._parse_color_str(
-            self.config_manager.get("UI", "text_outline_color", "0,0,0,255"),
-            (0, 0, 0, 255),
-        )
-        self._text_bg_color_pil = self._parse_color_str(
-            self.config_manager.get("UI", "text_background_color", "0,0,0,128"),
-            (0, 0, 0, 128),
-        )
-        self._outline_thickness = self.config_manager.getint(
-            "UI", "text_outline_thickness", 2
-        )
-        self._text_padding = self.config_manager.getint("UI", "text_padding", 3)
-        self._h_char_spacing_px = self.config_manager.getint(
-            "UI", "h_text_char_spacing_px", 0
-        )
-        self._h_line_spacing_px = self.config_manager.getint(
-            "UI", "h_text_line_spacing_px", 0
-        )
-        self._v_char_spacing_px = self.config_manager.getint(
-            "UI", "v_text_char_spacing_px", 0
-        )
-        self._v_col_spacing_px = self.config_manager.getint(
-            "UI", "v_text_column_spacing_px", 0
-        )
-        self._h_manual_break_extra_px = self.config_manager.getint(
-            "UI", "h_manual_break_extra_spacing_px", 0
-        )
-        self._v_manual_break_extra_px = self.config_manager.getint(
-            "UI", "v_manual_break_extra_spacing_px", 0
-        )
-        self.font_size_mapping = {
-            "very_small": self.config_manager.getint(
-                "FontSizeMapping", "very_small", 12
-            ),
-            "small": self.config_manager.getint("FontSizeMapping", "small", 16),
-            "medium": self.config_manager.getint("FontSizeMapping", "medium", 22),
-            "large": self.config_manager.getint("FontSizeMapping", "large", 28),
-            "very_large": self.config_manager.getint(
-                "FontSizeMapping", "very_large", 36
-            ),
-        }
-        fixed_font_size_override = self.config_manager.getint(
-            "UI", "fixed_font_size", 0
-        )
+        settings = get_render_settings(self.config_manager)
+        self._font_name_config = settings.font_name
+        self._text_main_color_pil = settings.text_main_color
+        self._text_outline_color_pil = settings.text_outline_color
+        self._text_bg_color_pil = settings.text_background_color
+        self._outline_thickness = settings.text_outline_thickness
+        self._text_padding = settings.text_padding
+        self._h_char_spacing_px = settings.h_char_spacing_px
+        self._h_line_spacing_px = settings.h_line_spacing_px
+        self._v_char_spacing_px = settings.v_char_spacing_px
+        self._v_col_spacing_px = settings.v_col_spacing_px
+        self._h_manual_break_extra_px = settings.h_manual_break_extra_px
+        self._v_manual_break_extra_px = settings.v_manual_break_extra_px
+        self.font_size_mapping = settings.font_size_mapping
         for block_item in self.processed_blocks:
-            if fixed_font_size_override > 0:
-                block_item.font_size_pixels = fixed_font_size_override
-            else:
-                block_item.font_size_pixels = self.font_size_mapping.get(
-                    block_item.font_size_category,
-                    self.font_size_mapping.get("medium", 22),
-                )
+            block_item.font_size_pixels = settings.font_size_for(
+                block_item.font_size_category
+            )
             if not hasattr(block_item, "main_color"):
                 block_item.main_color = None
             if not hasattr(block_item, "outline_color"):
@@ -325,6 +279,7 @@ class InteractiveLabel(QWidget):
         self._block_render_cache.clear()
         if self.selected_block not in self.processed_blocks:
             self.set_selected_block(None)
+        render_settings = get_render_settings(self.config_manager)
         for i, block in enumerate(self.processed_blocks):
             if not hasattr(block, "id") or block.id is None:
                 block.id = f"block_{time.time_ns()}_{i}"
@@ -336,16 +291,9 @@ class InteractiveLabel(QWidget):
                 block.background_color = None
             if not hasattr(block, "outline_thickness"):
                 block.outline_thickness = None
-            fixed_font_size_override = self.config_manager.getint(
-                "UI", "fixed_font_size", 0
+            block.font_size_pixels = render_settings.font_size_for(
+                getattr(block, "font_size_category", "medium")
             )
-            if fixed_font_size_override > 0:
-                block.font_size_pixels = fixed_font_size_override
-            else:
-                block.font_size_pixels = self.font_size_mapping.get(
-                    getattr(block, "font_size_category", "medium"),
-                    self.font_size_mapping.get("medium", 22),
-                )
         self.update()
 
     def get_current_render_as_pil_image(self) -> Image.Image | None:
@@ -1048,14 +996,8 @@ class InteractiveLabel(QWidget):
         default_width_orig = 150
         default_height_orig = 50
         default_font_size_category = "medium"
-        default_font_size_px = self.font_size_mapping.get(
-            default_font_size_category, 22
-        )
-        fixed_font_size_override = self.config_manager.getint(
-            "UI", "fixed_font_size", 0
-        )
-        if fixed_font_size_override > 0:
-            default_font_size_px = fixed_font_size_override
+        render_settings = get_render_settings(self.config_manager)
+        default_font_size_px = render_settings.font_size_for(default_font_size_category)
         new_bbox = [
             center_x_orig - default_width_orig / 2,
             center_y_orig - default_height_orig / 2,
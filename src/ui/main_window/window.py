@@ -123,6 +123,7 @@ class MainWindow(QMainWindow):
         self.progress_bar = None
         self.cancel_button = None
         self.smooth_progress_timer = None
+        self._showing_partial_blocks = False
         self.setAutoFillBackground(True)
         self._check_dependencies_on_startup()
         self._create_actions()
@@ -189,6 +190,8 @@ class MainWindow(QMainWindow):
         self.prompt_settings_action = QAction("Prompt 模板设置(&P)", self)
         self.change_bg_action = QAction("更换窗口背景(&G)", self)
         self.set_icon_action = QAction("设置窗口图标(&I)", self)
+        self.import_memory_action = QAction("导入翻译记忆(&M)", self)
+        self.export_memory_action = QAction("导出翻译记忆(&E)", self)
 
     def _create_menu_bar(self):
         menu_bar = self.menuBar()
@@ -200,6 +203,9 @@ class MainWindow(QMainWindow):
         option_menu = menu_bar.addMenu("&选项")
         option_menu.addAction(self.change_bg_action)
         option_menu.addAction(self.set_icon_action)
+        option_menu.addSeparator()
+        option_menu.addAction(self.import_memory_action)
+        option_menu.addAction(self.export_memory_action)
         setting_menu = menu_bar.addMenu("&设置")
         setting_menu.addAction(self.api_settings_action)
         setting_menu.addAction(self.glossary_settings_action)
@@ -330,6 +336,8 @@ class MainWindow(QMainWindow):
         self.prompt_settings_action.triggered.connect(self.open_prompt_settings)
         self.change_bg_action.triggered.connect(self.change_window_background)
         self.set_icon_action.triggered.connect(self.set_window_icon)
+        self.import_memory_action.triggered.connect(self.import_translation_memory)
+        self.export_memory_action.triggered.connect(self.export_translation_memory)
         self.translate_button.clicked.connect(self.start_translation)
         self.download_button.clicked.connect(self.export_result)
         self.interactive_translate_area.block_modified_signal.connect(
@@ -418,6 +426,9 @@ class MainWindow(QMainWindow):
         self.translation_worker.status_text_only_signal.connect(
             self.update_status_text_only
         )
+        self.translation_worker.partial_blocks_signal.connect(
+            self.show_partial_blocks
+        )
         self.translation_worker.finished_signal.connect(self.translation_finished)
         self.smooth_progress_timer = SmoothProgressEmitter(
             self.translation_worker.timeout_seconds
@@ -468,6 +479,13 @@ class MainWindow(QMainWindow):
         """仅更新状态文本（与进度条独立）"""
         self.status_label.setText(message)
 
+    @pyqtSlot(object)
+    def show_partial_blocks(self, blocks):
+        """流式响应期间预览已解析出的文本块"""
+        self._showing_partial_blocks = True
+        self.interactive_translate_area.set_processed_blocks(blocks)
+        self.status_label.setText(f"已接收 {len(blocks)} 个文本块...")
+
     @pyqtSlot(object, object, str, str)
     def translation_finished(self, original_img, blocks, image_path, error_msg):
         if self.smooth_progress_timer:
@@ -479,7 +497,11 @@ class MainWindow(QMainWindow):
         self.progress_widget.setVisible(False)
         self.cancel_button.setVisible(False)
         self.cancel_button.setEnabled(True)
-        if error_msg:
+        showing_partial_blocks = self._showing_partial_blocks
+        self._showing_partial_blocks = False
+        if showing_partial_blocks and not blocks:
+            self.interactive_translate_area.set_processed_blocks([])
+        if error_msg and not blocks:
             if "已取消" in error_msg:
                 self.status_label.setText("翻译已取消")
                 QMessageBox.information(self, "提示", error_msg)
@@ -490,8 +512,17 @@ class MainWindow(QMainWindow):
         if blocks:
             self.interactive_translate_area.set_processed_blocks(blocks)
             self.download_button.setEnabled(True)
-            self.status_label.setText("翻译完成")
             self.text_detail_panel.set_blocks(blocks)
+            if error_msg:
+                # 流式响应中断或超时：保留已收到的部分结果
+                self.status_label.setText("翻译未完成，仅显示部分结果")
+                QMessageBox.warning(
+                    self,
+                    "部分结果",
+                    f"处理未完成: {error_msg}\n已保留收到的 {len(blocks)} 个文本块。",
+                )
+            else:
+                self.status_label.setText("翻译完成")
         else:
             self.status_label.setText("未检测到文本或翻译为空")
             QMessageBox.information(self, "提示", "未检测到文本或翻译结果为空。")
@@ -591,6 +622,45 @@ class MainWindow(QMainWindow):
             else:
                 QMessageBox.warning(self, "错误", "无法加载该图片作为背景。")
 
+    def import_translation_memory(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "导入翻译记忆", "", "JSON Lines (*.jsonl);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            imported_count = self.image_processor.import_translation_memory(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "错误", f"导入翻译记忆失败: {e}")
+            return
+        if imported_count is None:
+            QMessageBox.warning(self, "提示", "翻译记忆未启用。")
+        else:
+            QMessageBox.information(
+                self, "完成", f"已导入 {imported_count} 条翻译记忆。"
+            )
+
+    def export_translation_memory(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出翻译记忆",
+            "translation_memory.jsonl",
+            "JSON Lines (*.jsonl);;All Files (*)",
+        )
+        if not file_path:
+            return
+        try:
+            exported_count = self.image_processor.export_translation_memory(file_path)
+        except OSError as e:
+            QMessageBox.warning(self, "错误", f"导出翻译记忆失败: {e}")
+            return
+        if exported_count is None:
+            QMessageBox.warning(self, "提示", "翻译记忆未启用。")
+        else:
+            QMessageBox.information(
+                self, "完成", f"已导出 {exported_count} 条翻译记忆。"
+            )
+
     def _apply_window_background(self, pixmap: QPixmap):
         scaled_pixmap = pixmap.scaled(
             self.size(),
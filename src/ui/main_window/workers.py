@@ -1,13 +1,11 @@
-import os
 import time
 import threading
 from PyQt6.QtCore import QThread, pyqtSignal, QTimer, QObject
 from core.config import ConfigManager
-from core.processor import ImageProcessor
-from utils.image import draw_processed_blocks_pil
-
-if draw_processed_blocks_pil:
-    from PIL import Image
+from core.processor import ImageProcessor, fill_block_display_defaults
+from core.async_pipeline import AsyncBatchPipeline
+from core.pipeline import BatchPipeline, PageJob
+from utils.tracing import TRACE_FORMATS, Tracer, get_default_trace_dir
 
 
 class SmoothProgressEmitter(QObject):
@@ -46,6 +44,7 @@ class TranslationWorker(QThread):
     progress_bar_only_signal = pyqtSignal(int)
     status_text_only_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(object, object, str, str)
+    partial_blocks_signal = pyqtSignal(object)
 
     def __init__(self, image_processor: ImageProcessor, image_path: str, parent=None):
         super().__init__(parent)
@@ -73,38 +72,39 @@ class TranslationWorker(QThread):
                     raise InterruptedError("处理已取消")
                 self.status_text_only_signal.emit(message)
 
-            result_tuple = self.image_processor.process_image(
+            partial_blocks = []
+
+            def _partial_block_received(block):
+                if self.cancellation_event.is_set():
+                    return
+                fill_block_display_defaults(block)
+                partial_blocks.append(block)
+                self.partial_blocks_signal.emit(list(partial_blocks))
+
+            result = self.image_processor.process_image_request(
                 self.image_path,
                 progress_callback=_progress_update,
                 cancellation_event=self.cancellation_event,
+                block_callback=_partial_block_received,
             )
-            if self.cancellation_event.is_set():
+            if result.cancelled or self.cancellation_event.is_set():
                 self.finished_signal.emit(None, None, self.image_path, "处理已取消。")
-            elif result_tuple:
-                original_img, blocks = result_tuple
+            elif result.succeeded:
+                original_img, blocks = result.image, result.blocks
                 for block in blocks:
-                    if not hasattr(block, "main_color"):
-                        block.main_color = None
-                    if not hasattr(block, "outline_color"):
-                        block.outline_color = None
-                    if not hasattr(block, "background_color"):
-                        block.background_color = None
-                    if not hasattr(block, "outline_thickness"):
-                        block.outline_thickness = None
-                    if not hasattr(block, "shape_type"):
-                        block.shape_type = "box"
+                    fill_block_display_defaults(block)
                 self.finished_signal.emit(
                     original_img,
                     blocks,
                     self.image_path,
-                    self.image_processor.get_last_error(),
+                    result.error or result.partial_error,
                 )
             else:
                 self.finished_signal.emit(
                     None,
                     None,
                     self.image_path,
-                    self.image_processor.get_last_error() or "图片处理失败",
+                    result.error or "图片处理失败",
                 )
         except InterruptedError:
             self.finished_signal.emit(None, None, self.image_path, "处理已取消。")
@@ -115,6 +115,8 @@ class TranslationWorker(QThread):
             self.finished_signal.emit(
                 None, None, self.image_path, f"工作线程意外错误: {e}"
             )
+        finally:
+            self.image_processor.save_caches()
 
     def cancel(self):
         self.cancellation_event.set()
@@ -124,6 +126,7 @@ class BatchTranslationWorker(QThread):
     overall_progress_signal = pyqtSignal(int, str)
     file_completed_signal = pyqtSignal(str, str, bool)
     batch_finished_signal = pyqtSignal(int, int, float, bool)
+    pipeline_stats_signal = pyqtSignal(object)
 
     def __init__(
         self,
@@ -139,111 +142,158 @@ class BatchTranslationWorker(QThread):
         self.file_paths = file_paths
         self.output_dir = output_dir
         self.cancellation_event = threading.Event()
+        self._counter_lock = threading.Lock()
+        self._processed_count = 0
+        self._error_count = 0
+
+    def _format_queue_depths(self, pipeline: BatchPipeline) -> str:
+        return " ".join(
+            f"{name}:{stats['queued']}+{stats['active']}"
+            for name, stats in pipeline.get_stage_stats().items()
+        )
+
+    def _export_trace(self, tracer: Tracer) -> list[str]:
+        trace_dir = (
+            self.config_manager.get("Tracing", "trace_dir", fallback="").strip()
+            or get_default_trace_dir()
+        )
+        trace_format = self.config_manager.get(
+            "Tracing", "format", fallback="chrome"
+        ).lower()
+        if trace_format not in TRACE_FORMATS:
+            trace_format = "chrome"
+        try:
+            written_paths = tracer.export(trace_dir, trace_format)
+        except OSError as e:
+            print(f"警告: 写入批处理追踪文件失败: {e}")
+            return []
+        return written_paths
+
+    def _on_page_done(self, job: PageJob):
+        if job.result.cancelled and not job.success:
+            return
+        with self._counter_lock:
+            if job.success:
+                self._processed_count += 1
+            else:
+                self._error_count += 1
+        self.file_completed_signal.emit(job.image_path, job.message, job.success)
 
     def run(self):
-        processed_count = 0
-        error_count = 0
         start_batch_time = time.time()
         total_files = len(self.file_paths)
-        cancelled_early = False
         if total_files == 0:
             self.batch_finished_signal.emit(0, 0, 0, False)
             return
-        for i, file_path in enumerate(self.file_paths):
-            if self.cancellation_event.is_set():
-                cancelled_early = True
-                break
-            current_file_basename = os.path.basename(file_path)
+        cache_stats_before = self.image_processor.get_cache_stats()
+        near_duplicate_stats_before = self.image_processor.get_near_duplicate_stats()
+        rate_limit_stats_before = self.image_processor.get_rate_limit_stats()
+        hedge_stats_before = self.image_processor.get_hedge_stats()
+        routing_stats_before = self.image_processor.get_routing_stats()
+        packing_stats_before = self.image_processor.get_packing_stats()
+        translation_memory_stats_before = (
+            self.image_processor.get_translation_memory_stats()
+        )
+        tracer = (
+            Tracer("batch")
+            if self.config_manager.getboolean("Tracing", "enabled", fallback=False)
+            else None
+        )
+        pipeline_class = (
+            AsyncBatchPipeline
+            if self.config_manager.getboolean("Batch", "async_enabled", fallback=False)
+            else BatchPipeline
+        )
+        pipeline = pipeline_class(
+            self.image_processor,
+            self.config_manager,
+            self.output_dir,
+            cancellation_event=self.cancellation_event,
+            on_page_done=self._on_page_done,
+            tracer=tracer,
+        )
+        pipeline.start(self.file_paths)
+        while not pipeline.wait(0.5):
+            with self._counter_lock:
+                completed = self._processed_count + self._error_count
+            self.pipeline_stats_signal.emit(pipeline.get_stage_stats())
+            status_prefix = (
+                "正在取消，等待进行中的页面结束"
+                if self.cancellation_event.is_set()
+                else "处理中"
+            )
             self.overall_progress_signal.emit(
-                int((i / total_files) * 100),
-                f"处理中: {current_file_basename} ({i+1}/{total_files})",
+                int((completed / total_files) * 100),
+                f"{status_prefix}: {completed}/{total_files} | 队列 {self._format_queue_depths(pipeline)}",
             )
-            try:
-                result_tuple = self.image_processor.process_image(
-                    file_path,
-                    progress_callback=None,
-                    cancellation_event=self.cancellation_event,
-                )
-            except InterruptedError:
-                cancelled_early = True
-                break
-            except Exception as proc_e:
-                self.file_completed_signal.emit(
-                    file_path, f"处理时发生意外错误 {proc_e}", False
-                )
-                error_count += 1
-                continue
-            if self.cancellation_event.is_set():
-                cancelled_early = True
-                break
-            if result_tuple:
-                original_pil, blocks = result_tuple
-                last_proc_error = self.image_processor.get_last_error()
-                for block in blocks:
-                    if not hasattr(block, "main_color"):
-                        block.main_color = None
-                    if not hasattr(block, "outline_color"):
-                        block.outline_color = None
-                    if not hasattr(block, "background_color"):
-                        block.background_color = None
-                    if not hasattr(block, "outline_thickness"):
-                        block.outline_thickness = None
-                    if not hasattr(block, "shape_type"):
-                        block.shape_type = "box"
-                final_drawn_pil_image = draw_processed_blocks_pil(
-                    original_pil, blocks, self.config_manager
-                )
-                if final_drawn_pil_image:
-                    base, ext = os.path.splitext(current_file_basename)
-                    output_filename = f"{base}_translated{ext if ext.lower() in ['.png', '.jpg', '.jpeg', '.bmp'] else '.png'}"
-                    output_path = os.path.join(self.output_dir, output_filename)
-                    try:
-                        save_format = "PNG"
-                        if output_filename.lower().endswith((".jpg", ".jpeg")):
-                            save_format = "JPEG"
-                        elif output_filename.lower().endswith(".bmp"):
-                            save_format = "BMP"
-                        if (
-                            save_format == "JPEG"
-                            and final_drawn_pil_image.mode == "RGBA"
-                        ):
-                            bg = Image.new(
-                                "RGB", final_drawn_pil_image.size, (255, 255, 255)
-                            )
-                            bg.paste(
-                                final_drawn_pil_image,
-                                mask=final_drawn_pil_image.split()[3],
-                            )
-                            bg.save(output_path, save_format, quality=95)
-                        else:
-                            final_drawn_pil_image.save(output_path, save_format)
-                        self.file_completed_signal.emit(file_path, output_path, True)
-                        processed_count += 1
-                    except Exception as e:
-                        self.file_completed_signal.emit(
-                            file_path, f"保存失败 {output_path}: {e}", False
-                        )
-                        error_count += 1
-                else:
-                    err_msg = f"绘制文本块失败: {current_file_basename}" + (
-                        f" (原始处理错误: {last_proc_error})" if last_proc_error else ""
-                    )
-                    self.file_completed_signal.emit(file_path, err_msg, False)
-                    error_count += 1
-            else:
-                self.file_completed_signal.emit(
-                    file_path,
-                    self.image_processor.get_last_error()
-                    or f"处理失败: {current_file_basename}",
-                    False,
-                )
-                error_count += 1
+        cancelled_early = self.cancellation_event.is_set()
+        processed_count = self._processed_count
+        error_count = self._error_count
         duration = time.time() - start_batch_time
         total_attempted = processed_count + error_count
         final_progress = (
             int(((total_attempted) / total_files) * 100) if total_files > 0 else 100
         )
         status_msg = "批量处理已取消。" if cancelled_early else "批量处理完成。"
+        cache_stats_after = self.image_processor.get_cache_stats()
+        if cache_stats_before and cache_stats_after:
+            status_msg += (
+                f" 缓存命中 {cache_stats_after['hits'] - cache_stats_before['hits']}，"
+                f"未命中 {cache_stats_after['misses'] - cache_stats_before['misses']}。"
+            )
+        near_duplicate_stats_after = self.image_processor.get_near_duplicate_stats()
+        if near_duplicate_stats_before and near_duplicate_stats_after:
+            status_msg += f" 近似重复页面复用 {near_duplicate_stats_after['calls_avoided'] - near_duplicate_stats_before['calls_avoided']} 次。"
+        retries, throttled_seconds = 0, 0.0
+        for name, stats in self.image_processor.get_rate_limit_stats().items():
+            stats_before = rate_limit_stats_before.get(name, {})
+            retries += stats["retries"] - stats_before.get("retries", 0)
+            throttled_seconds += stats["throttled_seconds"] - stats_before.get(
+                "throttled_seconds", 0.0
+            )
+        if retries or throttled_seconds >= 0.1:
+            status_msg += f" 重试 {retries} 次，限流等待 {throttled_seconds:.1f} 秒。"
+        hedges_sent, hedges_won = 0, 0
+        for name, stats in self.image_processor.get_hedge_stats().items():
+            stats_before = hedge_stats_before.get(name, {})
+            hedges_sent += stats["hedges_sent"] - stats_before.get("hedges_sent", 0)
+            hedges_won += stats["hedges_won"] - stats_before.get("hedges_won", 0)
+        if hedges_sent:
+            status_msg += f" 对冲请求 {hedges_sent} 次，其中 {hedges_won} 次先于原请求返回。"
+        packed_requests, pages_packed = 0, 0
+        for name, stats in self.image_processor.get_packing_stats().items():
+            stats_before = packing_stats_before.get(name, {})
+            packed_requests += stats["packed_requests"] - stats_before.get(
+                "packed_requests", 0
+            )
+            pages_packed += stats["pages_packed"] - stats_before.get("pages_packed", 0)
+        if packed_requests:
+            status_msg += f" 多页打包 {packed_requests} 次请求，共 {pages_packed} 页。"
+        routing_stats_after = self.image_processor.get_routing_stats()
+        if routing_stats_after:
+            failovers = routing_stats_after["failovers"] - (
+                routing_stats_before["failovers"] if routing_stats_before else 0
+            )
+            if failovers:
+                status_msg += f" 端点故障转移 {failovers} 次。"
+        translation_memory_stats_after = (
+            self.image_processor.get_translation_memory_stats()
+        )
+        if translation_memory_stats_before and translation_memory_stats_after:
+            memory_hits = (
+                translation_memory_stats_after["exact_hits"]
+                - translation_memory_stats_before["exact_hits"]
+            )
+            if memory_hits:
+                status_msg += f" 翻译记忆命中 {memory_hits} 个文本块。"
+        if tracer:
+            stage_summary = tracer.format_stage_summary()
+            if stage_summary:
+                status_msg += f" 阶段耗时: {stage_summary}。"
+            written_paths = self._export_trace(tracer)
+            if written_paths:
+                print(f"批处理追踪文件已保存: {', '.join(written_paths)}")
+        self.image_processor.save_caches()
         self.overall_progress_signal.emit(final_progress, status_msg)
         self.batch_finished_signal.emit(
             processed_count, error_count, duration, cancelled_early
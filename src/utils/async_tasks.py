@@ -0,0 +1,262 @@
+"""
+asyncio 辅助函数
+批处理仍使用 threading.Event 作为取消信号，这里把它桥接到事件循环中，由协程等待而不是轮询。
+同步代码通过共享的后台事件循环执行协程，使在途请求可以经由 AbortHandle 取消。
+"""
+
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from utils.cancellation import (
+    AbortHandle,
+    RequestAborted,
+    cancellation_callback,
+    get_current_abort_handle,
+    unwatch_abort_handle,
+    watch_abort_handle,
+)
+
+_STREAM_END = object()
+
+
+class _CancellationBridge:
+    """
+    把一个 threading.Event 桥接为某个事件循环中的 asyncio.Event。
+    同一 (事件循环, 取消信号) 只建立一个桥，由共享的看门狗线程监视取消信号，
+    设置后通过 call_soon_threadsafe 唤醒事件循环；在途协程不再各自轮询。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, cancellation_event):
+        self.loop = loop
+        self.cancelled = asyncio.Event()
+        self.users = 0
+        self.handle = AbortHandle(cancellation_event)
+        self.handle.add_abort_callback(self, self._notify_loop)
+        watch_abort_handle(self.handle)
+
+    def _notify_loop(self):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.cancelled.set)
+
+    def close(self):
+        unwatch_abort_handle(self.handle)
+
+
+_cancellation_bridges: dict[tuple, _CancellationBridge] = {}
+
+
+@contextmanager
+def bridge_cancellation(cancellation_event: threading.Event | None):
+    """
+    在当前事件循环中获取 cancellation_event 对应的 asyncio.Event（None 时为 None）。
+    AsyncBatchPipeline 在整个批次期间持有桥，批次内的等待复用同一个桥。
+    """
+    if cancellation_event is None:
+        yield None
+        return
+    bridge_key = (asyncio.get_running_loop(), cancellation_event)
+    bridge = _cancellation_bridges.get(bridge_key)
+    if bridge is None:
+        bridge = _CancellationBridge(bridge_key[0], cancellation_event)
+        _cancellation_bridges[bridge_key] = bridge
+    bridge.users += 1
+    try:
+        yield bridge.cancelled
+    finally:
+        bridge.users -= 1
+        if bridge.users == 0:
+            del _cancellation_bridges[bridge_key]
+            bridge.close()
+
+
+async def wait_cancellable(
+    awaitable,
+    cancellation_event: threading.Event | None,
+    deadline: float | None = None,
+):
+    """
+    等待 awaitable 完成；cancellation_event 被设置或超过 deadline（time.monotonic() 时间）时
+    中止该任务，底层连接随任务取消立即关闭。截止时间由事件循环的定时器执行，不轮询。
+    Returns:
+        (是否完成, 结果)；被取消或超时时返回 (False, None)
+    """
+    task = asyncio.ensure_future(awaitable)
+    if cancellation_event is None and deadline is None:
+        return True, await task
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    with bridge_cancellation(cancellation_event) as cancelled:
+        waiters = {task}
+        cancel_waiter = None
+        if cancelled is not None:
+            if cancelled.is_set() or cancellation_event.is_set():
+                waiters = set()
+            else:
+                cancel_waiter = asyncio.ensure_future(cancelled.wait())
+                waiters.add(cancel_waiter)
+        try:
+            if waiters:
+                await asyncio.wait(
+                    waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            if cancel_waiter is not None:
+                cancel_waiter.cancel()
+    if task.done() and not task.cancelled():
+        return True, task.result()
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    return False, None
+
+
+class CompletionEvent:
+    """
+    可在任意线程设置的完成信号。
+    同步等待者阻塞在 wait() 上，协程等待者通过 wait_async() 等待；
+    两者都可以传入 cancellation_event，取消由看门狗线程唤醒，不轮询。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = False
+        self._callbacks: list = []
+
+    def is_set(self) -> bool:
+        return self._done
+
+    def add_done_callback(self, callback):
+        """设置时调用 callback()（在调用 set 的线程中）；已设置时立即调用"""
+        with self._lock:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def wait(
+        self,
+        cancellation_event: threading.Event | None = None,
+        timeout: float | None = None,
+    ) -> bool:
+        """返回是否已完成；被取消或超时时返回 False"""
+        wakeup = threading.Event()
+        self.add_done_callback(wakeup.set)
+        with cancellation_callback(cancellation_event, wakeup.set):
+            if cancellation_event is None or not cancellation_event.is_set():
+                wakeup.wait(timeout)
+        return self._done
+
+    async def wait_async(
+        self,
+        cancellation_event: threading.Event | None = None,
+        deadline: float | None = None,
+    ) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.add_done_callback(
+            lambda: _call_soon_threadsafe(loop, _resolve_future, future)
+        )
+        completed, _ = await wait_cancellable(future, cancellation_event, deadline)
+        return completed and self._done
+
+
+def _call_soon_threadsafe(loop: asyncio.AbstractEventLoop, callback, *args):
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass
+
+
+def _resolve_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class BackgroundEventLoop:
+    """在守护线程中运行的事件循环，首次提交协程时启动"""
+
+    def __init__(self, name: str = "BackgroundEventLoop"):
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name=self.name, daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop())
+
+
+_background_loop = BackgroundEventLoop()
+
+
+def _get_future_result(future: concurrent.futures.Future, handle):
+    try:
+        return future.result()
+    except concurrent.futures.CancelledError as e:
+        raise RequestAborted(handle.reason if handle else None) from e
+
+
+def run_coroutine_abortable(coroutine):
+    """
+    在共享后台事件循环中执行协程并阻塞等待结果。
+    当前线程的 AbortHandle 中止时取消该任务（底层连接随任务取消关闭）并抛出 RequestAborted。
+    """
+    future = _background_loop.submit(coroutine)
+    handle = get_current_abort_handle()
+    if handle is None:
+        return future.result()
+    handle.add_abort_callback(future, future.cancel)
+    try:
+        return _get_future_result(future, handle)
+    finally:
+        handle.remove_abort_callback(future)
+
+
+def iter_async_abortable(async_iterable):
+    """
+    在共享后台事件循环中迭代异步迭代器，逐项产出给同步调用方，每项到达后立即可用。
+    提前结束迭代或 AbortHandle 中止时取消后台任务；中止时抛出 RequestAborted。
+    """
+    items = queue.SimpleQueue()
+
+    async def _pump():
+        async for item in async_iterable:
+            items.put(item)
+
+    future = _background_loop.submit(_pump())
+    future.add_done_callback(lambda _: items.put(_STREAM_END))
+    handle = get_current_abort_handle()
+    if handle is not None:
+        handle.add_abort_callback(future, future.cancel)
+    try:
+        while True:
+            item = items.get()
+            if item is _STREAM_END:
+                break
+            yield item
+        _get_future_result(future, handle)
+    finally:
+        future.cancel()
+        if handle is not None:
+            handle.remove_abort_callback(future)
@@ -0,0 +1,241 @@
+"""
+可中止的阻塞请求
+同步 Provider 的网络请求在 requests/httpx/google-genai 内部阻塞，取消信号要等到请求返回才会被检查。
+调用方在发起请求前进入 abort_scope(handle)，发起请求的代码把"中止在途请求"的回调
+（关闭套接字、取消后台任务）登记到当前线程的 AbortHandle 上；
+一个共享的看门狗线程监视所有在途句柄的取消信号与截止时间，触发时调用这些回调，
+阻塞中的请求随之抛出异常，调用线程立即返回，连接不会在后台继续占用。
+"""
+
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+WATCHDOG_POLL_INTERVAL = 0.05
+ABORT_CANCELLED = "cancelled"
+ABORT_DEADLINE = "deadline"
+
+
+class RequestAborted(Exception):
+    """在途请求被 AbortHandle 中止"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        if reason == ABORT_DEADLINE:
+            super().__init__("请求超出本页截止时间，已中止")
+        else:
+            super().__init__("请求已取消")
+
+
+class AbortHandle:
+    """一次请求尝试的中止句柄；回调可能被多次调用，必须是幂等的"""
+
+    def __init__(
+        self,
+        cancellation_event: threading.Event | None = None,
+        deadline: float | None = None,
+    ):
+        self.cancellation_event = cancellation_event
+        self.deadline = deadline
+        self.reason: str | None = None
+        self._callbacks: dict = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def aborted(self) -> bool:
+        return self.reason is not None
+
+    def check(self, now: float) -> bool:
+        """取消信号已设置或超过截止时间时记录中止原因并返回 True"""
+        if self.reason is None:
+            if self.cancellation_event is not None and self.cancellation_event.is_set():
+                self.reason = ABORT_CANCELLED
+            elif self.deadline is not None and now > self.deadline:
+                self.reason = ABORT_DEADLINE
+        return self.reason is not None
+
+    def add_abort_callback(self, key, callback):
+        """登记中止回调，key 用于之后移除；句柄已中止时立即调用"""
+        with self._lock:
+            if self._closed:
+                return
+            self._callbacks[key] = callback
+            if self.reason is not None:
+                _invoke_abort_callback(callback)
+
+    def remove_abort_callback(self, key):
+        """移除回调；返回后该回调不会再被调用（例如连接已归还连接池）"""
+        with self._lock:
+            self._callbacks.pop(key, None)
+
+    def abort(self, reason: str = ABORT_CANCELLED):
+        with self._lock:
+            if self._closed:
+                return
+            if self.reason is None:
+                self.reason = reason
+            for callback in list(self._callbacks.values()):
+                _invoke_abort_callback(callback)
+
+    def close(self):
+        """请求尝试结束后调用，之后不再触发任何回调"""
+        with self._lock:
+            self._closed = True
+            self._callbacks.clear()
+
+    def raise_if_aborted(self):
+        if self.reason is not None:
+            raise RequestAborted(self.reason)
+
+
+def _invoke_abort_callback(callback):
+    try:
+        callback()
+    except Exception as e:
+        print(f"警告: 中止在途请求时出错: {e}")
+
+
+def shutdown_socket(sock):
+    """
+    从其他线程唤醒阻塞在该套接字上的读写。
+    只 shutdown 不 close，文件描述符由持有连接的线程在异常处理中关闭；
+    对 SSLSocket 调用基类方法，避免在读线程使用期间改动 SSL 对象。
+    """
+    if sock is None:
+        return
+    try:
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class RequestWatchdog:
+    """
+    单个后台线程监视所有在途句柄。
+    有句柄带取消信号时每 poll_interval 秒检查一次，否则睡眠到最近的截止时间。
+    已中止但尚未结束的句柄在每次检查时重新调用回调，覆盖"回调登记时连接尚未建立"的情况。
+    """
+
+    def __init__(self, poll_interval: float = WATCHDOG_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._handles: set[AbortHandle] = set()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self.aborted_calls = 0
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._watch_loop, name="RequestWatchdog", daemon=True
+            )
+            self._thread.start()
+
+    def _next_wait(self, handles: list[AbortHandle], now: float) -> float | None:
+        wait_time = None
+        for handle in handles:
+            if handle.cancellation_event is not None or handle.aborted:
+                return self.poll_interval
+            if handle.deadline is not None:
+                remaining = max(0.0, handle.deadline - now) + 0.001
+                wait_time = remaining if wait_time is None else min(wait_time, remaining)
+        return wait_time
+
+    def _watch_loop(self):
+        while True:
+            with self._condition:
+                while not self._handles:
+                    self._condition.wait()
+                handles = list(self._handles)
+                now = time.monotonic()
+                self._condition.wait(self._next_wait(handles, now))
+                handles = list(self._handles)
+            now = time.monotonic()
+            for handle in handles:
+                was_aborted = handle.aborted
+                if handle.check(now):
+                    if not was_aborted:
+                        with self._condition:
+                            self.aborted_calls += 1
+                    handle.abort(handle.reason)
+
+    def register(self, handle: AbortHandle):
+        with self._condition:
+            self._handles.add(handle)
+            self._ensure_started()
+            self._condition.notify()
+
+    def unregister(self, handle: AbortHandle):
+        handle.close()
+        with self._condition:
+            self._handles.discard(handle)
+
+
+_request_watchdog = RequestWatchdog()
+_current = threading.local()
+
+
+def get_current_abort_handle() -> AbortHandle | None:
+    """返回当前线程正在执行的请求尝试的中止句柄"""
+    return getattr(_current, "handle", None)
+
+
+@contextmanager
+def abort_scope(handle: AbortHandle):
+    """
+    在 with 块内把 handle 设为当前线程的中止句柄并交给看门狗监视。
+    进入时已取消或已超时则直接抛出 RequestAborted。
+    """
+    if handle.check(time.monotonic()):
+        handle.raise_if_aborted()
+    if handle.cancellation_event is None and handle.deadline is None:
+        yield handle
+        return
+    previous = get_current_abort_handle()
+    _current.handle = handle
+    _request_watchdog.register(handle)
+    try:
+        yield handle
+    finally:
+        _request_watchdog.unregister(handle)
+        _current.handle = previous
+
+
+def watch_abort_handle(handle: AbortHandle):
+    """让看门狗监视 handle，直到调用 unwatch_abort_handle"""
+    _request_watchdog.register(handle)
+
+
+def unwatch_abort_handle(handle: AbortHandle):
+    _request_watchdog.unregister(handle)
+
+
+@contextmanager
+def cancellation_callback(cancellation_event: threading.Event | None, callback):
+    """
+    with 块内 cancellation_event 被设置时由看门狗线程调用 callback，等待方无需自行轮询。
+    callback 可能被多次调用，必须是幂等的。
+    """
+    if cancellation_event is None:
+        yield
+        return
+    handle = AbortHandle(cancellation_event)
+    handle.add_abort_callback(callback, callback)
+    watch_abort_handle(handle)
+    try:
+        yield
+    finally:
+        unwatch_abort_handle(handle)
+
+
+def get_abort_error(error: Exception) -> Exception:
+    """当前请求已被中止时返回说明原因的 RequestAborted，否则原样返回 error"""
+    handle = get_current_abort_handle()
+    if handle is not None and handle.aborted and not isinstance(error, RequestAborted):
+        return RequestAborted(handle.reason)
+    return error
+
+
+def get_aborted_call_count() -> int:
+    return _request_watchdog.aborted_calls
@@ -3,6 +3,7 @@ import math
 from PyQt6.QtGui import QPixmap, QImage, QPainter, QColor, QFontMetrics, QPen, QBrush
 from PyQt6.QtCore import Qt, QRectF, QPointF
 from core.config import ConfigManager
+from core.settings import RenderSettings, get_render_settings
 
 try:
     from PIL import Image, ImageDraw, ImageFont as PILImageFont
@@ -692,39 +693,14 @@ def draw_processed_blocks_pil(
             base_image = pil_image_original.convert("RGBA")
         else:
             base_image = pil_image_original.copy()
-        font_name_conf = config_manager.get("UI", "font_name", "msyh.ttc")
-        text_pad_conf = config_manager.getint("UI", "text_padding", 3)
-        main_color_str = config_manager.get("UI", "text_main_color", "255,255,255,255")
-        outline_color_str = config_manager.get("UI", "text_outline_color", "0,0,0,255")
-        outline_thick_conf_default = config_manager.getint(
-            "UI", "text_outline_thickness", 2
+        render_settings = (
+            config_manager
+            if isinstance(config_manager, RenderSettings)
+            else get_render_settings(config_manager)
         )
-        bg_color_str = config_manager.get("UI", "text_background_color", "0,0,0,128")
-        h_char_spacing_conf = config_manager.getint("UI", "h_text_char_spacing_px", 0)
-        h_line_spacing_conf = config_manager.getint("UI", "h_text_line_spacing_px", 0)
-        v_char_spacing_conf = config_manager.getint("UI", "v_text_char_spacing_px", 0)
-        v_col_spacing_conf = config_manager.getint("UI", "v_text_column_spacing_px", 0)
-        h_manual_break_extra_conf = config_manager.getint(
-            "UI", "h_manual_break_extra_spacing_px", 0
-        )
-        v_manual_break_extra_conf = config_manager.getint(
-            "UI", "v_manual_break_extra_spacing_px", 0
-        )
-
-        def _parse_color(color_string, default_rgba):
-            try:
-                parts = list(map(int, color_string.split(",")))
-                if len(parts) == 3:
-                    return tuple(parts) + (255,)
-                if len(parts) == 4:
-                    return tuple(parts)
-            except:
-                pass
-            return default_rgba
-
-        default_main_color_pil = _parse_color(main_color_str, (255, 255, 255, 255))
-        default_outline_color_pil = _parse_color(outline_color_str, (0, 0, 0, 255))
-        default_bg_color_pil = _parse_color(bg_color_str, (0, 0, 0, 128))
+        default_main_color_pil = render_settings.text_main_color
+        default_outline_color_pil = render_settings.text_outline_color
+        default_bg_color_pil = render_settings.text_background_color
         for idx, block_item in enumerate(processed_blocks):
             if (
                 not hasattr(block_item, "translated_text")
@@ -771,7 +747,7 @@ def draw_processed_blocks_pil(
                     and len(block_item.background_color) == 4
                 ):
                     bg_color_to_use = block_item.background_color
-            thickness_to_use = outline_thick_conf_default
+            thickness_to_use = render_settings.text_outline_thickness
             if (
                 hasattr(block_item, "outline_thickness")
                 and block_item.outline_thickness is not None
@@ -784,18 +760,18 @@ def draw_processed_blocks_pil(
             _draw_single_block_pil(
                 draw_target_image=base_image,
                 block=block_item,
-                font_name_config=font_name_conf,
+                font_name_config=render_settings.font_name,
                 text_main_color_pil=main_color_to_use,
                 text_outline_color_pil=outline_color_to_use,
                 text_bg_color_pil=bg_color_to_use,
                 outline_thickness=thickness_to_use,
-                text_padding=text_pad_conf,
-                h_char_spacing_px=h_char_spacing_conf,
-                h_line_spacing_px=h_line_spacing_conf,
-                v_char_spacing_px=v_char_spacing_conf,
-                v_col_spacing_px=v_col_spacing_conf,
-                h_manual_break_extra_px=h_manual_break_extra_conf,
-                v_manual_break_extra_px=v_manual_break_extra_conf,
+                text_padding=render_settings.text_padding,
+                h_char_spacing_px=render_settings.h_char_spacing_px,
+                h_line_spacing_px=render_settings.h_line_spacing_px,
+                v_char_spacing_px=render_settings.v_char_spacing_px,
+                v_col_spacing_px=render_settings.v_col_spacing_px,
+                h_manual_break_extra_px=render_settings.h_manual_break_extra_px,
+                v_manual_break_extra_px=render_settings.v_manual_break_extra_px,
             )
         return base_image
     except Exception as e:
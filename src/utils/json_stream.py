@@ -0,0 +1,111 @@
+"""
+增量 JSON 数组解析
+流式响应逐段到达时，找到第一个 JSON 数组（顶层数组，或 {"blocks": [...]} 这类对象中的数组），
+每当其中一个元素对象闭合就立即解析并返回，不必等待整个响应结束。
+Markdown 代码块标记等数组之外的字符会被忽略。
+"""
+
+import json
+
+
+class IncrementalJsonArrayParser:
+    def __init__(self):
+        self._depth = 0
+        self._array_depth: int | None = None
+        self._in_string = False
+        self._escaped = False
+        self._object_chars: list[str] = []
+        self._collecting = False
+        self.array_closed = False
+        self.items_parsed = 0
+        self.parse_errors = 0
+
+    def feed(self, text: str) -> list[dict]:
+        """输入新到达的文本片段，返回其中新闭合的数组元素（dict）"""
+        completed_items = []
+        for char in text:
+            if self.array_closed:
+                break
+            if self._collecting:
+                self._object_chars.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+                if char == "[" and self._array_depth is None:
+                    self._array_depth = self._depth
+                elif (
+                    char == "{"
+                    and self._array_depth is not None
+                    and self._depth == self._array_depth + 1
+                ):
+                    self._collecting = True
+                    self._object_chars = ["{"]
+            elif char in "]}":
+                if (
+                    char == "}"
+                    and self._collecting
+                    and self._depth == self._array_depth + 1
+                ):
+                    item = self._parse_collected_object()
+                    if item is not None:
+                        completed_items.append(item)
+                elif char == "]" and self._depth == self._array_depth:
+                    self.array_closed = True
+                self._depth -= 1
+        return completed_items
+
+    def _parse_collected_object(self) -> dict | None:
+        object_text = "".join(self._object_chars)
+        self._collecting = False
+        self._object_chars = []
+        try:
+            item = json.loads(object_text)
+        except ValueError:
+            self.parse_errors += 1
+            return None
+        if not isinstance(item, dict):
+            return None
+        self.items_parsed += 1
+        return item
+
+
+class StreamingBlockCollector:
+    """
+    汇总流式响应文本，并把每个新闭合的文本块经 normalize_block(item, index) 规范化后
+    交给 block_callback。中途出错时 blocks 保留已收到的有效块。
+    """
+
+    def __init__(self, normalize_block, block_callback=None):
+        self.normalize_block = normalize_block
+        self.block_callback = block_callback
+        self.blocks: list[dict] = []
+        self._parser = IncrementalJsonArrayParser()
+        self._text_parts: list[str] = []
+        self._item_count = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text_parts)
+
+    def feed(self, text_chunk: str):
+        if not text_chunk:
+            return
+        self._text_parts.append(text_chunk)
+        for item in self._parser.feed(text_chunk):
+            block = self.normalize_block(item, self._item_count)
+            self._item_count += 1
+            if block is None:
+                continue
+            self.blocks.append(block)
+            if self.block_callback:
+                self.block_callback(dict(block))
+
@@ -0,0 +1,110 @@
+"""
+LLM 图像预处理
+对比度通过 256 项查找表 (Image.point) 实现，不再转换为 float32 数组；
+灰度、缩放、锐化按“先缩小像素数/通道数、后做逐像素运算”的顺序合并执行，
+每一步只保留一个中间图像。所有操作均为空操作时直接返回原图，不做复制。
+"""
+
+try:
+    from PIL import Image, ImageFilter
+
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    Image = None
+    ImageFilter = None
+RESAMPLE_METHODS = ("NEAREST", "BILINEAR", "BICUBIC", "LANCZOS")
+
+
+def get_resample_filter(method_name: str):
+    method_name = (method_name or "LANCZOS").upper()
+    if method_name not in RESAMPLE_METHODS:
+        method_name = "LANCZOS"
+    return getattr(Image.Resampling, method_name)
+
+
+def build_contrast_lut(contrast_factor: float) -> list[int]:
+    """以 128 为中心的线性对比度查找表，结果与原 NumPy 实现一致"""
+    return [
+        int(min(255.0, max(0.0, contrast_factor * (value - 128.0) + 128.0)))
+        for value in range(256)
+    ]
+
+
+def _apply_contrast(pil_image, contrast_factor: float):
+    lut = build_contrast_lut(contrast_factor)
+    if pil_image.mode == "L":
+        return pil_image.point(lut)
+    if pil_image.mode == "RGB":
+        return pil_image.point(lut * 3)
+    if pil_image.mode == "RGBA":
+        return pil_image.point(lut * 3 + list(range(256)))
+    if pil_image.mode == "LA":
+        return pil_image.point(lut + list(range(256)))
+    return pil_image.convert("RGBA").point(lut * 3 + list(range(256)))
+
+
+def _to_grayscale(pil_image):
+    """转换为 L 模式；存在透明区域时先合成到白色背景上"""
+    if pil_image.mode == "L":
+        return pil_image
+    if pil_image.mode in ("RGBA", "LA"):
+        alpha_min, _ = pil_image.getchannel("A").getextrema()
+        if alpha_min < 255:
+            background = Image.new("L", pil_image.size, 255)
+            background.paste(pil_image.convert("L"), mask=pil_image.getchannel("A"))
+            return background
+    return pil_image.convert("L")
+
+
+def preprocess_llm_image(
+    pil_image,
+    scale: float = 1.0,
+    contrast_factor: float = 1.0,
+    grayscale: bool = False,
+    sharpen_amount: float = 0.0,
+    resample_method: str = "LANCZOS",
+):
+    """
+    一次完成灰度、缩放、对比度与锐化。
+    缩小时先缩放再做逐像素运算，放大时先做逐像素运算再缩放，使运算始终作用在较小的图像上。
+    Returns:
+        (处理后的图像, 已执行的操作名称列表)；无操作时返回原图对象本身
+    """
+    applied_ops: list[str] = []
+    needs_resize = abs(scale - 1.0) > 1e-3
+    needs_contrast = abs(contrast_factor - 1.0) > 1e-3
+    needs_sharpen = sharpen_amount > 0.0
+    if not (needs_resize or needs_contrast or needs_sharpen or grayscale):
+        return pil_image, applied_ops
+    image = pil_image
+    if grayscale and image.mode != "L":
+        image = _to_grayscale(image)
+        applied_ops.append("grayscale")
+
+    def _resize(img):
+        new_size = (
+            max(1, int(img.width * scale)),
+            max(1, int(img.height * scale)),
+        )
+        if scale > 1.0:
+            return img.resize(new_size, get_resample_filter(resample_method))
+        return img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    if needs_resize and scale < 1.0:
+        image = _resize(image)
+        applied_ops.append("downscale")
+    if needs_contrast:
+        image = _apply_contrast(image, contrast_factor)
+        applied_ops.append("contrast")
+    if needs_sharpen:
+        image = image.filter(
+            ImageFilter.UnsharpMask(
+                radius=2, percent=int(sharpen_amount * 100), threshold=3
+            )
+        )
+        applied_ops.append("sharpen")
+    if needs_resize and scale > 1.0:
+        image = _resize(image)
+        applied_ops.append("upscale")
+    return image, applied_ops
@@ -1,3 +1,35 @@
+def build_ocr_glossary_section(config_manager) -> str:
+    """
+    根据配置中的术语表生成插入 OCR/翻译 Prompt 的术语表段落。
+    Returns:
+        术语表段落，未配置术语表时返回空字符串
+    """
+    raw_glossary_text = config_manager.get(
+        "GeminiAPI", "glossary_text", fallback=""
+    ).strip()
+    if not raw_glossary_text:
+        return ""
+    glossary_lines = [
+        line.strip()
+        for line in raw_glossary_text.splitlines()
+        if line.strip() and "->" in line.strip()
+    ]
+    if not glossary_lines:
+        return ""
+    actual_glossary_content = "\n".join(glossary_lines)
+    return f"""
+IMPORTANT: When translating, strictly adhere to the following glossary (source_term->target_term format). Apply these translations wherever applicable:
+<glossary>
+{actual_glossary_content}
+</glossary>
+"""
+
+
+def is_two_stage_enabled(config_manager) -> bool:
+    """两阶段模式：视觉请求只做 OCR，翻译由文本翻译 Provider 单独完成"""
+    return config_manager.getboolean("TwoStage", "enabled", fallback=False)
+
+
 def get_gemini_ocr_translation_prompt(
     source_language: str,
     target_language: str,
@@ -131,3 +163,100 @@ def get_gemini_ocr_translation_prompt(
     </step>
 </instructions>
 """
+
+
+def get_ocr_only_prompt(source_language: str) -> str:
+    """
+    两阶段模式第一步使用的 Prompt：只定位并提取文本，不翻译。
+    结果与目标语言、术语表无关，可以按图片缓存，更换语言或术语表时只需重新执行文本翻译。
+    """
+    return f"""
+<system_role>
+你是一位精通计算机视觉（Computer Vision）和 OCR（光学字符识别）的专家级AI助手。
+你的核心能力是**像素级精度的文本定位**和**准确的文本提取**。
+你的任务是分析图像，精确定位{source_language}文本并提取内容。不要翻译。
+</system_role>
+<instructions>
+    <step index="1">
+        <description>{source_language}文本块识别与提取</description>
+        <condition type="comic" description="漫画/卡通页面">
+            <rule>优先处理对话气泡、对话框、思想泡泡和叙事框内的{source_language}文本。</rule>
+            <rule>如果视觉上突出且是叙事的一部分，则提取清晰可辨的{source_language}拟声词。</rule>
+            <rule>通常，忽略复杂背景、微小辅助细节或装饰性元素中的{source_language}文本。</rule>
+        </condition>
+        <condition type="general" description="普通图像">
+            <rule>识别所有包含重要{source_language}文本的独立视觉文本块。</rule>
+            <rule>忽略非常小、不清晰或孤立的、不传达重要意义的{source_language}文本片段。</rule>
+        </condition>
+    </step>
+    <step index="2">
+        <description>处理每一个识别出的{source_language}文本块</description>
+        <requirements>
+            <field name="original_text">
+                <instruction>提取完整、准确的{source_language}文本。</instruction>
+            </field>
+            <field name="orientation">
+                <instruction>判断其主要方向："horizontal" (水平), "vertical_ltr" (从左到右垂直), 或 "vertical_rtl" (从右到左垂直)。</instruction>
+            </field>
+            <field name="bounding_box">
+                <importance>EXTREME</importance>
+                <goal>提供一个**紧贴文本像素**的边界框。</goal>
+                <format>[y_min, x_min, y_max, x_max]</format>
+                <coordinate_system>0到1000之间的整数归一化坐标。(0,0)是左上角，(1000,1000)是右下角。</coordinate_system>
+                <strict_constraints>
+                    <constraint>1. **紧凑性 (Tightness)**: 边界框必须紧紧包裹文字本身，严禁包含文字周围的空白区域。</constraint>
+                    <constraint>2. **排除干扰**: 严禁包含对话气泡的边框、尾巴、背景图案或邻近的物体。</constraint>
+                    <constraint>3. **完整性**: 必须包含文本块中的所有字符，不能切断字符。</constraint>
+                    <constraint>4. **逻辑性**: y_min < y_max 且 x_min < x_max。</constraint>
+                </strict_constraints>
+            </field>
+            <field name="font_size_category">
+                <options>very_small, small, medium, large, very_large</options>
+                <criteria>根据其在图像中相对于其他文本的视觉大小。</criteria>
+            </field>
+        </requirements>
+    </step>
+    <step index="3">
+        <description>输出格式</description>
+        <format>JSON</format>
+        <structure>
+            一个JSON对象列表。每个对象包含以下键：
+            - "original_text": string
+            - "orientation": string
+            - "bounding_box": [int, int, int, int]
+            - "font_size_category": string
+        </structure>
+        <example>
+            [
+                {{
+                    "original_text": "何だ！？",
+                    "orientation": "vertical_rtl",
+                    "bounding_box": [100, 200, 300, 400],
+                    "font_size_category": "medium"
+                }}
+            ]
+        </example>
+    </step>
+    <step index="4">
+        <description>输出约束</description>
+        <rule>如果在图像中未找到符合条件的{source_language}文本块，则返回一个空的JSON列表：[]。</rule>
+        <rule>输出必须仅为原始JSON字符串，不要包含任何解释性文本、注释或markdown格式。</rule>
+    </step>
+</instructions>
+"""
+
+
+def get_multi_image_prompt(base_prompt: str, image_count: int) -> str:
+    """
+    在单图 Prompt 之后追加多图打包说明：每张图片独立处理，坐标相对各自的图片，
+    每个文本块额外包含 image_index。
+    """
+    return f"""{base_prompt}
+<multi_image_input>
+    <rule>本次请求包含 {image_count} 张相互独立的图像，按顺序编号为 0 到 {image_count - 1}，每张图像之前有 "Image i" 的文本标记。</rule>
+    <rule>对每一张图像分别执行以上全部步骤，不要把不同图像的文本合并到同一个文本块中。</rule>
+    <rule>bounding_box 坐标相对于该文本块所在的那一张图像，而不是所有图像拼合后的画面。</rule>
+    <rule>每个文本块对象必须额外包含整数字段 "image_index"，表示它来自哪一张图像。</rule>
+    <rule>把所有图像的文本块放在同一个 JSON 列表中输出。</rule>
+</multi_image_input>
+"""
@@ -0,0 +1,187 @@
+"""
+轻量级阶段耗时追踪
+在各处理阶段与 Provider 调用周围记录结构化的耗时区间 (span)，
+可导出为 Chrome Trace (chrome://tracing / Perfetto) 或 JSON Lines，并按阶段统计 p50/p95。
+追踪器需要显式传入；传入 None 时 trace_span 不做任何事情。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from core.config import CONFIG_FILE
+
+TRACE_FORMATS = ("chrome", "jsonl", "both")
+
+
+def get_default_trace_dir() -> str:
+    return os.path.join(os.path.dirname(CONFIG_FILE) or ".", "traces")
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """线性插值百分位数，sorted_values 需已排序且非空"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+
+
+class Tracer:
+    """线程安全的 span 收集器，时间戳以 time.perf_counter() 为准"""
+
+    def __init__(self, name: str = "batch"):
+        self.name = name
+        self.wall_start = time.time()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._events: list[dict] = []
+        self._thread_names: dict[int, str] = {}
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        category: str = "stage",
+        args: dict | None = None,
+    ):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ts_us": round((start - self._origin) * 1_000_000, 1),
+            "dur_us": round(max(0.0, end - start) * 1_000_000, 1),
+            "tid": thread.ident,
+            "args": args or {},
+        }
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, args)
+
+    def get_events(self) -> list[dict]:
+        with self._lock:
+            return list(self._events)
+
+    def summarize(self, category: str | None = None) -> dict[str, dict[str, float]]:
+        """按 span 名称统计次数、总耗时与 p50/p95/max（毫秒）；指定 category 时只统计该类 span"""
+        durations: dict[str, list[float]] = {}
+        for event in self.get_events():
+            if category is not None and event["cat"] != category:
+                continue
+            durations.setdefault(event["name"], []).append(event["dur_us"] / 1000.0)
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "total_ms": round(sum(values), 2),
+                "p50_ms": round(_percentile(values, 0.50), 2),
+                "p95_ms": round(_percentile(values, 0.95), 2),
+                "max_ms": round(values[-1], 2),
+            }
+        return summary
+
+    def format_summary(self) -> str:
+        lines = []
+        for name, stats in sorted(
+            self.summarize().items(), key=lambda item: -item[1]["total_ms"]
+        ):
+            lines.append(
+                f"{name}: n={stats['count']} p50={stats['p50_ms']:.1f}ms "
+                f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+            )
+        return "\n".join(lines)
+
+    def format_stage_summary(self, limit: int = 4) -> str:
+        """总耗时最多的 limit 个阶段的单行 p50/p95 摘要，用于状态栏"""
+        stage_stats = sorted(
+            self.summarize("stage").items(), key=lambda item: -item[1]["total_ms"]
+        )[:limit]
+        return "，".join(
+            f"{name} p50 {stats['p50_ms']:.0f}ms / p95 {stats['p95_ms']:.0f}ms"
+            for name, stats in stage_stats
+        )
+
+    def export_chrome_trace(self, path: str):
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        trace_events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"name": thread_name},
+            }
+            for tid, thread_name in thread_names.items()
+        ]
+        for event in events:
+            trace_events.append(
+                {
+                    "name": event["name"],
+                    "cat": event["cat"],
+                    "ph": "X",
+                    "ts": event["ts_us"],
+                    "dur": event["dur_us"],
+                    "pid": self._pid,
+                    "tid": event["tid"],
+                    "args": event["args"],
+                }
+            )
+        payload = {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "name": self.name,
+                "wall_start": self.wall_start,
+                "summary": self.summarize(),
+            },
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, default=str)
+
+    def export_jsonl(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for event in self.get_events():
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            f.write(
+                json.dumps({"summary": self.summarize()}, ensure_ascii=False) + "\n"
+            )
+
+    def export(self, trace_dir: str, trace_format: str = "chrome") -> list[str]:
+        """写出追踪文件，返回写入的文件路径列表"""
+        os.makedirs(trace_dir, exist_ok=True)
+        base_name = time.strftime(
+            f"{self.name}_%Y%m%d_%H%M%S", time.localtime(self.wall_start)
+        )
+        written_paths = []
+        if trace_format in ("chrome", "both"):
+            chrome_path = os.path.join(trace_dir, f"{base_name}.trace.json")
+            self.export_chrome_trace(chrome_path)
+            written_paths.append(chrome_path)
+        if trace_format in ("jsonl", "both"):
+            jsonl_path = os.path.join(trace_dir, f"{base_name}.jsonl")
+            self.export_jsonl(jsonl_path)
+            written_paths.append(jsonl_path)
+        return written_paths
+
+
+def trace_span(tracer: Tracer | None, name: str, category: str = "stage", **args):
+    """tracer 为 None 时返回空上下文"""
+    if tracer is None:
+        return nullcontext(args)
+    return tracer.span(name, category, **args)
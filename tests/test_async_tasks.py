@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+from utils.async_tasks import CompletionEvent, bridge_cancellation, wait_cancellable
+
+
+def test_wait_cancellable_returns_result():
+    async def main():
+        return await wait_cancellable(
+            asyncio.sleep(0.01, result="done"),
+            threading.Event(),
+            deadline=time.monotonic() + 5,
+        )
+
+    assert asyncio.run(main()) == (True, "done")
+
+
+def test_wait_cancellable_stops_at_deadline():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        return await wait_cancellable(slow(), None, deadline=time.monotonic() + 0.1)
+
+    request_start = time.monotonic()
+    assert asyncio.run(main()) == (False, None)
+    assert time.monotonic() - request_start < 1.0
+    assert cancelled == [True]
+
+
+def test_concurrent_waits_share_one_cancellation_bridge():
+    cancellation_event = threading.Event()
+
+    async def main():
+        with bridge_cancellation(cancellation_event) as batch_cancelled:
+            threading.Timer(0.1, cancellation_event.set).start()
+            outcomes = await asyncio.gather(
+                *(
+                    wait_cancellable(asyncio.sleep(5), cancellation_event)
+                    for _ in range(20)
+                )
+            )
+            assert batch_cancelled.is_set()
+            return outcomes
+
+    request_start = time.monotonic()
+    assert asyncio.run(main()) == [(False, None)] * 20
+    assert time.monotonic() - request_start < 1.0
+
+
+def test_already_cancelled_event_does_not_wait():
+    cancellation_event = threading.Event()
+    cancellation_event.set()
+
+    async def main():
+        return await wait_cancellable(asyncio.sleep(5), cancellation_event)
+
+    request_start = time.monotonic()
+    assert asyncio.run(main()) == (False, None)
+    assert time.monotonic() - request_start < 0.5
+
+
+def test_completion_event_wakes_sync_and_async_waiters():
+    completion = CompletionEvent()
+    sync_results = []
+    waiter = threading.Thread(target=lambda: sync_results.append(completion.wait()))
+    waiter.start()
+
+    async def main():
+        threading.Timer(0.05, completion.set).start()
+        return await completion.wait_async()
+
+    assert asyncio.run(main()) is True
+    waiter.join(1.0)
+    assert sync_results == [True]
+    assert completion.wait(timeout=0) is True
+
+
+def test_completion_event_wait_is_cancellable():
+    completion = CompletionEvent()
+    cancellation_event = threading.Event()
+    threading.Timer(0.05, cancellation_event.set).start()
+    request_start = time.monotonic()
+    assert completion.wait(cancellation_event) is False
+    assert time.monotonic() - request_start < 1.0
+
+    async def main():
+        return await completion.wait_async(cancellation_event)
+
+    assert asyncio.run(main()) is False
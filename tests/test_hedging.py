@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+
+from services.hedging import HedgedProvider, LatencyTracker
+from services.router import ROUTED_ENDPOINT_KEY, is_routed_result
+
+
+class _DelayedProvider:
+    def __init__(self, model, delay, text):
+        self.model = model
+        self.delay = delay
+        self.text = text
+        self.cancelled = threading.Event()
+
+    def get_cache_identity(self):
+        return {"model": self.model}
+
+    def request_blocks(self, pil_image, cancellation_event=None, **kwargs):
+        if cancellation_event and cancellation_event.wait(self.delay):
+            self.cancelled.set()
+            return None, None
+        return [{"text": self.text}], None
+
+    async def request_blocks_async(self, pil_image, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return [{"text": self.text}], None
+
+
+def _hedged(primary, hedge, hedge_name="hedge") -> HedgedProvider:
+    hedged_provider = HedgedProvider(primary, hedge, hedge_name)
+    hedged_provider.min_samples = 1
+    hedged_provider.max_hedge_ratio = 1.0
+    hedged_provider.min_hedge_delay = 0.05
+    hedged_provider.latency_tracker.record(0.05)
+    return hedged_provider
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker(window_size=3)
+    assert tracker.percentile(95) is None
+    for seconds in (4.0, 1.0, 2.0, 3.0):
+        tracker.record(seconds)
+    assert len(tracker) == 3
+    assert tracker.percentile(50) == 2.0
+    assert tracker.percentile(100) == 3.0
+
+
+def test_hedge_from_other_model_is_marked_and_primary_aborted():
+    primary = _DelayedProvider("primary-model", 5.0, "primary")
+    hedge = _DelayedProvider("other-model", 0.0, "hedge")
+    hedged_provider = _hedged(primary, hedge, "openai")
+    blocks, error = hedged_provider.request_blocks(None)
+    assert error is None
+    assert blocks == [{"text": "hedge", ROUTED_ENDPOINT_KEY: "openai"}]
+    assert is_routed_result(blocks)
+    assert primary.cancelled.wait(1.0)
+    assert hedged_provider.get_stats()["hedges_won"] == 1
+
+
+def test_hedge_from_same_model_is_not_marked():
+    primary = _DelayedProvider("model", 5.0, "primary")
+    hedge = _DelayedProvider("model", 0.0, "hedge")
+    blocks, _ = _hedged(primary, hedge).request_blocks(None)
+    assert blocks == [{"text": "hedge"}]
+    assert not is_routed_result(blocks)
+
+
+def test_async_hedge_from_other_model_is_marked():
+    primary = _DelayedProvider("primary-model", 5.0, "primary")
+    hedge = _DelayedProvider("other-model", 0.0, "hedge")
+    blocks, _ = asyncio.run(_hedged(primary, hedge).request_blocks_async(None))
+    assert is_routed_result(blocks)
+    assert primary.cancelled.is_set()
+
+
+def test_fast_primary_is_not_hedged():
+    primary = _DelayedProvider("model", 0.0, "primary")
+    hedge = _DelayedProvider("other-model", 0.0, "hedge")
+    hedged_provider = _hedged(primary, hedge)
+    hedged_provider.min_hedge_delay = 1.0
+    assert hedged_provider.request_blocks(None) == ([{"text": "primary"}], None)
+    assert hedged_provider.get_stats()["hedges_sent"] == 0
+
+
+def test_cancellation_returns_promptly():
+    primary = _DelayedProvider("model", 5.0, "primary")
+    hedge = _DelayedProvider("model", 5.0, "hedge")
+    cancellation_event = threading.Event()
+    threading.Timer(0.2, cancellation_event.set).start()
+    request_start = time.monotonic()
+    outcome = _hedged(primary, hedge).request_blocks(
+        None, cancellation_event=cancellation_event
+    )
+    assert outcome == (None, None)
+    assert time.monotonic() - request_start < 1.0
+    assert primary.cancelled.wait(1.0)
+    assert hedge.cancelled.wait(1.0)
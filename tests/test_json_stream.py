@@ -0,0 +1,80 @@
+import pytest
+
+from services.http_client import _iter_byte_lines
+from utils.json_stream import IncrementalJsonArrayParser, StreamingBlockCollector
+
+FENCED_RESPONSE = (
+    "Here are the blocks:\n```json\n"
+    '[{"id": 1, "text": "a } b { c ] [ d"}, '
+    '{"id": 2, "text": "say \\"}\\" please", "nested": {"k": [1, {"x": 2}]}}]\n'
+    "```\nTrailing note with [brackets] and {braces}."
+)
+EXPECTED_ITEMS = [
+    {"id": 1, "text": "a } b { c ] [ d"},
+    {"id": 2, "text": 'say "}" please', "nested": {"k": [1, {"x": 2}]}},
+]
+
+
+def _feed_in_chunks(text: str, chunk_size: int) -> list[dict]:
+    parser = IncrementalJsonArrayParser()
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[start : start + chunk_size]))
+    assert parser.array_closed
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_quoted_braces_and_fenced_output(chunk_size):
+    assert _feed_in_chunks(FENCED_RESPONSE, chunk_size) == EXPECTED_ITEMS
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    parser = IncrementalJsonArrayParser()
+    assert parser.feed('[{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(": 2}") == [{"id": 2}]
+    assert not parser.array_closed
+    assert parser.feed("]") == []
+    assert parser.array_closed
+
+
+def test_array_inside_wrapper_object():
+    parser = IncrementalJsonArrayParser()
+    items = parser.feed('{"blocks": [{"id": 1}, {"id": 2}], "extra": [{"id": 3}]}')
+    assert items == [{"id": 1}, {"id": 2}]
+
+
+def test_invalid_item_is_counted_and_skipped():
+    parser = IncrementalJsonArrayParser()
+    items = parser.feed('[{"id": 1,}, {"id": 2}]')
+    assert items == [{"id": 2}]
+    assert parser.parse_errors == 1
+    assert parser.items_parsed == 1
+
+
+def test_collector_keeps_normalized_blocks_and_forwards_copies():
+    forwarded = []
+
+    def normalize_block(item, index):
+        if "text" not in item:
+            return None
+        return {"index": index, "text": item["text"]}
+
+    collector = StreamingBlockCollector(normalize_block, forwarded.append)
+    collector.feed('[{"text": "a"}, {"skip": true}, ')
+    collector.feed('{"text": "b"}')
+    assert collector.blocks == [{"index": 0, "text": "a"}, {"index": 2, "text": "b"}]
+    assert forwarded == collector.blocks
+    forwarded[0]["text"] = "changed"
+    assert collector.blocks[0]["text"] == "a"
+    assert collector.text == '[{"text": "a"}, {"skip": true}, {"text": "b"}'
+
+
+def test_iter_byte_lines_splits_across_chunks():
+    chunks = [b'data: {"a"', b": 1}\r\n\r\ndata: [DONE]\n", b"tail"]
+    assert list(_iter_byte_lines(chunks)) == [
+        b'data: {"a": 1}',
+        b"",
+        b"data: [DONE]",
+        b"tail",
+    ]
@@ -0,0 +1,147 @@
+import os
+
+import pytest
+
+from core.near_duplicate import (
+    NUMPY_AVAILABLE,
+    NearDuplicateIndex,
+    compute_page_hashes,
+    hamming_distance,
+    max_region_distance,
+)
+
+BLOCKS = [{"original_text": "こんにちは", "bbox_norm": [0.1, 0.1, 0.3, 0.2]}]
+REGION_HASHES = [0x0F0F, 0xF0F0, 0x00FF, 0xFF00]
+
+
+def _flip_bits(value: int, count: int) -> int:
+    return value ^ ((1 << count) - 1)
+
+
+def _make_index(tmp_path, **kwargs) -> NearDuplicateIndex:
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.json"), **kwargs)
+    index.add(
+        0xAAAA_AAAA,
+        REGION_HASHES,
+        "identity",
+        (800, 1200),
+        BLOCKS,
+        str(tmp_path / "chapter1" / "001.png"),
+    )
+    return index
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1010, 0b1010) == 0
+    assert hamming_distance(0b1010, 0b0101) == 4
+    assert hamming_distance(0, (1 << 64) - 1) == 64
+
+
+def test_max_region_distance_uses_worst_region():
+    assert max_region_distance([0, 0, 0, 0], [0, 0b111, 0b1, 0]) == 3
+    assert max_region_distance([0, 0], [0, 0, 0, 0]) == 64
+    assert max_region_distance([], []) == 64
+
+
+@pytest.mark.parametrize(
+    "flipped_bits, expected_hit", [(0, True), (4, True), (5, False)]
+)
+def test_find_respects_global_hamming_threshold(tmp_path, flipped_bits, expected_hit):
+    index = _make_index(tmp_path, max_distance=4)
+    match = index.find(
+        _flip_bits(0xAAAA_AAAA, flipped_bits),
+        REGION_HASHES,
+        "identity",
+        (800, 1200),
+        str(tmp_path / "chapter1" / "002.png"),
+    )
+    assert (match is not None) == expected_hit
+    if expected_hit:
+        assert match[0] == BLOCKS
+        assert match[1] == os.path.abspath(tmp_path / "chapter1" / "001.png")
+
+
+@pytest.mark.parametrize("flipped_bits, expected_hit", [(3, True), (4, False)])
+def test_find_respects_region_threshold(tmp_path, flipped_bits, expected_hit):
+    index = _make_index(tmp_path, max_region_distance=3)
+    region_hashes = list(REGION_HASHES)
+    region_hashes[2] = _flip_bits(region_hashes[2], flipped_bits)
+    match = index.find(
+        0xAAAA_AAAA,
+        region_hashes,
+        "identity",
+        (800, 1200),
+        str(tmp_path / "chapter1" / "002.png"),
+    )
+    assert (match is not None) == expected_hit
+
+
+def test_find_rejects_other_identity_aspect_ratio_and_folder(tmp_path):
+    index = _make_index(tmp_path)
+    same_folder_path = str(tmp_path / "chapter1" / "002.png")
+    assert (
+        index.find(0xAAAA_AAAA, REGION_HASHES, "other", (800, 1200), same_folder_path)
+        is None
+    )
+    assert (
+        index.find(
+            0xAAAA_AAAA, REGION_HASHES, "identity", (800, 1260), same_folder_path
+        )
+        is None
+    )
+    other_folder_path = str(tmp_path / "chapter2" / "001.png")
+    assert (
+        index.find(
+            0xAAAA_AAAA, REGION_HASHES, "identity", (800, 1200), other_folder_path
+        )
+        is None
+    )
+
+
+def test_find_allows_other_folder_when_enabled(tmp_path):
+    index = _make_index(tmp_path, allow_cross_folder=True)
+    match = index.find(
+        0xAAAA_AAAA,
+        REGION_HASHES,
+        "identity",
+        (400, 600),
+        str(tmp_path / "chapter2" / "001.png"),
+    )
+    assert match is not None
+    assert index.get_stats()["calls_avoided"] == 1
+
+
+def test_find_returns_copy_of_blocks(tmp_path):
+    index = _make_index(tmp_path)
+    source_path = str(tmp_path / "chapter1" / "002.png")
+    blocks, _ = index.find(
+        0xAAAA_AAAA, REGION_HASHES, "identity", (800, 1200), source_path
+    )
+    blocks[0]["original_text"] = "changed"
+    blocks, _ = index.find(
+        0xAAAA_AAAA, REGION_HASHES, "identity", (800, 1200), source_path
+    )
+    assert blocks == BLOCKS
+
+
+def test_index_round_trips_through_file(tmp_path):
+    index = _make_index(tmp_path)
+    index.save()
+    reloaded = NearDuplicateIndex(str(tmp_path / "near_duplicates.json"))
+    assert reloaded.get_stats()["entries"] == 1
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="需要 numpy")
+def test_rescaled_page_stays_within_thresholds():
+    from PIL import Image, ImageDraw
+
+    page = Image.new("L", (400, 600), 255)
+    draw = ImageDraw.Draw(page)
+    for i in range(6):
+        draw.rectangle((30 + i * 55, 40 + i * 80, 90 + i * 55, 120 + i * 80), fill=0)
+    perceptual_hash, region_hashes = compute_page_hashes(page)
+    rescaled_hash, rescaled_regions = compute_page_hashes(
+        page.resize((300, 450), Image.Resampling.LANCZOS)
+    )
+    assert hamming_distance(perceptual_hash, rescaled_hash) <= 4
+    assert max_region_distance(region_hashes, rescaled_regions) <= 3
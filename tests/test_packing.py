@@ -0,0 +1,197 @@
+import asyncio
+import json
+import threading
+import time
+
+from PIL import Image
+
+from services.packing import PagePacker, split_packed_response
+
+
+def _normalize_block(item, item_idx):
+    if "text" not in item:
+        return None
+    return {"id": item_idx, "text": item["text"]}
+
+
+def _response(*items) -> str:
+    return json.dumps(list(items), ensure_ascii=False)
+
+
+def test_split_assigns_blocks_by_image_index():
+    raw_text = (
+        "```json\n"
+        + _response(
+            {"image_index": 1, "text": "b0"},
+            {"image_index": 0, "text": "a0"},
+            {"image_index": 1, "text": "b1"},
+        )
+        + "\n```"
+    )
+    page_blocks, error = split_packed_response(raw_text, 2, _normalize_block)
+    assert error is None
+    assert page_blocks == [
+        [{"id": 0, "text": "a0"}],
+        [{"id": 0, "text": "b0"}, {"id": 1, "text": "b1"}],
+    ]
+
+
+def test_split_treats_page_without_blocks_as_empty():
+    raw_text = _response({"image_index": 0, "text": "a0"})
+    page_blocks, error = split_packed_response(raw_text, 3, _normalize_block)
+    assert error is None
+    assert page_blocks == [[{"id": 0, "text": "a0"}], [], []]
+
+
+def test_split_accepts_wrapper_object_and_all_empty_response():
+    raw_text = json.dumps({"blocks": []})
+    assert split_packed_response(raw_text, 2, _normalize_block) == ([[], []], None)
+
+
+def test_split_missing_or_invalid_index_makes_empty_pages_ambiguous():
+    for unassigned_item in (
+        {"text": "?"},
+        {"image_index": "x", "text": "?"},
+        {"image_index": 5, "text": "?"},
+        {"image_index": -1, "text": "?"},
+    ):
+        raw_text = _response({"image_index": 0, "text": "a0"}, unassigned_item)
+        page_blocks, error = split_packed_response(raw_text, 2, _normalize_block)
+        assert error is None
+        assert page_blocks == [[{"id": 0, "text": "a0"}], None]
+
+
+def test_split_page_with_invalid_block_needs_retry():
+    raw_text = _response(
+        {"image_index": 0, "text": "a0"},
+        {"image_index": 1, "text": "b0"},
+        {"image_index": 1, "bounding_box": [0, 0, 1, 1]},
+    )
+    page_blocks, _ = split_packed_response(raw_text, 2, _normalize_block)
+    assert page_blocks == [[{"id": 0, "text": "a0"}], None]
+
+
+def test_split_reports_unparseable_response():
+    page_blocks, error = split_packed_response("not json", 2, _normalize_block)
+    assert page_blocks is None
+    assert error
+    page_blocks, error = split_packed_response('"text"', 2, _normalize_block)
+    assert page_blocks is None
+    assert error
+
+
+class _PackedProvider:
+    def __init__(self, raw_text):
+        self.raw_text = raw_text
+        self.packed_calls = 0
+        self.solo_calls = 0
+
+    def get_cache_identity(self):
+        return {}
+
+    def request_blocks_packed(self, pil_images, **kwargs):
+        self.packed_calls += 1
+        return split_packed_response(self.raw_text, len(pil_images), _normalize_block)
+
+    def request_blocks(self, pil_image, **kwargs):
+        self.solo_calls += 1
+        return [{"id": 0, "text": "solo"}], None
+
+
+def _request_pages_concurrently(packer, page_count):
+    results = [None] * page_count
+
+    def request(index):
+        results[index] = packer.request_blocks(Image.new("RGB", (64, 64)))
+
+    threads = [
+        threading.Thread(target=request, args=(index,)) for index in range(page_count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_packer_does_not_retry_empty_pages():
+    provider = _PackedProvider(_response({"image_index": 0, "text": "a0"}))
+    packer = PagePacker(provider)
+    packer.max_images = 2
+    packer.wait_seconds = 5.0
+    results = _request_pages_concurrently(packer, 2)
+    assert sorted(results, key=lambda result: len(result[0])) == [
+        ([], None),
+        ([{"id": 0, "text": "a0"}], None),
+    ]
+    assert provider.packed_calls == 1
+    assert provider.solo_calls == 0
+    assert packer.get_stats()["solo_retries"] == 0
+
+
+def test_packer_retries_ambiguous_pages_alone():
+    provider = _PackedProvider(
+        _response({"image_index": 0, "text": "a0"}, {"text": "unassigned"})
+    )
+    packer = PagePacker(provider)
+    packer.max_images = 2
+    packer.wait_seconds = 5.0
+    results = _request_pages_concurrently(packer, 2)
+    assert ([{"id": 0, "text": "solo"}], None) in results
+    assert provider.solo_calls == 1
+    assert packer.get_stats()["solo_retries"] == 1
+
+
+def test_async_packer_sends_full_group_without_waiting():
+    provider = _PackedProvider(
+        _response({"image_index": 0, "text": "a0"}, {"image_index": 1, "text": "a1"})
+    )
+    packer = PagePacker(provider)
+    packer.max_images = 2
+    packer.wait_seconds = 5.0
+
+    async def main():
+        return await asyncio.gather(
+            *(packer.request_blocks_async(Image.new("RGB", (64, 64))) for _ in range(2))
+        )
+
+    request_start = time.monotonic()
+    results = asyncio.run(main())
+    assert time.monotonic() - request_start < 1.0
+    assert sorted(results, key=lambda result: result[0][0]["text"]) == [
+        ([{"id": 0, "text": "a0"}], None),
+        ([{"id": 0, "text": "a1"}], None),
+    ]
+    assert provider.packed_calls == 1
+
+
+def test_async_packer_follower_stops_on_cancellation():
+    provider = _PackedProvider(_response())
+    packer = PagePacker(provider)
+    packer.max_images = 3
+    packer.wait_seconds = 5.0
+    cancellation_event = threading.Event()
+
+    async def follower():
+        threading.Timer(0.05, cancellation_event.set).start()
+        request_start = time.monotonic()
+        outcome = await packer.request_blocks_async(
+            Image.new("RGB", (64, 64)), cancellation_event=cancellation_event
+        )
+        return outcome, time.monotonic() - request_start
+
+    async def main():
+        leader = asyncio.create_task(
+            packer.request_blocks_async(Image.new("RGB", (64, 64)))
+        )
+        await asyncio.sleep(0)
+        outcome = await follower()
+        # 第三页填满包，发起者立即发送
+        await packer.request_blocks_async(Image.new("RGB", (64, 64)))
+        return outcome, await leader
+
+    (outcome, elapsed), leader_outcome = asyncio.run(main())
+    assert outcome == (None, None)
+    assert elapsed < 1.0
+    assert leader_outcome == ([], None)
+    assert provider.packed_calls == 1
@@ -0,0 +1,129 @@
+import email.utils
+import time
+
+import pytest
+import requests
+
+from services.rate_limit import (
+    RateLimiter,
+    RetryPolicy,
+    _TokenBucket,
+    call_with_retries,
+    classify_error,
+    parse_retry_after,
+)
+
+
+class _FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _HTTPStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = _FakeResponse(status_code, headers)
+
+
+def test_token_bucket_refills_continuously():
+    bucket = _TokenBucket(60)
+    now = bucket.updated_at
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+
+
+def test_token_bucket_caps_request_at_capacity():
+    bucket = _TokenBucket(10)
+    now = bucket.updated_at
+    assert bucket.wait_time(1000, now) == 0.0
+    bucket.take(1000)
+    assert bucket.available == pytest.approx(0.0)
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = _TokenBucket(0)
+    bucket.take(100)
+    assert bucket.wait_time(100, time.monotonic()) == 0.0
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= parse_retry_after(retry_at) <= 30
+
+
+def test_classify_error():
+    assert classify_error(_HTTPStatusError(429, {"Retry-After": "7"})) == (
+        True,
+        429,
+        7.0,
+    )
+    assert classify_error(_HTTPStatusError(503)) == (True, 503, None)
+    assert classify_error(_HTTPStatusError(400)) == (False, 400, None)
+    assert classify_error(requests.ConnectionError("reset")) == (True, None, None)
+    assert classify_error(ValueError("bad json")) == (False, None, None)
+
+
+def test_next_delay_never_shorter_than_retry_after():
+    policy = RetryPolicy(base_delay=0.1, max_delay=1.0)
+    for _ in range(20):
+        delay = policy.next_delay(0.5, None)
+        assert 0.1 <= delay <= 1.0
+        assert policy.next_delay(0.5, 5.0) == 5.0
+
+
+def test_call_with_retries_honours_retry_after():
+    limiter = RateLimiter(
+        "test-retry-after",
+        retry_policy=RetryPolicy(max_retries=3, base_delay=0.01, max_delay=0.02),
+    )
+    responses = iter(
+        [_HTTPStatusError(429, {"Retry-After": "0.3"}), _HTTPStatusError(503), "ok"]
+    )
+    attempt_times = []
+
+    def attempt():
+        attempt_times.append(time.monotonic())
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert call_with_retries(limiter, attempt, deadline=time.monotonic() + 60) == "ok"
+    assert attempt_times[1] - attempt_times[0] >= 0.3
+    assert attempt_times[2] - attempt_times[1] < 0.3
+    stats = limiter.get_stats()
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 1
+
+
+def test_call_with_retries_does_not_retry_client_errors():
+    limiter = RateLimiter("test-client-error")
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        raise _HTTPStatusError(400)
+
+    with pytest.raises(_HTTPStatusError):
+        call_with_retries(limiter, attempt, deadline=time.monotonic() + 60)
+    assert len(calls) == 1
+
+
+def test_call_with_retries_gives_up_when_retry_after_exceeds_deadline():
+    limiter = RateLimiter("test-deadline")
+
+    def attempt():
+        raise _HTTPStatusError(429, {"Retry-After": "120"})
+
+    with pytest.raises(_HTTPStatusError):
+        call_with_retries(limiter, attempt, deadline=time.monotonic() + 5)
+    assert limiter.get_stats()["failed_after_retries"] == 1
@@ -0,0 +1,136 @@
+import random
+
+from services.router import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    ROUTED_ENDPOINT_KEY,
+    CircuitBreaker,
+    ProviderEndpoint,
+    ProviderRouter,
+    is_routed_result,
+    parse_config_list,
+)
+
+
+def _open_breaker(failure_threshold=2, open_seconds=60.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold, open_seconds)
+    for _ in range(failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    return breaker
+
+
+def _expire(breaker: CircuitBreaker):
+    breaker.opened_at -= breaker.open_seconds + 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.times_opened == 1
+    assert not breaker.allow_request()
+
+
+def test_half_open_allows_single_probe_then_closes_on_success():
+    breaker = _open_breaker()
+    _expire(breaker)
+    assert breaker.allow_request()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = _open_breaker()
+    _expire(breaker)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow_request()
+
+
+def test_released_probe_lets_next_request_probe():
+    breaker = _open_breaker()
+    _expire(breaker)
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow_request()
+
+
+class _FakeProvider:
+    def __init__(self, model, outcome, streamed_blocks=()):
+        self.model = model
+        self.outcome = outcome
+        self.streamed_blocks = streamed_blocks
+        self.block_callbacks = []
+
+    def get_cache_identity(self):
+        return {"model": self.model}
+
+    def request_blocks(self, pil_image, block_callback=None, **kwargs):
+        self.block_callbacks.append(block_callback)
+        for block in self.streamed_blocks:
+            if block_callback:
+                block_callback(dict(block))
+        return self.outcome
+
+
+def _router(*endpoints) -> ProviderRouter:
+    return ProviderRouter(list(endpoints), rng=random.Random(0))
+
+
+def test_router_fails_over_and_marks_fallback_tier_results():
+    primary = _FakeProvider("primary", (None, "HTTP 503"), [{"text": "partial"}])
+    fallback = _FakeProvider("fallback", ([{"text": "ok"}], None))
+    router = _router(
+        ProviderEndpoint("primary", primary, tier=0),
+        ProviderEndpoint("fallback", fallback, tier=1),
+    )
+    previewed = []
+    blocks, error = router.request_blocks(None, block_callback=previewed.append)
+    assert error is None
+    assert blocks == [{"text": "ok", ROUTED_ENDPOINT_KEY: "fallback"}]
+    assert is_routed_result(blocks)
+    assert previewed == [{"text": "partial"}]
+    assert fallback.block_callbacks == [None]
+    assert router.get_stats()["failovers"] == 1
+
+
+def test_router_does_not_mark_same_identity_endpoints():
+    first = _FakeProvider("same", (None, "timeout"))
+    second = _FakeProvider("same", ([{"text": "ok"}], None))
+    router = _router(
+        ProviderEndpoint("a", first, tier=0), ProviderEndpoint("b", second, tier=1)
+    )
+    blocks, _ = router.request_blocks(None)
+    assert not is_routed_result(blocks)
+
+
+def test_router_skips_open_endpoints():
+    broken = _FakeProvider("primary", ([{"text": "never"}], None))
+    healthy = _FakeProvider("primary", ([{"text": "ok"}], None))
+    router = _router(
+        ProviderEndpoint("broken", broken, circuit_breaker=_open_breaker()),
+        ProviderEndpoint("healthy", healthy),
+    )
+    assert router.request_blocks(None) == ([{"text": "ok"}], None)
+    assert broken.block_callbacks == []
+
+
+def test_parse_config_list():
+    assert parse_config_list(" a, b\nc,, ") == ["a", "b", "c"]
+    assert parse_config_list(None) == []
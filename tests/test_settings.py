@@ -0,0 +1,46 @@
+import dataclasses
+
+import pytest
+
+from core.config import ConfigManager
+from core.settings import get_render_settings, parse_rgba_color
+
+
+@pytest.fixture
+def config_manager(tmp_path):
+    return ConfigManager(str(tmp_path / "config.ini"))
+
+
+def test_parse_rgba_color():
+    assert parse_rgba_color("1,2,3", (0, 0, 0, 0)) == (1, 2, 3, 255)
+    assert parse_rgba_color("1,2,3,4", (0, 0, 0, 0)) == (1, 2, 3, 4)
+    assert parse_rgba_color("red", (9, 9, 9, 9)) == (9, 9, 9, 9)
+    assert parse_rgba_color("1,2", (9, 9, 9, 9)) == (9, 9, 9, 9)
+
+
+def test_snapshot_is_reused_until_config_changes(config_manager):
+    first = get_render_settings(config_manager)
+    assert get_render_settings(config_manager) is first
+    config_manager.set("UI", "text_padding", "7")
+    second = get_render_settings(config_manager)
+    assert second is not first
+    assert second.text_padding == 7
+    assert second.version == config_manager.version
+
+
+def test_snapshot_is_read_only(config_manager):
+    settings = get_render_settings(config_manager)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.text_padding = 10
+    with pytest.raises(TypeError):
+        settings.font_size_mapping["medium"] = 99
+
+
+def test_font_size_for_prefers_fixed_font_size(config_manager):
+    config_manager.set("FontSizeMapping", "large", "40")
+    config_manager.set("UI", "fixed_font_size", "0")
+    settings = get_render_settings(config_manager)
+    assert settings.font_size_for("large") == 40
+    assert settings.font_size_for("unknown") == settings.font_size_mapping["medium"]
+    config_manager.set("UI", "fixed_font_size", "18")
+    assert get_render_settings(config_manager).font_size_for("large") == 18
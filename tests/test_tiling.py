@@ -0,0 +1,60 @@
+import pytest
+
+from core.tiling import deduplicate_tile_blocks, map_tile_blocks_to_page, plan_tiles
+
+
+def _block(text, bbox_norm, edge_margin):
+    return {
+        "original_text": text,
+        "bbox_norm": bbox_norm,
+        "_tile_edge_margin": edge_margin,
+    }
+
+
+def test_plan_tiles_keeps_normal_pages_whole():
+    assert plan_tiles(1000, 1400) == [(0, 0, 1000, 1400)]
+
+
+def test_plan_tiles_splits_long_strip_with_overlap():
+    tiles = plan_tiles(800, 6000, max_tile_aspect=1.6, overlap_ratio=0.15)
+    assert len(tiles) > 1
+    assert tiles[0][1] == 0 and tiles[-1][3] == 6000
+    for (_, _, _, previous_bottom), (_, top, _, _) in zip(tiles, tiles[1:]):
+        assert top < previous_bottom
+    assert all(bottom - top <= 1280 for _, top, _, bottom in tiles)
+
+
+def test_map_tile_blocks_to_page_converts_coordinates_and_edge_margin():
+    blocks = [{"id": 3, "original_text": "a", "bbox_norm": [0.1, 0.5, 0.2, 0.75]}]
+    mapped = map_tile_blocks_to_page(blocks, (0, 1000, 800, 2000), (800, 4000), 1)
+    assert mapped[0]["id"] == "tile1_3"
+    assert mapped[0]["bbox_norm"] == pytest.approx([0.1, 0.375, 0.2, 0.4375])
+    assert mapped[0]["_tile_edge_margin"] == pytest.approx(250.0)
+
+
+def test_deduplicate_keeps_block_farther_from_tile_edge():
+    cut_block = _block("こんにち", [0.1, 0.40, 0.3, 0.48], 2.0)
+    whole_block = _block("こんにちは", [0.1, 0.40, 0.3, 0.50], 120.0)
+    kept = deduplicate_tile_blocks([cut_block, whole_block])
+    assert kept == [
+        {"original_text": "こんにちは", "bbox_norm": [0.1, 0.40, 0.3, 0.50]}
+    ]
+
+
+def test_deduplicate_uses_text_similarity_for_contained_blocks():
+    outer = _block("今日はいい天気ですね", [0.1, 0.1, 0.5, 0.5], 100.0)
+    contained_same_text = _block("今日はいい天気", [0.1, 0.1, 0.2, 0.2], 5.0)
+    contained_other_text = _block("ドン", [0.3, 0.3, 0.4, 0.4], 5.0)
+    kept = deduplicate_tile_blocks([outer, contained_same_text, contained_other_text])
+    assert [block["original_text"] for block in kept] == [
+        "今日はいい天気ですね",
+        "ドン",
+    ]
+
+
+def test_deduplicate_keeps_disjoint_blocks_in_reading_order():
+    lower = _block("b", [0.1, 0.6, 0.2, 0.7], 10.0)
+    upper = _block("a", [0.5, 0.1, 0.6, 0.2], 50.0)
+    kept = deduplicate_tile_blocks([lower, upper])
+    assert [block["original_text"] for block in kept] == ["a", "b"]
+    assert all("_tile_edge_margin" not in block for block in kept)
@@ -0,0 +1,19 @@
+from utils.tracing import Tracer
+
+
+def test_stage_summary_is_one_line_and_skips_other_categories():
+    tracer = Tracer()
+    for duration in (0.1, 0.2, 0.3):
+        tracer.add_span("llm", 0.0, duration)
+    tracer.add_span("render", 0.0, 0.01)
+    tracer.add_span("page", 0.0, 5.0, category="page")
+    stage_summary = tracer.format_stage_summary()
+    assert "\n" not in stage_summary
+    assert stage_summary.startswith("llm p50 200ms")
+    assert "render" in stage_summary
+    assert "page" not in stage_summary
+    assert set(tracer.summarize("stage")) == {"llm", "render"}
+
+
+def test_stage_summary_is_empty_without_spans():
+    assert Tracer().format_stage_summary() == ""
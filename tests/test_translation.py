@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from core.config import ConfigManager
+from services.translation import (
+    GEMINI_LIB_FOR_TRANSLATION_AVAILABLE,
+    GeminiTextTranslationProvider,
+)
+
+pytestmark = pytest.mark.skipif(
+    not GEMINI_LIB_FOR_TRANSLATION_AVAILABLE, reason="需要 google-genai"
+)
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeTextModel:
+    """批量 Prompt 按 id 返回 "<原文>-zh"，但省略 drop_texts 中的条目；单条 Prompt 返回 "single:<原文>" """
+
+    model_name = "fake-text-model"
+
+    def __init__(self, drop_texts=()):
+        self.drop_texts = set(drop_texts)
+        self.batch_prompts = []
+        self.single_prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        if "\nInput:\n" in prompt:
+            self.batch_prompts.append(prompt)
+            items = json.loads(prompt.split("\nInput:\n", 1)[1])
+            translations = [
+                {"id": item["id"], "translation": f"{item['text']}-zh"}
+                for item in items
+                if item["text"] not in self.drop_texts
+            ]
+            return _FakeResponse("```json\n" + json.dumps(translations) + "\n```")
+        self.single_prompts.append(prompt)
+        original_text = prompt.split('"""\n', 1)[1].split('\n"""', 1)[0]
+        return _FakeResponse(f"single:{original_text}")
+
+
+@pytest.fixture
+def config_manager(tmp_path):
+    return ConfigManager(str(tmp_path / "config.ini"))
+
+
+def _provider(config_manager, model) -> GeminiTextTranslationProvider:
+    return GeminiTextTranslationProvider(config_manager, gemini_model_instance=model)
+
+
+def test_parse_batch_response():
+    parse = GeminiTextTranslationProvider._parse_batch_response
+    assert parse('```json\n[{"id": 0, "translation": " a "}]\n```') == {0: "a"}
+    assert parse('{"items": [{"id": "1", "translation": "b"}]}') == {1: "b"}
+    assert (
+        parse('[{"id": "x", "translation": "c"}, {"id": 2, "translation": 3}, "d"]')
+        == {}
+    )
+    assert parse("not json") == {}
+
+
+def test_split_into_chunks_respects_token_budget(config_manager):
+    config_manager.set("TextTranslation", "max_batch_tokens", "22")
+    provider = _provider(config_manager, _FakeTextModel())
+    chunks = provider._split_into_chunks([(0, "a" * 15), (1, "b" * 15), (2, "c")])
+    assert chunks == [[(0, "a" * 15)], [(1, "b" * 15), (2, "c")]]
+    config_manager.set("TextTranslation", "max_batch_tokens", "1")
+    chunks = provider._split_into_chunks([(0, "a" * 300)])
+    assert chunks == [[(0, "a" * 300)]]
+
+
+def test_batched_translation_maps_ids_and_retries_missing(config_manager):
+    model = _FakeTextModel(drop_texts={"ドン"})
+    provider = _provider(config_manager, model)
+    results = provider.translate_batch(
+        ["こんにちは", "", "ドン", "さようなら"], "Chinese"
+    )
+    assert [result.translated_text for result in results] == [
+        "こんにちは-zh",
+        "",
+        "single:ドン",
+        "さようなら-zh",
+    ]
+    assert len(model.batch_prompts) == 1
+    assert len(model.single_prompts) == 1
+
+
+def test_batched_translation_splits_into_several_requests(config_manager):
+    config_manager.set("TextTranslation", "max_batch_tokens", "10")
+    model = _FakeTextModel()
+    provider = _provider(config_manager, model)
+    texts = ["一つ目", "二つ目", "三つ目"]
+    results = provider.translate_batch(texts, "Chinese")
+    assert [result.translated_text for result in results] == [
+        f"{text}-zh" for text in texts
+    ]
+    assert len(model.batch_prompts) == 3
+
+
+def test_batching_disabled_uses_single_requests(config_manager):
+    config_manager.set("TextTranslation", "batch_enabled", "False")
+    model = _FakeTextModel()
+    provider = _provider(config_manager, model)
+    results = provider.translate_batch(["一", "二"], "Chinese")
+    assert [result.translated_text for result in results] == ["single:一", "single:二"]
+    assert model.batch_prompts == []
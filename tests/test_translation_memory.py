@@ -0,0 +1,126 @@
+import pytest
+
+from core.translation_memory import (
+    TranslationMemory,
+    compute_glossary_version,
+    normalize_memory_text,
+)
+
+
+@pytest.fixture
+def memory(tmp_path):
+    translation_memory = TranslationMemory(str(tmp_path / "tm" / "memory.sqlite3"))
+    yield translation_memory
+    translation_memory.close()
+
+
+def test_normalize_memory_text():
+    assert normalize_memory_text("  ＡＢＣ\n  １２３ ") == "ABC 123"
+    assert normalize_memory_text(None) == ""
+
+
+def test_glossary_version_ignores_order_and_non_entries():
+    version = compute_glossary_version("A -> 甲\nB -> 乙")
+    assert compute_glossary_version("B -> 乙\n\nnote\nA -> 甲") == version
+    assert compute_glossary_version("A -> 丙\nB -> 乙") != version
+    assert compute_glossary_version("") == "none"
+
+
+def test_exact_match_normalizes_text_and_language(memory):
+    memory.add_many([("こんにちは　世界", "你好世界")], "Japanese", "Chinese", "none")
+    assert memory.find_exact(
+        ["こんにちは 世界", "さようなら", ""], "japanese", " CHINESE ", "none"
+    ) == ["你好世界", None, None]
+    assert memory.find_exact(["こんにちは 世界"], "Japanese", "English", "none") == [
+        None
+    ]
+    stats = memory.get_stats()
+    assert stats["exact_hits"] == 1
+    assert stats["entries"] == 1
+
+
+def test_glossary_versions_are_isolated(memory):
+    memory.add_many([("ルフィ", "路飞")], "Japanese", "Chinese", "v1")
+    assert memory.find_exact(["ルフィ"], "Japanese", "Chinese", "v2") == [None]
+    assert memory.find_fuzzy("ルフィだ", "Japanese", "Chinese", "v2") == []
+    assert memory.find_exact(["ルフィ"], "Japanese", "Chinese", "v1") == ["路飞"]
+
+
+def test_fuzzy_match_threshold_and_ordering(memory):
+    memory.add_many(
+        [
+            ("今日はいい天気ですね", "今天天气真好啊"),
+            ("今日はいい天気だ", "今天天气真好"),
+            ("全然違う文章です", "完全不同的句子"),
+        ],
+        "Japanese",
+        "Chinese",
+        "none",
+    )
+    matches = memory.find_fuzzy("今日はいい天気ですよ", "Japanese", "Chinese", "none")
+    assert [translated for _, _, translated in matches] == [
+        "今天天气真好啊",
+        "今天天气真好",
+    ]
+    assert matches[0][0] >= matches[1][0] >= memory.fuzzy_threshold
+    matches_excluding_self = memory.find_fuzzy(
+        "今日はいい天気ですね", "Japanese", "Chinese", "none"
+    )
+    assert [translated for _, _, translated in matches_excluding_self] == [
+        "今天天气真好"
+    ]
+
+
+def test_failed_translations_are_not_stored(memory):
+    stored = memory.add_many(
+        [("a", "[Gemini错误]"), ("b", "[翻译取消]"), ("c", "  "), ("", "x")],
+        "Japanese",
+        "Chinese",
+        "none",
+    )
+    assert stored == 0
+    assert memory.get_stats()["entries"] == 0
+
+
+def test_add_updates_changed_translation(memory):
+    assert memory.add_many([("ドン", "咚")], "Japanese", "Chinese", "none") == 1
+    assert memory.add_many([("ドン", "咚")], "Japanese", "Chinese", "none") == 0
+    assert memory.add_many([("ドン", "轰")], "Japanese", "Chinese", "none") == 1
+    assert memory.find_exact(["ドン"], "Japanese", "Chinese", "none") == ["轰"]
+
+
+def test_export_and_import_round_trip(memory, tmp_path):
+    memory.add_many([("ドン", "咚")], "Japanese", "Chinese", "none")
+    memory.add_many([("ルフィ", "路飞")], "Japanese", "Chinese", "v1")
+    export_path = tmp_path / "memory.jsonl"
+    assert memory.export_entries(str(export_path)) == 2
+    with open(export_path, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+        f.write('{"source_lang": "ja", "target_lang": "zh"}\n')
+        f.write(
+            '{"source_lang": "Japanese", "target_lang": "Chinese", '
+            '"original_text": "バン", "translated_text": "砰"}\n'
+        )
+    other_memory = TranslationMemory(str(tmp_path / "other.sqlite3"))
+    try:
+        assert other_memory.import_entries(str(export_path)) == 3
+        assert other_memory.find_exact(
+            ["ドン", "バン"], "Japanese", "Chinese", "none"
+        ) == ["咚", "砰"]
+        assert other_memory.find_exact(["ルフィ"], "Japanese", "Chinese", "v1") == [
+            "路飞"
+        ]
+    finally:
+        other_memory.close()
+
+
+def test_entries_persist_across_connections(tmp_path):
+    db_path = str(tmp_path / "memory.sqlite3")
+    first = TranslationMemory(db_path)
+    first.add_many([("ドン", "咚")], "Japanese", "Chinese", "none")
+    first.close()
+    second = TranslationMemory(db_path)
+    try:
+        assert second.find_exact(["ドン"], "Japanese", "Chinese", "none") == ["咚"]
+    finally:
+        second.close()